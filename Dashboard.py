@@ -2,15 +2,26 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import matplotlib.pyplot as plt
-import seaborn as sns
-from datetime import datetime, timedelta
 import warnings
+from concurrent.futures import FIRST_COMPLETED, wait
 warnings.filterwarnings('ignore')
 
+# Les bibliothèques lourdes (plotly.express, pyarrow, statsmodels...) sont
+# importées par les modules ci-dessous au premier rendu qui en a besoin.
+# Voir profil_demarrage.py pour le coût d'import au démarrage.
+from donnees import DEPOT_DONNEES, EXECUTEUR_CHARGEMENTS
+from agregats import (CubeRegional, annualiser, calculer_metriques_derivees, cartes_vue_ensemble,
+                      construire_magasin, detail_equipements, equipements_par_type)
+import figures
+from figures import CACHE_FIGURES
+import projections
+import previsions
+import tableaux
+import exports
+import hierarchie
+import instrumentation
+from instrumentation import INSTRUMENTATION
+
 # Configuration de la page
 st.set_page_config(
     page_title="Analyse Approfondie - Armée Égyptienne",
@@ -89,77 +100,264 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 class ArmeeEgypteAnalyseApprofondie:
-    def __init__(self):
-        # Données détaillées de l'armée égyptienne
-        self.donnees_armee = self.charger_donnees_detaillees()
-        self.donnees_regionales = self.charger_donnees_regionales()
-        self.donnees_modernisation = self.charger_donnees_modernisation()
+    # Colonnes lues par l'analyse des capacités (projection à la lecture)
+    COLONNES_CAPACITES = ["Annee", "Readiness_Operative", "Temps_Deploiement_Jours",
+                          "Exercices_Combines", "Entrainement_Heures_An"]
+    # Types de division de l'ordre de bataille et mesures d'équipement : colonne -> libellé
+    LIBELLES_DIVISIONS = {"Blindée": "Blindées", "Mécanisée": "Mécanisées", "Infanterie": "Infanterie",
+                          "Forces spéciales": "Spéciales"}
+    MESURES_EQUIPEMENTS = {"Chars_Principaux": "Chars", "Vehicules_Blindes": "Blindés",
+                           "Artillerie_Tractee": "Art. tractée", "Artillerie_Automotrice": "Art. automotrice",
+                           "Lance_Roquettes": "Lance-roquettes", "Systemes_ATGM": "ATGM"}
+    # Cartes par type d'équipement (les plus dotés) ; au-delà, la liste complète est paginée
+    CARTES_EQUIPEMENTS_MAX = 6
+
+    # Données chargées en arrière-plan : nom -> méthode de chargement
+    CHARGEURS = {"donnees_armee": "charger_donnees_detaillees", "donnees_regionales": "charger_donnees_regionales",
+                 "donnees_modernisation": "charger_donnees_modernisation", "magasin": "charger_magasin_indicateurs",
+                 "ordre_bataille": "charger_ordre_bataille", "cube_regional": "charger_cube_regional",
+                 "metriques": "charger_metriques", "capacites_annuelles": "charger_capacites_annuelles",
+                 "parc_par_type": "charger_parc_par_type"}
+    CHARGEMENTS_INITIAUX = ("donnees_armee", "donnees_regionales", "donnees_modernisation", "magasin")
+    # Données attendues par chaque section avant son rendu (espace réservé affiché en attendant)
+    DONNEES_SECTIONS = {"Vue d'ensemble": ("magasin",), "Structure organisationnelle": ("ordre_bataille",),
+                        "Capacités opérationnelles": ("magasin",),
+                        "Modernisation": ("parc_par_type", "donnees_modernisation"),
+                        "Comparaison régionale": ("cube_regional",),
+                        "Projections futures": ("magasin", "capacites_annuelles")}
+
+    def __init__(self, depot=None):
+        # Les jeux de données sont servis par le cache partagé du processus :
+        # une ré-exécution du script ne reconstruit plus les DataFrames.
+        self.depot = depot if depot is not None else DEPOT_DONNEES
+        # Chargements lancés en parallèle : la page s'affiche sans les attendre
+        self._chargements = {}
+        self.charger_en_fond(self.CHARGEMENTS_INITIAUX)
+    
+    def charger_en_fond(self, noms):
+        """Lance les chargements `noms` en arrière-plan, une fois par dashboard ; renvoie leurs futures"""
+        for nom in noms:
+            if nom not in self._chargements:
+                self._chargements[nom] = EXECUTEUR_CHARGEMENTS.submit(getattr(self, self.CHARGEURS[nom]))
+        return [self._chargements[nom] for nom in noms]
+    
+    def attendre(self, nom):
+        """Renvoie le résultat du chargement `nom`, une fois terminé
+
+        Les fils de chargement n'héritent pas de la mesure de la section (leurs
+        phases chevaucheraient celles du script) : l'attente est imputée ici,
+        à la phase donnees de la section en cours.
+        """
+        chargement = self.charger_en_fond([nom])[0]
+        with instrumentation.phase("donnees"):
+            return chargement.result()
+    
+    @property
+    def donnees_armee(self):
+        return self.attendre("donnees_armee")
+    
+    @property
+    def donnees_regionales(self):
+        return self.attendre("donnees_regionales")
+    
+    @property
+    def donnees_modernisation(self):
+        return self.attendre("donnees_modernisation")
+    
+    @property
+    def magasin(self):
+        return self.attendre("magasin")
+    
+    @property
+    def capacites_annuelles(self):
+        return self.attendre("capacites_annuelles")
+    
+    @property
+    def parc_par_type(self):
+        return self.attendre("parc_par_type")
         
     def charger_donnees_detaillees(self):
         """Charge des données détaillées sur l'armée égyptienne"""
-        # Structure organisationnelle
-        structure = {
-            "Commandements": ["Commandement Nord", "Commandement Centre", "Commandement Sud", 
-                            "Commandement Ouest", "Commandement Est", "Commandement du Sinaï"],
-            "Divisions_Blindees": [3, 2, 1, 1, 2, 1],
-            "Divisions_Mecanisees": [2, 2, 1, 1, 1, 1],
-            "Divisions_Infanterie": [4, 3, 2, 2, 3, 2],
-            "Forces_Speciales": [2, 1, 1, 1, 1, 1]
-        }
-        
-        # Équipements par type
-        equipements = {
-            "Type": ["Chars Principaux", "Véhicules Blindés", "Artillerie Tractée", 
-                    "Artillerie Automotrice", "Lance-roquettes", "Systèmes ATGM"],
-            "Quantite_2024": [3760, 12000, 1200, 850, 600, 3000],
-            "Quantite_2012": [3400, 9500, 1100, 650, 450, 2000],
-            "Taux_Modernite": [35, 40, 25, 45, 30, 60]
-        }
-        
-        # Capacités opérationnelles
-        capacites = pd.DataFrame({
-            "Annee": list(range(2012, 2025)),
-            "Readiness_Operative": [70, 72, 74, 76, 78, 80, 82, 84, 85, 86, 87, 88, 89],
-            "Temps_Deploiement_Jours": [72, 70, 68, 65, 62, 58, 55, 52, 50, 48, 47, 46, 45],
-            "Exercices_Combines": [15, 16, 18, 20, 22, 25, 28, 30, 32, 34, 36, 38, 40],
-            "Entrainement_Heures_An": [800, 820, 850, 880, 900, 920, 940, 960, 980, 1000, 1020, 1040, 1060]
-        })
-        
-        return {
-            "structure": pd.DataFrame(structure),
-            "equipements": pd.DataFrame(equipements),
-            "capacites": capacites
-        }
+        # Instantanés en lecture seule : les tables partagées ne sont jamais modifiées
+        return self.depot.instantanes(("structure", "equipements", "capacites"))
     
     def charger_donnees_regionales(self):
         """Charge des données comparatives régionales"""
-        pays = ["Égypte", "Israël", "Turquie", "Arabie Saoudite", "Iran", "Algérie"]
-        
-        donnees = {
-            "Pays": pays,
-            "Effectifs_Actifs_K": [462, 169, 355, 227, 610, 130],
-            "Reservistes_K": [491, 465, 380, 25, 350, 150],
-            "Chars_Principaux": [3760, 1500, 3200, 1065, 2300, 1300],
-            "Veh_Blindes": [12000, 10000, 11000, 8500, 15000, 6000],
-            "Artillerie": [2050, 750, 3000, 1250, 3500, 1000],
-            "Budget_Defense_MdUSD": [8800, 24000, 15000, 57000, 10000, 9500],
-            "Depense_Par_Soldat_KUSD": [19.0, 142.0, 42.3, 251.1, 16.4, 73.1]
-        }
-        
-        return pd.DataFrame(donnees)
+        return self.depot.table("regionales")
     
     def charger_donnees_modernisation(self):
         """Charge des données sur la modernisation"""
-        programmes = [
-            {"Programme": "Modernisation T-55/T-62", "Budget_MdUSD": 800, "Debut": 2015, "Fin": 2025, "Statut": "En cours"},
-            {"Programme": "Acquisition T-90MS", "Budget_MdUSD": 1200, "Debut": 2020, "Fin": 2027, "Statut": "En cours"},
-            {"Programme": "Véhicules 8x8 EIFV", "Budget_MdUSD": 500, "Debut": 2018, "Fin": 2024, "Statut": "Terminé"},
-            {"Programme": "Systèmes ATGM modernes", "Budget_MdUSD": 300, "Debut": 2016, "Fin": 2022, "Statut": "Terminé"},
-            {"Programme": "Artillerie automotrice", "Budget_MdUSD": 400, "Debut": 2019, "Fin": 2026, "Statut": "En cours"},
-            {"Programme": "Systèmes C4ISR", "Budget_MdUSD": 600, "Debut": 2017, "Fin": 2025, "Statut": "En cours"}
-        ]
-        
-        return pd.DataFrame(programmes)
+        return self.depot.table("programmes")
+    
+    def charger_magasin_indicateurs(self):
+        """Charge les agrégats précalculés des indicateurs (cartes de métriques)"""
+        tables = ("capacites", "equipements", "reperes")
+        return self.depot.derive(
+            "magasin_indicateurs", tables,
+            lambda: construire_magasin({table: self.depot.table(table) for table in tables})
+        )
+    
+    def charger_capacites_annuelles(self, periode=None):
+        """Charge les capacités à raison d'une ligne par année, calculées une fois par version
+
+        Une table par unité et par mois est moyennée par année (voir
+        agregats.annualiser). Avec `periode`, seules ses années et les colonnes
+        analysées sont lues.
+        """
+        colonnes = self.COLONNES_CAPACITES if periode is not None else None
+        return self.depot.derive(
+            "capacites_annuelles", ("capacites",),
+            lambda: annualiser(self.depot.table("capacites", colonnes=colonnes, annees=periode)),
+            variante=tuple(periode) if periode is not None else None
+        )
+    
+    def charger_parc_par_type(self):
+        """Charge les équipements à raison d'une ligne par type (inventaires par unité cumulés)"""
+        return self.depot.derive("parc_par_type", ("equipements",),
+                                 lambda: equipements_par_type(self.depot.table("equipements")))
+    
+    def charger_ordre_bataille(self):
+        """Charge l'ordre de bataille indexé (sommes préfixes par nœud), calculé une fois par version"""
+        return self.depot.derive("ordre_bataille", ("unites",),
+                                 lambda: hierarchie.OrdreBataille(self.depot.table("unites")))
+    
+    def charger_metriques(self):
+        """Charge les métriques dérivées (corrélations, croissances, rangs, normalisation)
+
+        Calculées en une passe quand la version des données change ; les
+        rendus ne font que les lire.
+        """
+        tables = ("capacites",)
+        return self.depot.derive(
+            "metriques_derivees", tables,
+            lambda: calculer_metriques_derivees({table: self.depot.table(table) for table in tables})
+        )
+    
+    def charger_cube_regional(self):
+        """Charge le cube pays x indicateur x année (valeurs, normalisations, rangs), calculé une fois par version"""
+        return self.depot.derive("cube_regional", ("regionales",),
+                                 lambda: CubeRegional(self.depot.table("regionales")))
+    
+    def figure(self, nom, tables, construire, controles=(), annees=None):
+        """Renvoie la figure `nom`, servie par le cache des figures si possible
+
+        La figure est partagée : elle est passée telle quelle à
+        afficher_figure, sans être modifiée. La clé combine la version des `tables` utilisées et les seuls
+        `controles` dont dépend la figure. Avec `annees`, seule compte la
+        version des partitions de la période.
+        """
+        versions = tuple((table, annees, self.depot.version(table, annees)) for table in tables)
+        cle = (nom, versions, tuple(controles))
+        with instrumentation.phase("figures"):
+            return CACHE_FIGURES.obtenir(cle, construire)
+    
+    def rafraichir_donnees(self):
+        """Purge les tables, résultats dérivés et figures des données modifiées depuis la dernière détection
+
+        Les entrées des données inchangées restent en cache. Détection
+        limitée à une par intervalle (voir DepotDonnees.rafraichir).
+        """
+        modifications = self.depot.rafraichir()
+        if modifications:
+            versions = {}
+
+            def perimee(cle):
+                for table, annees, version in cle[1]:
+                    if table in modifications:
+                        if (table, annees) not in versions:
+                            versions[table, annees] = self.depot.version(table, annees)
+                        if version != versions[table, annees]:
+                            return True
+                return False
+
+            CACHE_FIGURES.purger(perimee)
+        return modifications
+    
+    def afficher_figure(self, fig):
+        """Envoie la figure au navigateur (phase de sérialisation de la section)"""
+        with instrumentation.phase("serialisation"):
+            st.plotly_chart(fig, use_container_width=True)
+    
+    def afficher_tableau(self, df, **options):
+        """Envoie la table ou le Styler au navigateur (phase de sérialisation de la section)"""
+        with instrumentation.phase("serialisation"):
+            st.dataframe(df, use_container_width=True, **options)
+    
+    def afficher_panneau_differe(self, titre, cle, rendu, ouvert=False):
+        """Affiche un panneau dont le contenu n'est calculé et envoyé qu'une fois ouvert
+
+        Le contenu est rendu dans un fragment : ses propres widgets ne
+        relancent que le panneau, pas la page entière.
+        """
+        if st.toggle(titre, value=ouvert, key=cle):
+            st.fragment(rendu)()
+    
+    def afficher_table_paginee(self, cle, df, tables, mettre_en_forme=None, hauteur="auto"):
+        """Affiche `df` page par page, filtré et trié côté serveur
+
+        Seules les lignes de la page courante sont mises en forme (via
+        `mettre_en_forme`, qui reçoit la page et renvoie un Styler) et envoyées
+        au navigateur. L'ordre des lignes est gardé dans la session (un seul par
+        table) pour la version des `tables` et l'état des contrôles : changer de
+        page ne refait ni le filtre ni le tri. Rendu
+        dans un fragment : les contrôles ne relancent que la table.
+        """
+        st.fragment(self._afficher_page)(cle, df, tables, mettre_en_forme, hauteur)
+    
+    @INSTRUMENTATION.section("table_paginee")
+    def _afficher_page(self, cle, df, tables, mettre_en_forme, hauteur):
+        col1, col2, col3, col4, col5 = st.columns([3, 2, 1, 1, 1])
+        recherche = col1.text_input("Filtrer", key=f"{cle}_recherche", placeholder="Rechercher...")
+        tri = col2.selectbox("Trier par", [None, *df.columns], key=f"{cle}_tri",
+                             format_func=lambda colonne: "Ordre d'origine" if colonne is None else colonne)
+        ascendant = col3.selectbox("Ordre", [True, False], key=f"{cle}_ordre",
+                                   format_func=lambda a: "Croissant" if a else "Décroissant")
+        taille = col4.selectbox("Lignes", tableaux.TAILLES_PAGE, key=f"{cle}_taille")
+        
+        etat = (tuple(self.depot.version(table) for table in tables),
+                tuple(df.columns), recherche.strip(), tri, ascendant)
+        ordre = st.session_state.get(f"{cle}_positions")
+        if ordre is None or ordre[0] != etat:
+            with instrumentation.phase("calcul"):
+                ordre = (etat, tableaux.ordonner(df, recherche.strip(), tri, ascendant))
+            st.session_state[f"{cle}_positions"] = ordre
+        positions = ordre[1]
+        pages = tableaux.nombre_pages(len(positions), taille)
+        # Page courante ramenée dans les bornes quand le filtre réduit le nombre de pages
+        if st.session_state.get(f"{cle}_page", 1) > pages:
+            st.session_state[f"{cle}_page"] = pages
+        numero = col5.number_input(f"Page (/{pages})", 1, pages, key=f"{cle}_page")
+        
+        visible = tableaux.page(df, positions, numero, taille)
+        self.afficher_tableau(mettre_en_forme(visible) if mettre_en_forme else visible, height=hauteur)
+        debut = (numero - 1) * taille
+        st.caption(f"Lignes {min(debut + 1, len(positions))}-{debut + len(visible)} sur "
+                   f"{len(positions):,} retenues ({len(df):,} au total)")
+        self.proposer_export(cle, {cle: (df, positions)}, tables,
+                             (tuple(df.columns), recherche.strip(), tri, ascendant))
+    
+    def proposer_export(self, section, feuilles, tables, controles=()):
+        """Propose le téléchargement des `feuilles` affichées (Parquet, CSV ou Excel)
+
+        `feuilles` associe un nom à un DataFrame ou à un couple (DataFrame,
+        positions), voir exports.py. Le fichier n'est généré qu'au clic, puis
+        mis en cache pour la version des `tables` et les `controles` courants ;
+        le bouton reçoit le fichier ouvert, lu par Streamlit puis fermé.
+        """
+        formats = list(exports.FORMATS)
+        if any(exports.nombre_lignes(feuille) > exports.LIGNES_MAX_EXCEL for feuille in feuilles.values()):
+            formats.remove("excel")
+        col1, col2 = st.columns([1, 4])
+        format_export = col1.selectbox("Format d'export", formats, key=f"export_{section}_format",
+                                       format_func=str.upper, label_visibility="collapsed")
+        extension, mime = exports.extension_et_type(format_export, len(feuilles))
+        cle = (section, tuple(self.depot.version(table) for table in tables), controles)
+        
+        def generer():
+            return exports.CACHE_EXPORTS.ouvrir(cle, format_export, feuilles)
+        
+        col2.download_button("⬇️ Exporter", generer, file_name=f"{section}{extension}", mime=mime,
+                             on_click="ignore", key=f"export_{section}")
     
     def afficher_header(self):
         """Affiche l'en-tête du dashboard"""
@@ -205,63 +403,67 @@ class ArmeeEgypteAnalyseApprofondie:
             'periode': (annee_debut, annee_fin)
         }
     
+    @INSTRUMENTATION.section("structure")
     def analyser_structure_organisationnelle(self):
         """Analyse détaillée de la structure organisationnelle"""
         st.markdown('<h3 class="section-header">🏛️ STRUCTURE ORGANISATIONNELLE</h3>', 
                    unsafe_allow_html=True)
         
-        df_structure = self.donnees_armee["structure"]
+        ordre = self.charger_ordre_bataille()
+        
+        # Descente dans l'ordre de bataille : chaque niveau choisi restreint le suivant
+        chemin = ()
+        colonnes_niveaux = st.columns(len(hierarchie.NIVEAUX) - 1)
+        for colonne, niveau in zip(colonnes_niveaux, hierarchie.NIVEAUX[:-1]):
+            choix = colonne.selectbox(niveau, ["Tous", *ordre.enfants(chemin)[niveau]],
+                                      key="structure_" + "/".join((niveau, *chemin)))
+            if choix == "Tous":
+                break
+            chemin += (choix,)
+        
+        niveau_enfants = hierarchie.NIVEAUX[len(chemin)]
+        df_enfants = ordre.enfants(chemin)
+        total = ordre.total(chemin)
+        # Divisions par type tant que les enfants sont des commandements ou des divisions
+        if len(chemin) < 2 and st.radio("Mesures", ["Divisions par type", "Équipements"], horizontal=True,
+                                        key="structure_mesures") == "Divisions par type":
+            mesures = {f"{hierarchie.PREFIXE_DIVISIONS}{type_}": libelle
+                       for type_, libelle in self.LIBELLES_DIVISIONS.items()}
+        else:
+            mesures = self.MESURES_EQUIPEMENTS
+        mesures = {colonne: libelle for colonne, libelle in mesures.items() if colonne in ordre.mesures}
+        colonnes, etiquettes = list(mesures), list(mesures.values())
+        lieu = " > ".join(chemin) or "Armée de Terre"
         
         col1, col2 = st.columns(2)
         
         with col1:
             # Carte thermique de la distribution des forces
-            fig = px.imshow(
-                df_structure[['Divisions_Blindees', 'Divisions_Mecanisees', 'Divisions_Infanterie', 'Forces_Speciales']].T,
-                labels=dict(x="Commandements", y="Type de Division", color="Nombre"),
-                x=df_structure['Commandements'],
-                y=['Divisions Blindées', 'Divisions Mécanisées', 'Divisions Infanterie', 'Forces Spéciales'],
-                title="Distribution des Forces par Commandement",
-                color_continuous_scale='Reds'
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            
-            st.markdown('<div class="sub-section">📊 Distribution Totale des Divisions</div>', unsafe_allow_html=True)
-            total_blindees = df_structure['Divisions_Blindees'].sum()
-            total_mecanisees = df_structure['Divisions_Mecanisees'].sum()
-            total_infanterie = df_structure['Divisions_Infanterie'].sum()
-            total_speciales = df_structure['Forces_Speciales'].sum()
+            fig = self.figure("carte_structure", ["unites"],
+                              lambda: figures.carte_structure(df_enfants, niveau_enfants, colonnes, etiquettes,
+                                                              f"Distribution des Forces - {lieu}"),
+                              controles=(chemin, tuple(colonnes)))
+            self.afficher_figure(fig)
             
-            col_a, col_b, col_c, col_d = st.columns(4)
-            col_a.metric("Blindées", total_blindees)
-            col_b.metric("Mécanisées", total_mecanisees)
-            col_c.metric("Infanterie", total_infanterie)
-            col_d.metric("Spéciales", total_speciales)
+            st.markdown(f'<div class="sub-section">📊 Totaux - {lieu}</div>', unsafe_allow_html=True)
+            # Totaux lus dans les sommes préfixes de l'ordre de bataille, sans parcourir les unités
+            cols_totaux = st.columns(4)
+            if len(chemin) < 2:
+                for col, (type_, libelle) in zip(cols_totaux, self.LIBELLES_DIVISIONS.items()):
+                    col.metric(libelle, f"{total.get(hierarchie.PREFIXE_DIVISIONS + type_, 0):,.0f}")
+            else:
+                cols_totaux[0].metric("Bataillons", f"{total['Bataillons']:,.0f}")
+                cols_totaux[1].metric("Effectifs", f"{total['Effectifs']:,.0f}")
+                cols_totaux[2].metric("Chars", f"{total['Chars_Principaux']:,.0f}")
+                cols_totaux[3].metric("Blindés", f"{total['Vehicules_Blindes']:,.0f}")
         
         with col2:
-            # Graphique en radar des capacités par commandement
-            fig = go.Figure()
-            
-            for idx, row in df_structure.iterrows():
-                fig.add_trace(go.Scatterpolar(
-                    r=[row['Divisions_Blindees'], row['Divisions_Mecanisees'], 
-                       row['Divisions_Infanterie'], row['Forces_Speciales']],
-                    theta=['Blindées', 'Mécanisées', 'Infanterie', 'Spéciales'],
-                    fill='toself',
-                    name=row['Commandements']
-                ))
-            
-            fig.update_layout(
-                polar=dict(
-                    radialaxis=dict(
-                        visible=True,
-                        range=[0, 5]
-                    )),
-                showlegend=True,
-                title="Profil des Commandements (Capacités Relatives)",
-                height=500
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            # Graphique en radar du profil de chaque enfant
+            fig = self.figure("radar_structure", ["unites"],
+                              lambda: figures.radar_structure(df_enfants, niveau_enfants, colonnes, etiquettes,
+                                                              f"Profil par {niveau_enfants} - {lieu}"),
+                              controles=(chemin, tuple(colonnes)))
+            self.afficher_figure(fig)
         
         # Analyse stratégique des commandements
         st.markdown('<div class="sub-section">🎯 ANALYSE STRATÉGIQUE DES COMMANDEMENTS</div>', unsafe_allow_html=True)
@@ -294,117 +496,90 @@ class ArmeeEgypteAnalyseApprofondie:
             • 1 division mécanisée
             """)
     
+    @INSTRUMENTATION.section("capacites")
     def analyser_capacites_operationnelles(self, periode):
         """Analyse détaillée des capacités opérationnelles"""
         st.markdown('<h3 class="section-header">⚡ CAPACITÉS OPÉRATIONNELLES</h3>', 
                    unsafe_allow_html=True)
         
-        df_capacites = self.donnees_armee["capacites"]
-        df_capacites = df_capacites[(df_capacites['Annee'] >= periode[0]) & (df_capacites['Annee'] <= periode[1])]
+        # La période est filtrée par la source : seules ces années sont lues
+        df_capacites = self.charger_capacites_annuelles(periode)
+        
+        # Métriques clés, lues dans le magasin d'agrégats pour la période
+        readiness = self.magasin.fenetre("Readiness_Operative", *periode)
+        deploiement = self.magasin.fenetre("Temps_Deploiement_Jours", *periode)
+        exercices = self.magasin.fenetre("Exercices_Combines", *periode)
+        entrainement = self.magasin.fenetre("Entrainement_Heures_An", *periode)
         
-        # Métriques clés
         col1, col2, col3, col4 = st.columns(4)
         
+        # Fenêtre sans année dans la période : carte "n.d.", comme ailleurs sur la page
         with col1:
-            croissance_readiness = ((df_capacites['Readiness_Operative'].iloc[-1] - 
-                                   df_capacites['Readiness_Operative'].iloc[0]) / 
-                                   df_capacites['Readiness_Operative'].iloc[0]) * 100
-            st.metric(
-                "Préparation Opérationnelle",
-                f"{df_capacites['Readiness_Operative'].iloc[-1]:.1f}%",
-                f"{croissance_readiness:+.1f}%",
-                delta_color="normal"
-            )
+            if readiness is None:
+                st.metric("Préparation Opérationnelle", "n.d.")
+            else:
+                st.metric(
+                    "Préparation Opérationnelle",
+                    f"{readiness['dernier']:.1f}%",
+                    f"{readiness['croissance']:+.1f}%",
+                    delta_color="normal"
+                )
         
         with col2:
-            reduction_temps = ((df_capacites['Temps_Deploiement_Jours'].iloc[0] - 
-                              df_capacites['Temps_Deploiement_Jours'].iloc[-1]) / 
-                             df_capacites['Temps_Deploiement_Jours'].iloc[0]) * 100
-            st.metric(
-                "Temps de Déploiement",
-                f"{df_capacites['Temps_Deploiement_Jours'].iloc[-1]:.0f} jours",
-                f"{reduction_temps:+.1f}%",
-                delta_color="inverse"
-            )
+            if deploiement is None:
+                st.metric("Temps de Déploiement", "n.d.")
+            else:
+                reduction_temps = ((deploiement['premier'] - deploiement['dernier']) / deploiement['premier'] * 100
+                                   if deploiement['premier'] else None)
+                st.metric(
+                    "Temps de Déploiement",
+                    f"{deploiement['dernier']:.0f} jours",
+                    f"{reduction_temps:+.1f}%" if reduction_temps is not None else None,
+                    delta_color="inverse"
+                )
         
         with col3:
-            croissance_exercices = ((df_capacites['Exercices_Combines'].iloc[-1] - 
-                                   df_capacites['Exercices_Combines'].iloc[0]) / 
-                                   df_capacites['Exercices_Combines'].iloc[0]) * 100
-            st.metric(
-                "Exercices Combinés",
-                f"{df_capacites['Exercices_Combines'].iloc[-1]:.0f}",
-                f"{croissance_exercices:+.1f}%"
-            )
+            if exercices is None:
+                st.metric("Exercices Combinés", "n.d.")
+            else:
+                st.metric(
+                    "Exercices Combinés",
+                    f"{exercices['dernier']:.0f}",
+                    f"{exercices['croissance']:+.1f}%"
+                )
         
         with col4:
-            croissance_entrainement = ((df_capacites['Entrainement_Heures_An'].iloc[-1] - 
-                                      df_capacites['Entrainement_Heures_An'].iloc[0]) / 
-                                     df_capacites['Entrainement_Heures_An'].iloc[0]) * 100
-            st.metric(
-                "Heures d'Entraînement",
-                f"{df_capacites['Entrainement_Heures_An'].iloc[-1]:.0f}h",
-                f"{croissance_entrainement:+.1f}%"
-            )
+            if entrainement is None:
+                st.metric("Heures d'Entraînement", "n.d.")
+            else:
+                st.metric(
+                    "Heures d'Entraînement",
+                    f"{entrainement['dernier']:.0f}h",
+                    f"{entrainement['croissance']:+.1f}%"
+                )
+        
+        if df_capacites.empty:
+            st.info(f"Aucune donnée de capacités sur {periode[0]}-{periode[1]}")
+            return
         
         # Graphiques détaillés
         col1, col2 = st.columns(2)
         
         with col1:
-            fig = make_subplots(specs=[[{"secondary_y": True}]])
-            
-            fig.add_trace(
-                go.Scatter(x=df_capacites['Annee'], y=df_capacites['Readiness_Operative'],
-                          name="Préparation Opérationnelle", line=dict(color='#CE1126', width=3)),
-                secondary_y=False,
-            )
-            
-            fig.add_trace(
-                go.Scatter(x=df_capacites['Annee'], y=df_capacites['Temps_Deploiement_Jours'],
-                          name="Temps Déploiement (jours)", line=dict(color='#000000', width=3)),
-                secondary_y=True,
-            )
-            
-            fig.update_layout(
-                title="Évolution Préparation vs Temps Réponse",
-                xaxis_title="Année",
-                height=400
-            )
-            
-            fig.update_yaxes(title_text="Préparation (%)", secondary_y=False)
-            fig.update_yaxes(title_text="Jours", secondary_y=True, autorange="reversed")
-            
-            st.plotly_chart(fig, use_container_width=True)
+            # Relevés bruts : par unité et par mois, la figure les trace mois par mois
+            fig = self.figure("preparation_deploiement", ["capacites"],
+                              lambda: figures.preparation_deploiement(
+                                  self.depot.table("capacites", annees=periode)),
+                              periode, annees=periode)
+            self.afficher_figure(fig)
         
         with col2:
-            fig = go.Figure()
-            
-            fig.add_trace(go.Scatter(
-                x=df_capacites['Annee'], 
-                y=df_capacites['Exercices_Combines'],
-                mode='lines+markers',
-                name='Exercices Combinés',
-                line=dict(color='#FECB00', width=3),
-                marker=dict(size=8)
-            ))
-            
-            fig.add_trace(go.Bar(
-                x=df_capacites['Annee'], 
-                y=df_capacites['Entrainement_Heures_An'],
-                name='Heures Entraînement',
-                marker_color='#0066CC',
-                opacity=0.6
-            ))
-            
-            fig.update_layout(
-                title="Activités d'Entraînement et Exercices",
-                xaxis_title="Année",
-                yaxis_title="Nombre/Heures",
-                barmode='overlay',
-                height=400
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            fig = self.figure("entrainement_exercices", ["capacites"],
+                              lambda: figures.entrainement_exercices(df_capacites), periode,
+                              annees=periode)
+            self.afficher_figure(fig)
+        
+        self.proposer_export("capacites", {"capacites": df_capacites}, ["capacites"], tuple(periode))
         
         # Analyse des tendances
         st.markdown('<div class="insight-card">', unsafe_allow_html=True)
@@ -413,11 +588,15 @@ class ArmeeEgypteAnalyseApprofondie:
         col1, col2 = st.columns(2)
         with col1:
             st.markdown("**Améliorations notables:**")
-            st.markdown("""
-            • ⬆️ Préparation opérationnelle: +27% depuis 2012  
-            • ⬇️ Temps de réponse: -37.5% depuis 2012  
-            • ⬆️ Exercices combinés: +166% depuis 2012  
-            • ⬆️ Formation: +32.5% d'heures d'entraînement  
+            readiness = self.magasin.fenetre("Readiness_Operative")
+            deploiement = self.magasin.fenetre("Temps_Deploiement_Jours")
+            exercices = self.magasin.fenetre("Exercices_Combines")
+            entrainement = self.magasin.fenetre("Entrainement_Heures_An")
+            st.markdown(f"""
+            • ⬆️ Préparation opérationnelle: {readiness['croissance']:+.0f}% depuis {readiness['annee_debut']}  
+            • ⬇️ Temps de réponse: {deploiement['croissance']:+.1f}% depuis {deploiement['annee_debut']}  
+            • ⬆️ Exercices combinés: {exercices['croissance']:+.0f}% depuis {exercices['annee_debut']}  
+            • ⬆️ Formation: {entrainement['croissance']:+.1f}% d'heures d'entraînement  
             """)
         
         with col2:
@@ -431,54 +610,28 @@ class ArmeeEgypteAnalyseApprofondie:
             """)
         st.markdown('</div>', unsafe_allow_html=True)
     
+    @INSTRUMENTATION.section("modernisation")
     def analyser_equipements_modernisation(self):
         """Analyse détaillée des équipements et modernisation"""
         st.markdown('<h3 class="section-header">🛡️ ÉQUIPEMENTS ET MODERNISATION</h3>', 
                    unsafe_allow_html=True)
         
-        df_equipements = self.donnees_armee["equipements"]
+        df_equipements = self.parc_par_type
         df_programmes = self.donnees_modernisation
         
         col1, col2 = st.columns(2)
         
         with col1:
             # Évolution des équipements
-            fig = go.Figure()
-            
-            fig.add_trace(go.Bar(
-                name='2012',
-                x=df_equipements['Type'],
-                y=df_equipements['Quantite_2012'],
-                marker_color='rgba(206, 17, 38, 0.6)'
-            ))
-            
-            fig.add_trace(go.Bar(
-                name='2024',
-                x=df_equipements['Type'],
-                y=df_equipements['Quantite_2024'],
-                marker_color='rgba(206, 17, 38, 1)'
-            ))
-            
-            fig.update_layout(
-                title="Évolution du Parc d'Équipements (2012 vs 2024)",
-                xaxis_title="Type d'équipement",
-                yaxis_title="Quantité",
-                barmode='group',
-                height=500
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            fig = self.figure("evolution_equipements", ["equipements"],
+                              lambda: figures.evolution_equipements(df_equipements))
+            self.afficher_figure(fig)
         
         with col2:
             # Taux de modernité
-            fig = px.bar(df_equipements, x='Type', y='Taux_Modernite',
-                        title="Taux de Modernité du Parc d'Équipements (%)",
-                        color='Taux_Modernite',
-                        color_continuous_scale='Reds',
-                        labels={'Taux_Modernite': '% Modernité'})
-            
-            fig.update_layout(height=500)
-            st.plotly_chart(fig, use_container_width=True)
+            fig = self.figure("modernite_equipements", ["equipements"],
+                              lambda: figures.modernite_equipements(df_equipements))
+            self.afficher_figure(fig)
             
             # Métriques de modernité
             modernite_moyenne = df_equipements['Taux_Modernite'].mean()
@@ -487,15 +640,16 @@ class ArmeeEgypteAnalyseApprofondie:
         # Programmes de modernisation
         st.markdown('<div class="sub-section">🚀 PROGRAMMES DE MODERNISATION</div>', unsafe_allow_html=True)
         
-        # Table interactive
-        st.dataframe(
-            df_programmes.style
-            .bar(subset=['Budget_MdUSD'], color='#CE1126', vmin=0)
+        # Table interactive, mise en forme page par page (barres à l'échelle de toute la table)
+        budget_max = df_programmes['Budget_MdUSD'].max()
+        self.afficher_table_paginee(
+            "programmes", df_programmes, ["programmes"],
+            lambda visible: visible.style
+            .bar(subset=['Budget_MdUSD'], color='#CE1126', vmin=0, vmax=budget_max)
             .apply(lambda x: ['background: #d4edda' if v == 'Terminé' 
                             else 'background: #fff3cd' if v == 'En cours' 
                             else '' for v in x], subset=['Statut']),
-            use_container_width=True,
-            height=300
+            hauteur=300
         )
         
         # Analyse des programmes
@@ -511,23 +665,36 @@ class ArmeeEgypteAnalyseApprofondie:
         # Détail par type d'équipement
         st.markdown('<div class="sub-section">🔧 ANALYSE PAR TYPE D\'ÉQUIPEMENT</div>', unsafe_allow_html=True)
         
-        cols = st.columns(len(df_equipements))
-        for idx, row in df_equipements.iterrows():
-            with cols[idx]:
-                croissance = ((row['Quantite_2024'] - row['Quantite_2012']) / row['Quantite_2012']) * 100
-                
-                st.markdown(f"**{row['Type']}**")
-                st.metric("2024", f"{row['Quantite_2024']:,}")
-                st.metric("Croissance", f"{croissance:+.1f}%")
-                st.progress(row['Taux_Modernite'] / 100, 
-                           text=f"Modernité: {row['Taux_Modernite']}%")
+        df_detail = self.depot.derive("detail_equipements", ("equipements",),
+                                      lambda: detail_equipements(df_equipements))
+        cartes = df_detail.nlargest(self.CARTES_EQUIPEMENTS_MAX, 'Quantite_2024')
+        cols = st.columns(len(cartes))
+        for col, row in zip(cols, cartes.itertuples(index=False)):
+            with col:
+                st.markdown(f"**{row.Type}**")
+                st.metric("2024", f"{row.Quantite_2024:,}")
+                st.metric("Croissance", f"{row.Croissance:+.1f}%")
+                st.progress(row.Taux_Modernite / 100,
+                           text=f"Modernité: {row.Taux_Modernite}%")
+        
+        if len(df_detail) > len(cartes):
+            st.caption(f"{len(cartes)} types les plus dotés sur {len(df_detail):,} ; liste complète ci-dessous")
+            self.afficher_table_paginee("detail_equipements", df_detail, ["equipements"])
     
+    @INSTRUMENTATION.section("comparaison_regionale")
     def analyser_comparaison_regionale(self):
         """Analyse comparative avec les armées régionales"""
         st.markdown('<h3 class="section-header">🌍 COMPARAISON RÉGIONALE</h3>', 
                    unsafe_allow_html=True)
         
-        df_region = self.donnees_regionales
+        cube = self.charger_cube_regional()
+        
+        # Pays focal et année : simples tranches du cube, sans recalcul
+        col1, col2 = st.columns([2, 1])
+        pays_focal = col1.selectbox("Pays focal :", cube.pays, index=cube.pays.index(cube.pays_focal()),
+                                    key="pays_focal")
+        annee = col2.selectbox("Année :", cube.annees[::-1], key="annee_regionale") if len(cube.annees) > 1 \
+            else cube.annees[-1]
         
         # Sélection des indicateurs à comparer
         indicateurs = st.multiselect(
@@ -538,122 +705,96 @@ class ArmeeEgypteAnalyseApprofondie:
         )
         
         if indicateurs:
-            # Normalisation pour le radar chart
-            df_normalized = df_region.copy()
-            for col in indicateurs:
-                df_normalized[col] = df_normalized[col] / df_normalized[col].max() * 100
-            
-            # Graphique radar comparatif
-            fig = go.Figure()
+            # Graphique radar comparatif (indicateurs normalisés)
+            fig = self.figure("radar_regional", ["regionales"],
+                              lambda: figures.radar_regional(cube.normalise(indicateurs, annee), indicateurs),
+                              (tuple(indicateurs), annee))
             
-            for idx, row in df_normalized.iterrows():
-                values = [row[col] for col in indicateurs]
-                fig.add_trace(go.Scatterpolar(
-                    r=values,
-                    theta=indicateurs,
-                    fill='toself',
-                    name=row['Pays'],
-                    opacity=0.7
-                ))
-            
-            fig.update_layout(
-                polar=dict(
-                    radialaxis=dict(
-                        visible=True,
-                        range=[0, 100]
-                    )),
-                showlegend=True,
-                title="Comparaison Régionale (Normalisée)",
-                height=500
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            self.afficher_figure(fig)
             
             # Table de comparaison détaillée
             st.markdown('<div class="sub-section">📋 DONNÉES COMPARATIVES DÉTAILLÉES</div>', unsafe_allow_html=True)
             
-            # Calcul des rangs
-            df_comparison = df_region.copy()
-            for col in indicateurs:
-                df_comparison[f'Rang_{col}'] = df_comparison[col].rank(ascending=False, method='dense').astype(int)
+            # Rangs précalculés dans le cube
+            df_comparison = cube.tableau(indicateurs, annee)
             
-            # Affichage avec mise en forme
-            st.dataframe(
-                df_comparison.style
-                .highlight_max(subset=indicateurs, color='#d4edda')
-                .highlight_min(subset=indicateurs, color='#f8d7da')
-                .apply(lambda x: ['font-weight: bold' if v == 'Égypte' else '' for v in x], subset=['Pays']),
-                use_container_width=True,
-                height=400
+            # Affichage avec mise en forme, limitée aux lignes de la page
+            self.afficher_table_paginee(
+                f"comparaison_regionale_{annee}", df_comparison, ["regionales"],
+                lambda visible: tableaux.graisser(tableaux.surligner_extremes(
+                    visible.style, df_comparison, indicateurs, '#d4edda', '#f8d7da'), 'Pays', pays_focal),
+                hauteur=400
             )
             
             # Analyse des positions relatives
             st.markdown('<div class="insight-card">', unsafe_allow_html=True)
-            st.markdown("### 🎯 POSITIONNEMENT STRATÉGIQUE DE L'ÉGYPTE")
+            st.markdown(f"### 🎯 POSITIONNEMENT STRATÉGIQUE : {pays_focal.upper()}")
             
-            position_egypte = {}
-            for col in indicateurs:
-                valeur = df_region[df_region['Pays'] == 'Égypte'][col].values[0]
-                rang = df_comparison[df_comparison['Pays'] == 'Égypte'][f'Rang_{col}'].values[0]
-                total = len(df_region)
-                position_egypte[col] = {"valeur": valeur, "rang": rang, "total": total}
+            position = cube.position(pays_focal, indicateurs, annee)
             
             cols = st.columns(len(indicateurs))
             for idx, col in enumerate(indicateurs):
                 with cols[idx]:
+                    if position[col]['rang'] is None:
+                        st.metric(label=col.replace('_', ' '), value="n.d.")
+                        continue
                     st.metric(
                         label=col.replace('_', ' '),
-                        value=f"{position_egypte[col]['valeur']:,.0f}",
-                        delta=f"Rang {position_egypte[col]['rang']}/{position_egypte[col]['total']}"
+                        value=f"{position[col]['valeur']:,.0f}",
+                        delta=f"Rang {position[col]['rang']}/{position[col]['total']}"
                     )
             
             st.markdown('</div>', unsafe_allow_html=True)
     
+    @INSTRUMENTATION.section("projections")
     def analyser_projection_futures(self):
         """Projections des capacités futures"""
         st.markdown('<h3 class="section-header">🔮 PROJECTIONS 2025-2030</h3>', 
                    unsafe_allow_html=True)
         
-        # Scénarios de projection
-        scenarios = {
-            "Scenario_Conservative": [89, 87, 85, 84, 82, 80],
-            "Scenario_Moderne": [89, 88, 87, 86, 85, 84],
-            "Scenario_Ambitieux": [89, 90, 91, 92, 93, 94]
-        }
-        
-        annees_projection = list(range(2025, 2031))
-        
-        # Graphique des projections
-        fig = go.Figure()
-        
-        for scenario, valeurs in scenarios.items():
-            nom_scenario = scenario.replace('_', ' ').replace('Scenario ', '')
-            fig.add_trace(go.Scatter(
-                x=annees_projection,
-                y=valeurs,
-                mode='lines+markers',
-                name=nom_scenario,
-                line=dict(width=2, dash='dot' if 'Conservative' in scenario else 'solid')
-            ))
-        
-        # Ajouter les données historiques
-        df_capacites = self.donnees_armee["capacites"]
-        fig.add_trace(go.Scatter(
-            x=df_capacites['Annee'],
-            y=df_capacites['Readiness_Operative'],
-            mode='lines+markers',
-            name='Données Historiques',
-            line=dict(color='#000000', width=3)
-        ))
-        
-        fig.update_layout(
-            title="Projections de Préparation Opérationnelle (2025-2030)",
-            xaxis_title="Année",
-            yaxis_title="Préparation Opérationnelle (%)",
-            height=500
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        # Paramètres des scénarios, ajustables par l'utilisateur
+        scenarios = {}
+        with st.expander("⚙️ Paramètres des scénarios"):
+            cols = st.columns(len(projections.SCENARIOS))
+            for idx, (scenario, defauts) in enumerate(projections.SCENARIOS.items()):
+                with cols[idx]:
+                    st.markdown(f"**{scenario}**")
+                    scenarios[scenario] = {
+                        "croissance_budget": st.slider(
+                            "Croissance budgétaire (%)", 0.0, 40.0, defauts["croissance_budget"], 1.0,
+                            key=f"budget_{scenario}"),
+                        "modernisation": st.slider(
+                            "Intensité de modernisation", 0.0, 1.0, defauts["modernisation"], 0.05,
+                            key=f"modernisation_{scenario}"),
+                        "croissance_entrainement": st.slider(
+                            "Croissance des heures d'entraînement (%)", 0.0, 10.0,
+                            defauts["croissance_entrainement"], 0.5, key=f"entrainement_{scenario}")
+                    }
+            col1, col2 = st.columns(2)
+            n_chemins = col1.select_slider("Trajectoires simulées", [10_000, 100_000, 250_000, 500_000],
+                                           projections.NOMBRE_CHEMINS)
+            graine = col2.number_input("Graine aléatoire", 0, 2**31 - 1, 0)
+        
+        # Graphique des projections Monte Carlo et données historiques
+        bandes = self.charger_projections(scenarios, n_chemins, graine)
+        df_capacites = self.capacites_annuelles
+        cle_scenarios = tuple((nom, tuple(parametres.items())) for nom, parametres in scenarios.items())
+        fig = self.figure("projections_readiness", ["capacites"],
+                          lambda: figures.projections_readiness(df_capacites, bandes),
+                          (cle_scenarios, n_chemins, graine))
+        
+        self.afficher_figure(fig)
+        self.proposer_export("projections", bandes, ["capacites"], (cle_scenarios, n_chemins, graine))
+        
+        # Prévisions statistiques des séries de capacités
+        st.markdown('<div class="sub-section">📈 PRÉVISIONS STATISTIQUES</div>', unsafe_allow_html=True)
+        self.afficher_panneau_differe("Afficher les prévisions statistiques", "panneau_previsions",
+                                      self.analyser_previsions_statistiques)
+        
+        # Balayage de grilles de scénarios, calculé à la demande
+        st.markdown('<div class="sub-section">🧮 BALAYAGE DE SCÉNARIOS</div>', unsafe_allow_html=True)
+        self.afficher_panneau_differe("Afficher le balayage de scénarios", "panneau_balayage",
+                                      self.analyser_balayage_scenarios)
         
         # Analyse des scénarios
         st.markdown('<div class="sub-section">📊 DÉTAIL DES SCÉNARIOS</div>', unsafe_allow_html=True)
@@ -663,19 +804,19 @@ class ArmeeEgypteAnalyseApprofondie:
         scenarios_detail = {
             "Conservative": {
                 "description": "Maintien des capacités actuelles",
-                "investissement": "+5% budget",
+                "investissement": f"+{scenarios['Conservative']['croissance_budget']:.0f}% budget",
                 "modernisation": "Rénovation limitée",
                 "risques": "Décalage technologique"
             },
             "Moderne": {
                 "description": "Modernisation progressive",
-                "investissement": "+15% budget",
+                "investissement": f"+{scenarios['Moderne']['croissance_budget']:.0f}% budget",
                 "modernisation": "Renouvellement partiel",
                 "risques": "Dépendance extérieure"
             },
             "Ambitieux": {
                 "description": "Transformation numérique",
-                "investissement": "+25% budget",
+                "investissement": f"+{scenarios['Ambitieux']['croissance_budget']:.0f}% budget",
                 "modernisation": "Saut technologique",
                 "risques": "Problèmes d'intégration"
             }
@@ -683,8 +824,11 @@ class ArmeeEgypteAnalyseApprofondie:
         
         for idx, (scenario, details) in enumerate(scenarios_detail.items()):
             with cols[idx]:
+                derniere = bandes[scenario].iloc[-1]
                 st.markdown(f"### {scenario}")
                 st.markdown(f"**{details['description']}**")
+                st.metric(f"Préparation {derniere['Annee']:.0f} (médiane)", f"{derniere['P50']:.1f}%",
+                          f"P5-P95 : {derniere['P5']:.1f} - {derniere['P95']:.1f}%", delta_color="off")
                 st.markdown(f"• Investissement: {details['investissement']}")
                 st.markdown(f"• Modernisation: {details['modernisation']}")
                 st.markdown(f"• Risques: {details['risques']}")
@@ -699,6 +843,126 @@ class ArmeeEgypteAnalyseApprofondie:
                     - Intégration numérique: {'progressive' if idx<2 else 'accélérée'}
                     """)
     
+    @INSTRUMENTATION.section("previsions")
+    def analyser_previsions_statistiques(self):
+        """Prévision de chaque indicateur de capacités avec intervalle de confiance"""
+        libelles_modeles = {
+            "tendance": "Tendance linéaire",
+            "arima": "ARIMA(1,1,0) avec dérive",
+            "lissage": "Lissage exponentiel (Holt amorti)"
+        }
+        df_capacites = self.capacites_annuelles
+        col1, col2, col3 = st.columns(3)
+        modele = col1.selectbox("Modèle", list(previsions.MODELES), format_func=libelles_modeles.get,
+                                key="previsions_modele")
+        indicateur = col2.selectbox("Indicateur", list(df_capacites.columns.drop("Annee")),
+                                    key="previsions_indicateur")
+        niveau = col3.select_slider("Niveau de confiance", [0.8, 0.9, 0.95, 0.99], previsions.NIVEAU_CONFIANCE,
+                                    format_func=lambda n: f"{n:.0%}", key="previsions_niveau")
+        
+        # Table par unité : prévision de l'ensemble (moyenne annuelle) ou d'une unité
+        unites = self.charger_unites_suivies()
+        unite = None
+        if len(unites):
+            unite = st.number_input(f"Unité ({len(unites):,} suivies ; vide : ensemble des unités)",
+                                    int(unites[0]), int(unites[-1]), value=None, key="previsions_unite")
+            if unite is not None:
+                if int(unite) not in unites:
+                    st.info(f"Aucune série pour l'unité {unite}")
+                    return
+                df_capacites = annualiser(self.charger_capacites_unite(int(unite)))
+        
+        df_previsions = self.charger_previsions(modele, niveau, unite)
+        fig = self.figure("previsions_statistiques", ["capacites"],
+                          lambda: figures.previsions_statistiques(
+                              df_capacites, df_previsions, indicateur, libelles_modeles[modele], niveau),
+                          (modele, indicateur, niveau, unite))
+        self.afficher_figure(fig)
+    
+    def charger_unites_suivies(self):
+        """Charge les unités (triées) de la table des capacités, vide pour une table nationale"""
+        def calculer():
+            df = self.depot.table("capacites")
+            return np.sort(df["Unite"].unique()) if "Unite" in df.columns else np.array([], dtype="int64")
+        return self.depot.derive("unites_capacites", ("capacites",), calculer)
+    
+    def charger_capacites_unite(self, unite):
+        """Charge les lignes (mois) de l'unité `unite` de la table des capacités"""
+        def calculer():
+            df = self.depot.table("capacites")
+            return df[df["Unite"].to_numpy() == unite].reset_index(drop=True)
+        return self.depot.derive("capacites_unite", ("capacites",), calculer, variante=unite)
+    
+    def charger_previsions(self, modele, niveau, unite=None):
+        """Charge les prévisions des séries de capacités, par version et paramètres
+
+        Sans `unite`, séries annuelles de l'ensemble des unités ; avec, séries
+        de cette unité, dont les modèles sont mis en cache séparément. Les
+        modèles ajustés sont conservés d'une version à l'autre : seules les
+        séries modifiées sont réajustées, ou prolongées quand elles ne gagnent
+        que de nouvelles années (voir previsions.CacheModeles).
+        """
+        def calculer():
+            donnees = self.capacites_annuelles if unite is None else self.charger_capacites_unite(int(unite))
+            return previsions.prevoir_series(donnees, modele, niveau=niveau)
+        return self.depot.derive("previsions_capacites", ["capacites"], calculer, variante=(modele, niveau, unite))
+    
+    @INSTRUMENTATION.section("balayage")
+    def analyser_balayage_scenarios(self):
+        """Balayage budget x localisation industrielle x coopération sur tous les cœurs"""
+        col1, col2, col3 = st.columns(3)
+        budget_min, budget_max = col1.slider("Croissance budgétaire (%)", 0, 40, (0, 40), key="balayage_budget")
+        pas_budget = col1.number_input("Pas budgétaire (%)", 1, 20, 2, key="balayage_pas")
+        niveaux_localisation = col2.slider("Niveaux de localisation industrielle", 2, 21, 6, key="balayage_localisation")
+        niveaux_cooperation = col3.slider("Niveaux de coopération", 2, 11, 3, key="balayage_cooperation")
+        base = col2.selectbox("Scénario de base", list(projections.SCENARIOS), index=1, key="balayage_base")
+        n_chemins = col3.select_slider("Trajectoires par point", [5_000, 20_000, 50_000, 100_000],
+                                       projections.NOMBRE_CHEMINS_BALAYAGE, key="balayage_chemins")
+        
+        grille = projections.grille_scenarios(
+            projections.SCENARIOS[base],
+            croissance_budget=[float(b) for b in range(budget_min, budget_max + 1, pas_budget)],
+            localisation=[round(i / (niveaux_localisation - 1), 3) for i in range(niveaux_localisation)],
+            cooperation=[round(i / (niveaux_cooperation - 1), 3) for i in range(niveaux_cooperation)]
+        )
+        st.caption(f"{len(grille)} combinaisons, résultats mémorisés par jeu de paramètres")
+        
+        if st.button("Lancer le balayage", key="balayage_lancer"):
+            depart = self.magasin.fenetre("Readiness_Operative")["dernier"]
+            progression = st.progress(0.0)
+            apercu = st.empty()
+            resultats = []
+            with instrumentation.phase("calcul"):
+                for resultat in projections.balayer_scenarios(grille, depart, n_chemins=n_chemins):
+                    resultats.append(resultat)
+                    # Affichage partiel au fil des lots terminés
+                    if len(resultats) % 50 == 0 or len(resultats) == len(grille):
+                        progression.progress(len(resultats) / len(grille),
+                                             text=f"{len(resultats)}/{len(grille)} combinaisons")
+                        apercu.dataframe(pd.DataFrame(resultats[-10:]), use_container_width=True)
+            apercu.empty()
+            st.session_state["balayage_resultats"] = pd.DataFrame(resultats)
+        
+        df_balayage = st.session_state.get("balayage_resultats")
+        if df_balayage is not None and not df_balayage.empty:
+            niveaux = sorted(df_balayage['cooperation'].unique())
+            cooperation = st.select_slider("Niveau de coopération affiché", niveaux, niveaux[-1],
+                                           key="balayage_niveau")
+            self.afficher_figure(figures.carte_balayage(df_balayage, cooperation))
+            st.markdown("**Meilleures combinaisons (préparation médiane)**")
+            self.afficher_tableau(df_balayage.nlargest(10, 'P50'))
+    
+    def charger_projections(self, scenarios, n_chemins, graine):
+        """Charge les bandes Monte Carlo des scénarios, mises en cache par paramètres"""
+        depart = self.magasin.fenetre("Readiness_Operative")["dernier"]
+        variante = (tuple((nom, tuple(parametres.items())) for nom, parametres in scenarios.items()),
+                    n_chemins, graine)
+        return self.depot.derive(
+            "projections_readiness", ["capacites"],
+            lambda: projections.projeter_scenarios(depart, scenarios, n_chemins=n_chemins, graine=graine),
+            variante=variante
+        )
+    
     def creer_tableau_bord_complet(self):
         """Crée un tableau de bord complet avec toutes les analyses"""
         # Sidebar
@@ -708,46 +972,71 @@ class ArmeeEgypteAnalyseApprofondie:
         self.afficher_header()
         
         # Navigation basée sur la sélection
-        if controls['niveau_analyse'] == "Vue d'ensemble":
-            self.afficher_vue_ensemble(controls)
-        elif controls['niveau_analyse'] == "Structure organisationnelle":
-            self.analyser_structure_organisationnelle()
-        elif controls['niveau_analyse'] == "Capacités opérationnelles":
-            self.analyser_capacites_operationnelles(controls['periode'])
-        elif controls['niveau_analyse'] == "Modernisation":
-            self.analyser_equipements_modernisation()
-        elif controls['niveau_analyse'] == "Comparaison régionale":
-            self.analyser_comparaison_regionale()
-        elif controls['niveau_analyse'] == "Projections futures":
-            self.analyser_projection_futures()
-        
-        # Affichage des données détaillées si demandé
+        niveau = controls['niveau_analyse']
+        if niveau == "Vue d'ensemble":
+            section = lambda: self.afficher_vue_ensemble(controls)
+        elif niveau == "Structure organisationnelle":
+            # Fragment : descendre dans l'ordre de bataille ne relance que cette section
+            section = st.fragment(self.analyser_structure_organisationnelle)
+        elif niveau == "Capacités opérationnelles":
+            section = lambda: self.analyser_capacites_operationnelles(controls['periode'])
+        elif niveau == "Modernisation":
+            section = self.analyser_equipements_modernisation
+        elif niveau == "Comparaison régionale":
+            # Fragment : changer d'indicateurs ne relance que cette section
+            section = st.fragment(self.analyser_comparaison_regionale)
+        elif niveau == "Projections futures":
+            # Fragment : ajuster un scénario ne relance que cette section
+            section = st.fragment(self.analyser_projection_futures)
+        rendus = [(self.DONNEES_SECTIONS[niveau], section)]
+        
+        # Affichage des données détaillées si demandé (panneau différé : rien à attendre)
         if controls['afficher_details']:
-            self.afficher_donnees_detaillees()
+            rendus.append(((), self.afficher_donnees_detaillees))
         
         # Mode expert
         if controls['mode_expert']:
-            self.afficher_mode_expert()
+            rendus.append((("metriques",), self.afficher_mode_expert))
+        
+        self.rendre_progressivement(rendus)
     
+    def rendre_progressivement(self, rendus):
+        """Affiche chaque section dès que ses données sont prêtes, un espace réservé en attendant
+
+        `rendus` : liste de (données attendues, rendu), dans l'ordre de la
+        page. Tous les chargements sont lancés d'emblée ; chaque section est
+        rendue à sa place, dans l'ordre d'arrivée de ses données.
+        """
+        emplacements = []
+        for noms, _ in rendus:
+            futures = self.charger_en_fond(noms)
+            emplacement = st.empty()
+            if not all(future.done() for future in futures):
+                emplacement.info("⏳ Chargement des données de la section...")
+            emplacements.append(emplacement)
+        
+        restants = list(range(len(rendus)))
+        while restants:
+            prets = [i for i in restants if all(f.done() for f in self.charger_en_fond(rendus[i][0]))]
+            if not prets:
+                wait([f for i in restants for f in self.charger_en_fond(rendus[i][0]) if not f.done()],
+                     return_when=FIRST_COMPLETED)
+                continue
+            for i in prets:
+                restants.remove(i)
+                with emplacements[i].container():
+                    rendus[i][1]()
+    
+    @INSTRUMENTATION.section("vue_ensemble")
     def afficher_vue_ensemble(self, controls):
         """Affiche une vue d'ensemble complète"""
         st.markdown('<h3 class="section-header">📊 VUE D\'ENSEMBLE STRATÉGIQUE</h3>', 
                    unsafe_allow_html=True)
         
-        # Métriques synthétiques
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("Effectifs Totaux", "462,000", "+5.5% vs 2012")
-        
-        with col2:
-            st.metric("Chars Principaux", "3,760", "+10.6% vs 2012")
-        
-        with col3:
-            st.metric("Budget 2024", "8.8 Md$", "+110% vs 2012")
-        
-        with col4:
-            st.metric("Préparation Opé", "89%", "+27% vs 2012")
+        # Métriques synthétiques, issues du même magasin que les cartes détaillées
+        for col, (titre, valeur, evolution) in zip(st.columns(4), cartes_vue_ensemble(self.magasin)):
+            with col:
+                st.metric(titre, valeur, evolution or None)
         
         # Vue synthétique
         col1, col2 = st.columns(2)
@@ -781,75 +1070,37 @@ class ArmeeEgypteAnalyseApprofondie:
         
         if controls['comparer_region']:
             st.markdown('<div class="sub-section">🌍 CONTEXTE RÉGIONAL</div>', unsafe_allow_html=True)
-            self.analyser_comparaison_regionale()
+            self.afficher_panneau_differe("Afficher la comparaison régionale", "panneau_contexte_regional",
+                                          self.analyser_comparaison_regionale)
     
+    @INSTRUMENTATION.section("donnees_detaillees")
     def afficher_donnees_detaillees(self):
         """Affiche les données détaillées en format tabulaire"""
-        with st.expander("📁 DONNÉES DÉTAILLÉES (Cliquez pour développer)"):
-            tab1, tab2, tab3 = st.tabs(["Structure", "Équipements", "Capacités"])
-            
-            with tab1:
-                st.dataframe(self.donnees_armee["structure"], use_container_width=True)
-            
-            with tab2:
-                st.dataframe(self.donnees_armee["equipements"], use_container_width=True)
-            
-            with tab3:
-                st.dataframe(self.donnees_armee["capacites"], use_container_width=True)
+        self.afficher_panneau_differe("📁 DONNÉES DÉTAILLÉES (Activer pour afficher)", "panneau_donnees_detaillees",
+                                      self.afficher_table_detaillee)
     
+    @INSTRUMENTATION.section("table_detaillee")
+    def afficher_table_detaillee(self):
+        """Affiche la seule table sélectionnée parmi les données détaillées"""
+        tables = {"Structure": "structure", "Équipements": "equipements", "Capacités": "capacites"}
+        choix = st.radio("Table", list(tables), horizontal=True, label_visibility="collapsed",
+                         key="table_detaillee")
+        self.afficher_table_paginee(f"detail_{tables[choix]}", self.donnees_armee[tables[choix]], [tables[choix]])
+    
+    @INSTRUMENTATION.section("mode_expert")
     def afficher_mode_expert(self):
         """Affiche des analyses expert supplémentaires"""
         st.markdown('<div class="section-header">🔬 MODE EXPERT - ANALYSES AVANCÉES</div>', 
                    unsafe_allow_html=True)
         
-        # Analyse de corrélation
+        # Analyses graphiques, calculées uniquement à l'ouverture de leur panneau
         st.markdown('<div class="sub-section">📈 ANALYSE DE CORRÉLATION</div>', unsafe_allow_html=True)
+        self.afficher_panneau_differe("Afficher la matrice de corrélation", "panneau_correlations",
+                                      self.analyser_correlations, ouvert=True)
         
-        df_capacites = self.donnees_armee["capacites"]
-        correlations = df_capacites.corr()
-        
-        fig = px.imshow(correlations,
-                       text_auto='.2f',
-                       color_continuous_scale='RdBu_r',
-                       title="Matrice de Corrélation entre Indicateurs")
-        
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Analyse des tendances temporelles
         st.markdown('<div class="sub-section">⏰ ANALYSE DES TENDANCES TEMPORELLES</div>', unsafe_allow_html=True)
-        
-        # Calcul des taux de croissance annuels
-        df_capacites['Croissance_Readiness'] = df_capacites['Readiness_Operative'].pct_change() * 100
-        df_capacites['Croissance_Exercices'] = df_capacites['Exercices_Combines'].pct_change() * 100
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=df_capacites['Annee'][1:],
-            y=df_capacites['Croissance_Readiness'][1:],
-            mode='lines+markers',
-            name='Croissance Préparation (%)',
-            line=dict(color='#CE1126', width=3)
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=df_capacites['Annee'][1:],
-            y=df_capacites['Croissance_Exercices'][1:],
-            mode='lines+markers',
-            name='Croissance Exercices (%)',
-            line=dict(color='#FECB00', width=3),
-            yaxis='y2'
-        ))
-        
-        fig.update_layout(
-            title="Taux de Croissance Annuels (%)",
-            xaxis_title="Année",
-            yaxis=dict(title='Croissance Préparation (%)', side='left'),
-            yaxis2=dict(title='Croissance Exercices (%)', side='right', overlaying='y'),
-            height=400
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        self.afficher_panneau_differe("Afficher les taux de croissance", "panneau_tendances",
+                                      self.analyser_tendances_temporelles)
         
         # Analyse SWOT approfondie
         st.markdown('<div class="sub-section">🎯 ANALYSE SWOT APPROFONDIE</div>', unsafe_allow_html=True)
@@ -893,9 +1144,57 @@ class ArmeeEgypteAnalyseApprofondie:
                 for element in elements:
                     st.markdown(f"• {element}")
 
+    @INSTRUMENTATION.section("correlations")
+    def analyser_correlations(self):
+        """Matrice de corrélation entre indicateurs de capacités"""
+        fig = self.figure("matrice_correlation", ["capacites"],
+                          lambda: figures.matrice_correlation(self.charger_metriques()["correlations"]))
+        self.afficher_figure(fig)
+    
+    @INSTRUMENTATION.section("tendances")
+    def analyser_tendances_temporelles(self):
+        """Taux de croissance annuels des indicateurs de capacités"""
+        fig = self.figure("croissances_annuelles", ["capacites"],
+                          lambda: figures.croissances_annuelles(self.charger_metriques()["croissances"]))
+        self.afficher_figure(fig)
+
+    def afficher_metriques(self):
+        """Affiche les compteurs du cache au format Prometheus (?metriques=1)"""
+        st.code(self.depot.cache.metriques_prometheus() + CACHE_FIGURES.metriques_prometheus()
+                + previsions.CACHE_MODELES.metriques_prometheus() + exports.CACHE_EXPORTS.metriques_prometheus()
+                + INSTRUMENTATION.metriques_prometheus(),
+                language=None)
+
+    def afficher_diagnostics(self):
+        """Panneau de diagnostic des sections (?diagnostics=1) : durée par phase et octets envoyés
+
+        Tous les appels de la session sont alors mesurés ; les moyennes
+        agrègent aussi les appels échantillonnés des autres sessions.
+        """
+        st.markdown('<div class="section-header">🩺 DIAGNOSTICS DES SECTIONS</div>', unsafe_allow_html=True)
+        st.button("Actualiser", key="diagnostics_actualiser")
+        st.caption(f"Échantillonnage hors diagnostic : {INSTRUMENTATION.taux:.0%} des appels")
+        synthese = pd.DataFrame(INSTRUMENTATION.synthese())
+        if synthese.empty:
+            st.info("Aucune section mesurée pour l'instant")
+            return
+        st.dataframe(synthese, use_container_width=True, hide_index=True)
+        st.markdown("**Derniers appels mesurés**")
+        st.dataframe(pd.DataFrame(list(INSTRUMENTATION.historique)[::-1]), use_container_width=True,
+                     hide_index=True)
+
     def run(self):
         """Exécute le dashboard complet"""
+        if st.query_params.get("metriques"):
+            self.afficher_metriques()
+            return
+        if st.query_params.get("diagnostics"):
+            st.session_state[instrumentation.CLE_DIAGNOSTICS] = True
+        self.rafraichir_donnees()
         self.creer_tableau_bord_complet()
+        if st.session_state.get(instrumentation.CLE_DIAGNOSTICS):
+            # Fragment : actualiser le panneau ne relance pas la page
+            st.fragment(self.afficher_diagnostics)()
 
 # Lancement du dashboard
 if __name__ == "__main__":
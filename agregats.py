@@ -0,0 +1,366 @@
+# agregats.py
+"""Agrégats précalculés servant les métriques du dashboard"""
+import copy
+
+import numpy as np
+import pandas as pd
+
+from stockage import COLONNES_DETAIL
+
+# Préfixe des colonnes de quantités annuelles de la table des équipements
+PREFIXE_QUANTITE = "Quantite_"
+
+# Pays focal par défaut des comparaisons régionales
+PAYS_FOCAL_DEFAUT = "Égypte"
+
+# Année d'une table régionale sans colonne d'année (instantané)
+ANNEE_REGIONALE_DEFAUT = 2024
+
+
+class SerieIndicateur:
+    """Série annuelle d'un indicateur, indexée pour des requêtes de fenêtre en O(1)
+
+    Les minimums et maximums de toute fenêtre sont lus dans des tables
+    clairsemées (sparse tables) ; les bornes de la fenêtre sont converties
+    en positions par des tables de correspondance année -> indice.
+    """
+
+    def __init__(self, annees, valeurs):
+        annees = np.asarray(annees)
+        valeurs = np.asarray(valeurs, dtype=float)
+        valides = ~np.isnan(valeurs)
+        ordre = np.argsort(annees[valides], kind="stable")
+        self.annees = annees[valides][ordre].astype(int)
+        self.valeurs = valeurs[valides][ordre]
+        self._indexer()
+
+    def _indexer(self):
+        # Niveau k : extremum des 2**k valeurs commençant à chaque position
+        self._minimums = [self.valeurs]
+        self._maximums = [self.valeurs]
+        largeur = 1
+        while 2 * largeur <= len(self.valeurs):
+            precedent_min, precedent_max = self._minimums[-1], self._maximums[-1]
+            self._minimums.append(np.minimum(precedent_min[:-largeur], precedent_min[largeur:]))
+            self._maximums.append(np.maximum(precedent_max[:-largeur], precedent_max[largeur:]))
+            largeur *= 2
+
+        if len(self.annees):
+            plage = np.arange(self.annees[0], self.annees[-1] + 1)
+            self._position_debut = np.searchsorted(self.annees, plage, side="left")
+            self._position_fin = np.searchsorted(self.annees, plage, side="right") - 1
+        # Tableaux partagés entre instantanés : jamais modifiés en place (ajouter les remplace)
+        for tableau in (self.annees, self.valeurs, *self._minimums, *self._maximums):
+            tableau.flags.writeable = False
+
+    def ajouter(self, annee, valeur):
+        """Ajoute la valeur d'une nouvelle année, postérieure à la dernière connue"""
+        if len(self.annees) and annee <= self.annees[-1]:
+            raise ValueError(f"L'année {annee} n'est pas postérieure à {self.annees[-1]}")
+        self.annees = np.append(self.annees, int(annee))
+        self.valeurs = np.append(self.valeurs, float(valeur))
+        self._indexer()
+
+    def fenetre(self, debut=None, fin=None):
+        """Renvoie premier/dernier/min/max/croissance sur [debut, fin], ou None si vide"""
+        if not len(self.annees):
+            return None
+        premiere, derniere = self.annees[0], self.annees[-1]
+        debut = premiere if debut is None else max(debut, premiere)
+        fin = derniere if fin is None else min(fin, derniere)
+        if debut > fin:
+            return None
+        i = int(self._position_debut[debut - premiere])
+        j = int(self._position_fin[fin - premiere])
+        if i > j:
+            return None
+
+        niveau = (j - i + 1).bit_length() - 1
+        decalage = j - (1 << niveau) + 1
+        premier, dernier = self.valeurs[i], self.valeurs[j]
+        return {
+            "annee_debut": int(self.annees[i]),
+            "annee_fin": int(self.annees[j]),
+            "premier": premier,
+            "dernier": dernier,
+            "minimum": min(self._minimums[niveau][i], self._minimums[niveau][decalage]),
+            "maximum": max(self._maximums[niveau][i], self._maximums[niveau][decalage]),
+            "croissance": (dernier - premier) / premier * 100 if premier else np.nan
+        }
+
+
+class MagasinIndicateurs:
+    """Agrégats par indicateur pour toute fenêtre d'années
+
+    Alimente les cartes de métriques du dashboard : chaque fenêtre du
+    sélecteur de période est servie sans parcourir les séries.
+    """
+
+    def __init__(self, series=None):
+        self.series = {}
+        for indicateur, (annees, valeurs) in (series or {}).items():
+            self.series[indicateur] = SerieIndicateur(annees, valeurs)
+
+    def __contains__(self, indicateur):
+        return indicateur in self.series
+
+    def instantane(self):
+        """Renvoie une copie indépendante : `ajouter` sur la copie ne touche pas ce magasin
+
+        Les séries sont copiées superficiellement et partagent leurs tableaux,
+        en lecture seule.
+        """
+        copie = MagasinIndicateurs()
+        copie.series = {indicateur: copy.copy(serie) for indicateur, serie in self.series.items()}
+        return copie
+
+    def fenetre(self, indicateur, debut=None, fin=None):
+        """Renvoie les agrégats de `indicateur` sur [debut, fin]"""
+        return self.series[indicateur].fenetre(debut, fin)
+
+    def ajouter(self, annee, valeurs):
+        """Ajoute une nouvelle année à chaque indicateur de `valeurs`"""
+        for indicateur, valeur in valeurs.items():
+            if indicateur in self.series:
+                self.series[indicateur].ajouter(annee, valeur)
+            else:
+                self.series[indicateur] = SerieIndicateur([annee], [valeur])
+
+
+# Cartes de la vue d'ensemble : indicateur, titre, format et facteur de la valeur,
+# décimales de l'évolution
+CARTES_VUE_ENSEMBLE = (
+    ("Effectifs_Actifs_K", "Effectifs Totaux", "{:,.0f}", 1000, 1),
+    ("Chars Principaux", "Chars Principaux", "{:,.0f}", 1, 1),
+    ("Budget_Defense_MdUSD", "Budget {annee_fin}", "{:.1f} Md$", 1 / 1000, 0),
+    ("Readiness_Operative", "Préparation Opé", "{:.0f}%", 1, 0)
+)
+
+
+def cartes_vue_ensemble(magasin, periode=None):
+    """Renvoie les cartes (titre, valeur, évolution) de la vue d'ensemble
+
+    La préparation opérationnelle est lue sur `periode`, les autres
+    indicateurs sur toutes leurs années. Un indicateur sans année dans sa
+    fenêtre vaut "n.d.", sans évolution.
+    """
+    cartes = []
+    for indicateur, titre, format_valeur, facteur, decimales in CARTES_VUE_ENSEMBLE:
+        bornes = periode if indicateur == "Readiness_Operative" and periode is not None else ()
+        fenetre = magasin.fenetre(indicateur, *bornes)
+        if fenetre is None:
+            cartes.append((titre.format(annee_fin="").strip(), "n.d.", ""))
+            continue
+        cartes.append((titre.format(**fenetre), format_valeur.format(fenetre["dernier"] * facteur),
+                       f"{fenetre['croissance']:+.{decimales}f}% vs {fenetre['annee_debut']}"))
+    return cartes
+
+
+def annualiser(df, colonne_annee="Annee"):
+    """Ramène une table chronologique à une ligne par année
+
+    Une table à grain fin (une ligne par unité et par mois, colonnes Unite
+    et Mois des jeux synthétiques) est moyennée par année ; une table déjà
+    annuelle, comme les fixtures, est renvoyée sans ses colonnes de détail.
+    """
+    df = df.drop(columns=[c for c in COLONNES_DETAIL if c in df.columns])
+    if df[colonne_annee].is_unique:
+        return df
+    return df.groupby(colonne_annee, sort=True).mean(numeric_only=True).reset_index()
+
+
+def mensualiser(df, colonne_annee="Annee"):
+    """Ramène une table par unité et par mois à une ligne par mois, datée (colonne Date)
+
+    Les unités sont moyennées ; la colonne Date est le premier jour du mois.
+    """
+    df = dater(df, colonne_annee).drop(columns=[c for c in COLONNES_DETAIL if c in df.columns])
+    return df.groupby("Date", sort=True).mean(numeric_only=True).reset_index()
+
+
+def dater(df, colonne_annee="Annee"):
+    """Ajoute la colonne Date (premier jour du mois, colonnes Annee et Mois) et trie par date"""
+    dates = pd.to_datetime(pd.DataFrame({"year": df[colonne_annee], "month": df["Mois"], "day": 1}))
+    return df.assign(Date=dates).sort_values("Date", kind="stable", ignore_index=True)
+
+
+def equipements_par_type(df_equipements):
+    """Ramène les inventaires par unité (colonne Unite) à une ligne par type d'équipement
+
+    Les quantités sont sommées et le taux de modernité moyenné, pondéré par
+    le parc 2024. Une table sans colonne Unite est renvoyée telle quelle.
+    """
+    if "Unite" not in df_equipements.columns:
+        return df_equipements
+    colonnes = [c for c in df_equipements.columns if c.startswith(PREFIXE_QUANTITE)]
+    types = df_equipements["Type"]
+    par_type = df_equipements[colonnes].groupby(types, sort=False, observed=True).sum()
+    modernite = (df_equipements["Taux_Modernite"] * df_equipements["Quantite_2024"]).groupby(
+        types, sort=False, observed=True).sum()
+    par_type["Taux_Modernite"] = (modernite / par_type["Quantite_2024"]).round(1)
+    return par_type.reset_index()
+
+
+def calculer_croissances(df, colonne_annee="Annee"):
+    """Calcule les taux de croissance annuels (%) de chaque indicateur de `df`
+
+    Renvoie un nouveau DataFrame (Annee, Croissance_<indicateur>...), sans
+    modifier `df`.
+    """
+    indicateurs = df.columns.drop(colonne_annee)
+    croissances = df[indicateurs].pct_change() * 100
+    croissances.columns = [f"Croissance_{col}" for col in indicateurs]
+    croissances.insert(0, colonne_annee, df[colonne_annee])
+    return croissances
+
+
+def calculer_metriques_derivees(tables, colonne_annee="Annee"):
+    """Calcule en une passe les métriques dérivées lues par les rendus
+
+    Calculé une fois par version de la table `capacites`. Renvoie un
+    dictionnaire de DataFrames :
+    - "correlations" : matrice de corrélation des colonnes de capacités ;
+    - "croissances" : taux de croissance annuels (voir calculer_croissances).
+    Les rangs et normalisations régionaux sont servis par CubeRegional.
+    """
+    metriques = {}
+
+    df_capacites = tables.get("capacites")
+    if df_capacites is not None:
+        df_capacites = annualiser(df_capacites, colonne_annee)
+        metriques["correlations"] = df_capacites.corr(numeric_only=True)
+        metriques["croissances"] = calculer_croissances(df_capacites, colonne_annee)
+
+    return metriques
+
+
+def detail_equipements(df_equipements):
+    """Renvoie une ligne par type d'équipement : parcs 2012 et 2024, croissance (%) et modernité"""
+    detail = df_equipements[["Type", "Quantite_2012", "Quantite_2024", "Taux_Modernite"]]
+    depart = detail["Quantite_2012"].where(detail["Quantite_2012"] != 0)
+    croissance = (detail["Quantite_2024"] - depart) / depart * 100
+    return detail.assign(Croissance=croissance.round(1)).reset_index(drop=True)
+
+
+class CubeRegional:
+    """Cube pays x indicateur x année de la table régionale, normalisé et classé une fois
+
+    Pour chaque indicateur et chaque année : valeurs, valeurs normalisées
+    (% du maximum régional) et rang dense décroissant parmi les pays
+    renseignés. Changer de pays focal, d'indicateurs ou d'année ne fait
+    que lire une tranche. Une table sans colonne d'année est l'instantané
+    de `annee_defaut`. Les tableaux du cube sont en lecture seule.
+    """
+
+    def __init__(self, df_region, colonne_pays="Pays", colonne_annee="Annee",
+                 annee_defaut=ANNEE_REGIONALE_DEFAUT):
+        self.colonne_pays = colonne_pays
+        self.indicateurs = [c for c in df_region.select_dtypes("number").columns if c != colonne_annee]
+        codes_pays, pays = pd.factorize(df_region[colonne_pays])
+        if colonne_annee in df_region.columns:
+            codes_annees, annees = pd.factorize(df_region[colonne_annee], sort=True)
+        else:
+            codes_annees, annees = np.zeros(len(df_region), dtype=np.int64), [annee_defaut]
+        self.pays = tuple(str(p) for p in pays)
+        self.annees = tuple(int(a) for a in annees)
+        self._index_pays = {p: i for i, p in enumerate(self.pays)}
+        self._index_annees = {a: k for k, a in enumerate(self.annees)}
+
+        forme = (len(self.pays), len(self.indicateurs), len(self.annees))
+        self.valeurs = np.full(forme, np.nan)
+        self.valeurs[codes_pays, :, codes_annees] = df_region[self.indicateurs].to_numpy(dtype=float)
+        self.indicateurs = tuple(self.indicateurs)
+        # Ligne de la table source de chaque (pays, année), -1 si absente
+        self._lignes = np.full((forme[0], forme[2]), -1)
+        self._lignes[codes_pays, codes_annees] = np.arange(len(df_region))
+        self._df = df_region
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.normalisees = self.valeurs / np.nanmax(self.valeurs, axis=0, initial=-np.inf,
+                                                        where=~np.isnan(self.valeurs)) * 100
+        # Rang dense décroissant, colonne par colonne (indicateur, année) ; NaN pour un pays absent
+        plat = pd.DataFrame(self.valeurs.reshape(forme[0], -1))
+        self.rangs = plat.rank(ascending=False, method="dense").to_numpy().reshape(forme)
+        self.totaux = (~np.isnan(self.valeurs)).sum(axis=0)
+        for tableau in (self.valeurs, self._lignes, self.normalisees, self.rangs, self.totaux):
+            tableau.flags.writeable = False
+
+    def instantane(self):
+        """Renvoie une copie superficielle : tableaux partagés, en lecture seule"""
+        return copy.copy(self)
+
+    def _annee(self, annee):
+        return self._index_annees[self.annees[-1] if annee is None else annee]
+
+    def _presents(self, k):
+        return np.flatnonzero(self._lignes[:, k] >= 0)
+
+    def pays_focal(self, pays=None):
+        """Renvoie `pays` s'il est dans le cube, sinon le pays focal par défaut ou le premier pays"""
+        for candidat in (pays, PAYS_FOCAL_DEFAUT):
+            if candidat in self._index_pays:
+                return candidat
+        return self.pays[0]
+
+    def normalise(self, indicateurs, annee=None):
+        """Renvoie, pour l'année (par défaut la dernière), les `indicateurs` en % du maximum régional"""
+        k = self._annee(annee)
+        presents = self._presents(k)
+        colonnes = [self.indicateurs.index(i) for i in indicateurs]
+        df = pd.DataFrame(self.normalisees[presents][:, colonnes, k], columns=list(indicateurs))
+        df.insert(0, self.colonne_pays, np.asarray(self.pays, dtype=object)[presents])
+        return df
+
+    def tableau(self, indicateurs, annee=None):
+        """Renvoie les lignes de la table régionale de l'année, complétées des rangs des `indicateurs`"""
+        k = self._annee(annee)
+        presents = self._presents(k)
+        df = self._df.iloc[self._lignes[presents, k]].reset_index(drop=True)
+        # Rang manquant (valeur absente du pays) : <NA> dans une colonne entière nullable
+        for indicateur in indicateurs:
+            df[f"Rang_{indicateur}"] = pd.array(self.rangs[presents, self.indicateurs.index(indicateur), k],
+                                                dtype="Int64")
+        return df
+
+    def position(self, pays, indicateurs, annee=None):
+        """Renvoie {indicateur: {"valeur", "rang", "total"}} du pays pour l'année"""
+        k, p = self._annee(annee), self._index_pays[pays]
+        position = {}
+        for indicateur in indicateurs:
+            i = self.indicateurs.index(indicateur)
+            rang = self.rangs[p, i, k]
+            position[indicateur] = {"valeur": self.valeurs[p, i, k],
+                                    "rang": int(rang) if not np.isnan(rang) else None,
+                                    "total": int(self.totaux[i, k])}
+        return position
+
+
+def construire_magasin(tables, colonne_annee="Annee"):
+    """Construit le magasin d'indicateurs à partir des tables du dépôt
+
+    Les tables chronologiques (`capacites`, `reperes`) fournissent une série
+    par colonne ; la table `equipements` une série par type d'équipement, à
+    partir de ses colonnes Quantite_AAAA. Les tables à grain fin sont
+    d'abord ramenées à une ligne par année et par type (voir annualiser,
+    equipements_par_type).
+    """
+    series = {}
+    for nom in ("capacites", "reperes"):
+        df = tables.get(nom)
+        if df is None:
+            continue
+        df = annualiser(df, colonne_annee)
+        annees = df[colonne_annee].to_numpy()
+        for colonne in df.columns.drop(colonne_annee):
+            series[colonne] = (annees, df[colonne].to_numpy())
+
+    df_equipements = tables.get("equipements")
+    if df_equipements is not None:
+        df_equipements = equipements_par_type(df_equipements)
+        colonnes = [c for c in df_equipements.columns if c.startswith(PREFIXE_QUANTITE)]
+        annees = np.array([int(c[len(PREFIXE_QUANTITE):]) for c in colonnes])
+        quantites = df_equipements[colonnes].to_numpy()
+        for type_equipement, ligne in zip(df_equipements["Type"], quantites):
+            series[type_equipement] = (annees, ligne)
+
+    return MagasinIndicateurs(series)
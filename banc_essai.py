@@ -0,0 +1,269 @@
+# banc_essai.py
+"""Banc d'essai des sections du dashboard sur des jeux synthétiques agrandis
+
+Chaque section analyser_* / afficher_mode_expert est exécutée seule, dans
+une exécution Streamlit de test (AppTest), sur les fixtures agrandies 1x,
+100x et 10 000x. Mesures : durée du chargement des données de la
+section (attendu avant la section), durée à froid (caches vides) et à chaud
+(ré-exécution), pic mémoire Python (tracemalloc, exécution séparée) et
+octets envoyés au navigateur (figures et total des éléments).
+
+    python banc_essai.py                                  # 1x, 100x, 10 000x
+    python banc_essai.py --echelles 1 100 --json bancs/reference.json
+    python banc_essai.py --comparer bancs/reference.json --tolerance 25
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ECHELLES = (1, 100, 10_000)
+
+# Section -> arguments de la méthode
+SECTIONS = {
+    "analyser_structure_organisationnelle": (),
+    "analyser_capacites_operationnelles": ((2012, 2024),),
+    "analyser_equipements_modernisation": (),
+    "analyser_comparaison_regionale": (),
+    "analyser_projection_futures": (),
+    "afficher_mode_expert": ()
+}
+
+# Section -> niveau d'analyse du dashboard, dont les données (DONNEES_SECTIONS) sont
+# chargées en arrière-plan avant la section
+NIVEAUX = {
+    "analyser_structure_organisationnelle": "Structure organisationnelle",
+    "analyser_capacites_operationnelles": "Capacités opérationnelles",
+    "analyser_equipements_modernisation": "Modernisation",
+    "analyser_comparaison_regionale": "Comparaison régionale",
+    "analyser_projection_futures": "Projections futures",
+    "afficher_mode_expert": None
+}
+
+# Libellé rendu unique à chaque copie d'une ligne, par table
+LIBELLES = {
+    "structure": "Commandements",
+    "equipements": "Type",
+    "regionales": "Pays",
+    "programmes": "Programme",
+    "unites": "Commandement"
+}
+
+# Bornes des indicateurs en pourcentage, respectées par le bruit ajouté
+BORNES = {
+    "Readiness_Operative": (1, 99),
+    "Taux_Modernite": (0, 100)
+}
+
+# Écarts en deçà desquels une variation n'est pas une régression (bruit de mesure)
+SEUILS_BRUIT = {"chargement_s": 0.02, "froid_s": 0.02, "chaud_s": 0.02, "pic_octets": 1 << 20, "figures_octets": 1024,
+                "total_octets": 1024}
+
+
+def agrandir(table, df, echelle, generateur):
+    """Répète `df` `echelle` fois ; libellés numérotés et valeurs bruitées (+/- 10 %) pour les copies"""
+    if echelle == 1:
+        return df
+    grand = pd.concat([df] * echelle, ignore_index=True)
+    copie = np.repeat(np.arange(echelle), len(df))
+    libelle = LIBELLES.get(table)
+    if libelle is not None:
+        suffixes = np.where(copie == 0, "", " #" + copie.astype(str))
+        grand[libelle] = grand[libelle].astype(str) + suffixes
+    for colonne in grand.select_dtypes("number").columns.drop("Annee", errors="ignore"):
+        if colonne in ("Debut", "Fin"):
+            continue
+        valeurs = grand[colonne].to_numpy(dtype=float) * generateur.uniform(0.9, 1.1, len(grand))
+        valeurs[copie == 0] = grand[colonne].to_numpy(dtype=float)[copie == 0]
+        if colonne in BORNES:
+            valeurs = np.clip(valeurs, *BORNES[colonne])
+        grand[colonne] = valeurs.round() if pd.api.types.is_integer_dtype(grand[colonne].dtype) else valeurs
+        if pd.api.types.is_integer_dtype(df[colonne].dtype):
+            grand[colonne] = grand[colonne].astype("int64")
+    return grand
+
+
+def generer_jeu(echelle, repertoire, graine=0):
+    """Écrit dans `repertoire` les fixtures agrandies `echelle` fois (Parquet)
+
+    Les tables chronologiques gardent leurs années : chaque année compte
+    alors `echelle` observations, comme des relevés par unité.
+    """
+    from stockage import FIXTURES, ecrire_table
+
+    os.makedirs(repertoire, exist_ok=True)
+    generateur = np.random.default_rng(graine)
+    for table, chargeur in FIXTURES.items():
+        chemin = os.path.join(repertoire, f"{table}.parquet")
+        if not os.path.exists(chemin):
+            ecrire_table(agrandir(table, chargeur(), echelle, generateur), chemin)
+    return repertoire
+
+
+def _executer_section(section, repertoire, arguments, niveau, mesurer_memoire):
+    # Script exécuté par AppTest : importe le dashboard et n'appelle qu'une section
+    import time
+    import tracemalloc
+
+    import streamlit as st
+
+    from donnees import CacheDonnees, DepotDonnees
+    from stockage import SourceArrow
+    from Dashboard import ArmeeEgypteAnalyseApprofondie
+
+    if "depot" not in st.session_state:
+        st.session_state["depot"] = DepotDonnees(SourceArrow(repertoire), cache=CacheDonnees())
+    if mesurer_memoire:
+        tracemalloc.start()
+    debut = time.perf_counter()
+    app = ArmeeEgypteAnalyseApprofondie(st.session_state["depot"])
+    # Le constructeur ne fait que lancer les chargements : ils sont attendus ici pour
+    # être imputés au chargement, et non à la durée de la section
+    noms = app.CHARGEMENTS_INITIAUX + app.DONNEES_SECTIONS.get(niveau, ())
+    for future in app.charger_en_fond(noms):
+        future.result()
+    chargement = time.perf_counter() - debut
+    getattr(app, section)(*arguments)
+    duree = time.perf_counter() - debut - chargement
+    pic = tracemalloc.get_traced_memory()[1] if mesurer_memoire else None
+    tracemalloc.stop()
+    st.session_state["mesure"] = {"chargement_s": chargement, "duree_s": duree, "pic_octets": pic}
+
+
+def _octets(noeud):
+    """Octets des éléments de l'arbre AppTest : (figures, total)"""
+    figures_octets = total = 0
+    proto = getattr(noeud, "proto", None)
+    if proto is not None and getattr(noeud, "type", None) not in ("column", "flex_container"):
+        total += proto.ByteSize()
+        if getattr(noeud, "type", None) == "plotly_chart":
+            figures_octets += proto.ByteSize()
+    for enfant in getattr(noeud, "children", {}).values():
+        f, t = _octets(enfant)
+        figures_octets += f
+        total += t
+    return figures_octets, total
+
+
+def _application(section, repertoire, mesurer_memoire, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    from figures import CACHE_FIGURES
+
+    CACHE_FIGURES.vider()
+    return AppTest.from_function(_executer_section, default_timeout=timeout,
+                                 args=(section, repertoire, SECTIONS[section], NIVEAUX[section], mesurer_memoire))
+
+
+def mesurer_section(section, repertoire, timeout=600):
+    """Mesure une section sur le jeu de `repertoire` et renvoie ses résultats"""
+    resultat = {"section": section}
+    try:
+        at = _application(section, repertoire, False, timeout)
+        at.run()
+        if at.exception:
+            resultat["erreur"] = at.exception[0].value
+            return resultat
+        resultat["chargement_s"] = round(at.session_state["mesure"]["chargement_s"], 4)
+        resultat["froid_s"] = round(at.session_state["mesure"]["duree_s"], 4)
+        resultat["figures_octets"], resultat["total_octets"] = _octets(at._tree)
+        at.run()
+        resultat["chaud_s"] = round(at.session_state["mesure"]["duree_s"], 4)
+
+        at = _application(section, repertoire, True, timeout)
+        at.run()
+        resultat["pic_octets"] = at.session_state["mesure"]["pic_octets"]
+    except RuntimeError as erreur:
+        # Dépassement du délai d'AppTest
+        resultat["erreur"] = str(erreur).splitlines()[0]
+    return resultat
+
+
+def executer(echelles=ECHELLES, sections=tuple(SECTIONS), repertoire_donnees=None, timeout=600):
+    """Exécute le banc d'essai et renvoie le rapport"""
+    repertoire_donnees = repertoire_donnees or os.path.join(tempfile.gettempdir(), "armee_banc_essai")
+    # Exécution à blanc : les imports différés ne sont pas imputés à la première section mesurée
+    mesurer_section(sections[0], generer_jeu(1, os.path.join(repertoire_donnees, "x1")), timeout)
+    resultats = []
+    for echelle in echelles:
+        repertoire = generer_jeu(echelle, os.path.join(repertoire_donnees, f"x{echelle}"))
+        for section in sections:
+            resultat = mesurer_section(section, repertoire, timeout)
+            resultat["echelle"] = echelle
+            resultats.append(resultat)
+            afficher_ligne(resultat)
+    return {
+        "python": sys.version.split()[0],
+        "horodatage": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "resultats": resultats
+    }
+
+
+def afficher_ligne(resultat):
+    """Affiche une ligne du tableau des résultats"""
+    if "erreur" in resultat:
+        print(f"{resultat['echelle']:>7}x {resultat['section']:<40} ERREUR : {resultat['erreur']}", flush=True)
+        return
+    print(f"{resultat['echelle']:>7}x {resultat['section']:<40} "
+          f"{resultat['chargement_s'] * 1000:>9.1f} {resultat['froid_s'] * 1000:>9.1f} {resultat['chaud_s'] * 1000:>9.1f} "
+          f"{resultat['pic_octets'] / 2**20:>9.1f} {resultat['figures_octets'] / 1024:>10.1f} "
+          f"{resultat['total_octets'] / 1024:>10.1f}", flush=True)
+
+
+def comparer(rapport, reference, tolerance):
+    """Liste les mesures dépassant la référence de plus de `tolerance` %"""
+    references = {(r["echelle"], r["section"]): r for r in reference["resultats"]}
+    regressions = []
+    for resultat in rapport["resultats"]:
+        avant = references.get((resultat["echelle"], resultat["section"]))
+        if avant is None:
+            continue
+        if "erreur" in resultat and "erreur" not in avant:
+            regressions.append((resultat["echelle"], resultat["section"], "erreur", None, resultat["erreur"]))
+            continue
+        for mesure, seuil in SEUILS_BRUIT.items():
+            if mesure not in resultat or mesure not in avant:
+                continue
+            if resultat[mesure] > avant[mesure] * (1 + tolerance / 100) and resultat[mesure] - avant[mesure] > seuil:
+                regressions.append((resultat["echelle"], resultat["section"], mesure, avant[mesure], resultat[mesure]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--echelles", type=int, nargs="+", default=list(ECHELLES),
+                        help="facteurs d'agrandissement des fixtures (défaut : 1 100 10000)")
+    parser.add_argument("--sections", nargs="+", choices=list(SECTIONS), default=list(SECTIONS))
+    parser.add_argument("--donnees", help="répertoire des jeux générés (réutilisés d'une exécution à l'autre)")
+    parser.add_argument("--timeout", type=float, default=600, help="délai maximal par exécution (s)")
+    parser.add_argument("--json", help="écrit le rapport (référence) dans ce fichier")
+    parser.add_argument("--comparer", help="rapport JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="régression tolérée en %% (défaut : 20)")
+    args = parser.parse_args()
+
+    print(f"{'Échelle':>8} {'Section':<40} {'charge ms':>9} {'froid ms':>9} {'chaud ms':>9} {'pic Mio':>9} "
+          f"{'figures Kio':>10} {'total Kio':>10}")
+    rapport = executer(args.echelles, args.sections, args.donnees, args.timeout)
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as fichier:
+            json.dump(rapport, fichier, ensure_ascii=False, indent=2)
+
+    if args.comparer:
+        with open(args.comparer, encoding="utf-8") as fichier:
+            reference = json.load(fichier)
+        regressions = comparer(rapport, reference, args.tolerance)
+        for echelle, section, mesure, avant, apres in regressions:
+            print(f"RÉGRESSION {echelle}x {section} {mesure}: {avant} -> {apres}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
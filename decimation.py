@@ -0,0 +1,96 @@
+# decimation.py
+"""Sous-échantillonnage des séries longues avant construction des traces
+
+Deux méthodes, qui renvoient les indices des points conservés (premier et
+dernier points toujours inclus) :
+- `lttb` (Largest Triangle Three Buckets) garde la forme visuelle d'une courbe ;
+- `min_max` garde le minimum et le maximum de chaque seau, pour ne perdre
+  aucun pic.
+"""
+import numpy as np
+
+
+def _en_flottants(valeurs):
+    valeurs = np.asarray(valeurs)
+    if valeurs.dtype.kind == "M":
+        return valeurs.astype("datetime64[ns]").astype("int64").astype(float)
+    return valeurs.astype(float)
+
+
+def _seaux(nombre, nombre_seaux):
+    """Bornes des `nombre_seaux` seaux répartissant les points intérieurs [1, nombre - 1)"""
+    return np.linspace(1, nombre - 1, nombre_seaux + 1).astype(int)
+
+
+def lttb(x, y, nombre_points):
+    """Renvoie les indices des `nombre_points` points retenus par LTTB
+
+    Chaque seau garde le point formant le plus grand triangle avec le point
+    retenu dans le seau précédent et la moyenne du seau suivant.
+    """
+    nombre = len(y)
+    if nombre_points >= nombre or nombre_points < 3:
+        return np.arange(nombre)
+    x, y = _en_flottants(x), _en_flottants(y)
+    bornes = _seaux(nombre, nombre_points - 2)
+
+    indices = np.empty(nombre_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, nombre - 1
+    precedent = 0
+    for seau in range(nombre_points - 2):
+        debut, fin = bornes[seau], bornes[seau + 1]
+        # Moyenne du seau suivant (le dernier point pour le dernier seau)
+        suivant_debut, suivant_fin = fin, bornes[seau + 2] if seau + 2 <= nombre_points - 2 else nombre
+        moyenne_x = x[suivant_debut:suivant_fin].mean()
+        moyenne_y = y[suivant_debut:suivant_fin].mean()
+        # Aire (au facteur 1/2 près) des triangles précédent - candidat - moyenne suivante
+        aires = np.abs((x[precedent] - moyenne_x) * (y[debut:fin] - y[precedent])
+                       - (x[precedent] - x[debut:fin]) * (moyenne_y - y[precedent]))
+        precedent = debut + int(np.argmax(aires))
+        indices[seau + 1] = precedent
+    return indices
+
+
+def min_max(y, nombre_points):
+    """Renvoie les indices du minimum et du maximum de chaque seau (au plus `nombre_points`)"""
+    nombre = len(y)
+    if nombre_points >= nombre or nombre_points < 4:
+        return np.arange(nombre)
+    y = _en_flottants(y)
+    nombre_seaux = (nombre_points - 2) // 2
+    interieurs = np.arange(1, nombre - 1)
+    seau = (interieurs - 1) * nombre_seaux // (nombre - 2)
+
+    # Tri par (seau, valeur) : le premier point de chaque seau en est le minimum, le dernier le maximum
+    ordre = interieurs[np.lexsort((y[interieurs], seau))]
+    seaux_tries = seau[ordre - 1]
+    premiers = np.flatnonzero(np.r_[True, seaux_tries[1:] != seaux_tries[:-1]])
+    derniers = np.r_[premiers[1:] - 1, len(ordre) - 1]
+    return np.unique(np.r_[0, ordre[premiers], ordre[derniers], nombre - 1])
+
+
+def decimer(x, y, nombre_points, methode="lttb"):
+    """Renvoie (x, y) réduits à au plus `nombre_points` points, valeurs manquantes écartées"""
+    x, y = np.asarray(x), np.asarray(y)
+    if len(y) <= nombre_points:
+        return x, y
+    valides = np.isfinite(_en_flottants(y))
+    x, y = x[valides], y[valides]
+    indices = lttb(x, y, nombre_points) if methode == "lttb" else min_max(y, nombre_points)
+    return x[indices], y[indices]
+
+
+def moyennes_par_seau(x, y, nombre_points):
+    """Agrège (x, y) en au plus `nombre_points` seaux : premier x et moyenne de y par seau
+
+    Pour les barres, dont on ne peut pas garder un point sur N sans fausser l'aire.
+    """
+    x, y = np.asarray(x), np.asarray(y, dtype=float)
+    nombre = len(y)
+    if nombre <= nombre_points:
+        return x, y
+    debuts = np.linspace(0, nombre, nombre_points + 1).astype(int)[:-1]
+    sommes = np.add.reduceat(np.nan_to_num(y), debuts)
+    comptes = np.add.reduceat(np.isfinite(y).astype(int), debuts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return x[debuts], sommes / comptes
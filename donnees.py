@@ -0,0 +1,422 @@
+# donnees.py
+"""Couche de données partagée du dashboard de l'armée égyptienne"""
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import phase
+from stockage import VERSION_FIXTURES, source_par_defaut
+
+# Copy-on-Write : toujours actif à partir de pandas 3.0, à activer avant.
+# Une copie superficielle d'un DataFrame partagé devient alors un instantané :
+# toute écriture (colonne ajoutée, cellule modifiée) ne touche que la copie.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
+# Durée de vie par défaut d'une entrée du cache (secondes)
+TTL_DEFAUT = 3600
+
+# Nombre maximal d'entrées du cache (tables, partitions, résultats dérivés)
+CAPACITE_DONNEES = 256
+
+# Intervalle minimal entre deux détections de changements (secondes)
+INTERVALLE_RAFRAICHISSEMENT = 60
+
+# Lectures d'une table tentées quand sa version change pendant la lecture
+TENTATIVES_LECTURE = 3
+
+# Chargements en arrière-plan simultanés, toutes sessions confondues (lectures de
+# fichiers et calculs pandas/numpy, qui relâchent le GIL)
+CHARGEMENTS_SIMULTANES = 8
+
+
+def instantane(valeur):
+    """Renvoie un instantané en lecture seule d'un objet partagé
+
+    La copie est superficielle (aucune donnée dupliquée) ; grâce au
+    Copy-on-Write, les modifications faites sur l'instantané d'un DataFrame
+    n'atteignent jamais l'original partagé. Un dictionnaire devient un
+    dictionnaire en lecture seule d'instantanés, un tableau numpy une vue
+    en lecture seule. Un objet qui définit `instantane()` (magasin
+    d'indicateurs, cube régional, ordre de bataille) en fournit sa propre
+    copie indépendante. Les autres objets sont renvoyés tels quels.
+    """
+    if isinstance(valeur, (pd.DataFrame, pd.Series)):
+        return valeur.copy(deep=False)
+    if isinstance(valeur, dict):
+        return MappingProxyType({cle: instantane(element) for cle, element in valeur.items()})
+    if isinstance(valeur, np.ndarray):
+        return lecture_seule(valeur)
+    if callable(getattr(valeur, "instantane", None)):
+        return valeur.instantane()
+    return valeur
+
+
+def lecture_seule(tableau):
+    """Renvoie une vue en lecture seule d'un tableau numpy"""
+    vue = tableau.view()
+    vue.flags.writeable = False
+    return vue
+
+
+class CacheDonnees:
+    """Cache processus des jeux de données, partagé par toutes les sessions
+
+    Les entrées sont indexées par (nom, version, variante) et expirent après `ttl`
+    secondes ; les moins récemment utilisées sont évincées au-delà de
+    `capacite` entrées. Un seul thread charge une clé donnée à la fois : les
+    sessions concurrentes attendent le chargement en cours au lieu de le
+    dupliquer. Les objets stockés sont partagés : DepotDonnees ne les sert
+    que sous forme d'instantanés (voir `instantane`).
+    """
+
+    def __init__(self, ttl=TTL_DEFAUT, capacite=CAPACITE_DONNEES):
+        self.ttl = ttl
+        self.capacite = capacite
+        self._entrees = OrderedDict()
+        # Verrou de chargement par clé et nombre de threads qui l'utilisent,
+        # retiré quand plus aucun thread ne charge ni n'attend la clé
+        self._verrous_cles = {}
+        self._verrou = threading.Lock()
+        self.succes = 0
+        self.echecs = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @contextmanager
+    def _verrou_cle(self, cle):
+        with self._verrou:
+            verrou, utilisateurs = self._verrous_cles.get(cle, (None, 0))
+            if verrou is None:
+                verrou = threading.Lock()
+            self._verrous_cles[cle] = (verrou, utilisateurs + 1)
+        try:
+            with verrou:
+                yield
+        finally:
+            with self._verrou:
+                verrou, utilisateurs = self._verrous_cles[cle]
+                if utilisateurs == 1:
+                    del self._verrous_cles[cle]
+                else:
+                    self._verrous_cles[cle] = (verrou, utilisateurs - 1)
+
+    def _lire(self, cle):
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                return None
+            if self.ttl is not None and time.monotonic() - entree[0] > self.ttl:
+                del self._entrees[cle]
+                return None
+            self._entrees.move_to_end(cle)
+            return entree
+
+    def obtenir(self, nom, chargeur, version=VERSION_FIXTURES, variante=None):
+        """Renvoie le jeu de données `nom`, chargé via `chargeur` en cas d'absence"""
+        cle = (nom, version, variante)
+        entree = self._lire(cle)
+        if entree is None:
+            with self._verrou_cle(cle):
+                # Un autre thread a pu terminer le chargement pendant l'attente
+                entree = self._lire(cle)
+                if entree is None:
+                    valeur = chargeur()
+                    with self._verrou:
+                        self._entrees[cle] = (time.monotonic(), valeur)
+                        self.echecs += 1
+                        while len(self._entrees) > self.capacite:
+                            self._entrees.popitem(last=False)
+                            self.evictions += 1
+                    return valeur
+        with self._verrou:
+            self.succes += 1
+        return entree[1]
+
+    def invalider(self, nom=None, version=None):
+        """Supprime les entrées correspondant au nom et/ou à la version donnés"""
+        with self._verrou:
+            cles = [cle for cle in self._entrees
+                    if (nom is None or cle[0] == nom) and (version is None or cle[1] == version)]
+            for cle in cles:
+                del self._entrees[cle]
+            self.invalidations += len(cles)
+        return len(cles)
+
+    def purger(self, perimee):
+        """Supprime les entrées dont la clé (nom, version, variante) vérifie `perimee`
+
+        Le prédicat est évalué hors du verrou (il peut interroger la source).
+        Renvoie le nombre d'entrées supprimées.
+        """
+        with self._verrou:
+            cles = list(self._entrees)
+        cles = [cle for cle in cles if perimee(cle)]
+        with self._verrou:
+            for cle in cles:
+                self._entrees.pop(cle, None)
+            self.invalidations += len(cles)
+        return len(cles)
+
+    def statistiques(self):
+        """Renvoie les compteurs du cache"""
+        with self._verrou:
+            return {
+                "succes": self.succes,
+                "echecs": self.echecs,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "entrees": len(self._entrees)
+            }
+
+    def metriques_prometheus(self):
+        """Expose les compteurs du cache au format texte Prometheus"""
+        stats = self.statistiques()
+        return "\n".join([
+            "# HELP armee_cache_donnees_requetes_total Requêtes servies par le cache de données.",
+            "# TYPE armee_cache_donnees_requetes_total counter",
+            f'armee_cache_donnees_requetes_total{{resultat="hit"}} {stats["succes"]}',
+            f'armee_cache_donnees_requetes_total{{resultat="miss"}} {stats["echecs"]}',
+            "# HELP armee_cache_donnees_invalidations_total Entrées invalidées explicitement.",
+            "# TYPE armee_cache_donnees_invalidations_total counter",
+            f'armee_cache_donnees_invalidations_total {stats["invalidations"]}',
+            "# HELP armee_cache_donnees_evictions_total Entrées évincées au-delà de la capacité.",
+            "# TYPE armee_cache_donnees_evictions_total counter",
+            f'armee_cache_donnees_evictions_total {stats["evictions"]}',
+            "# HELP armee_cache_donnees_entrees Entrées actuellement en cache.",
+            "# TYPE armee_cache_donnees_entrees gauge",
+            f'armee_cache_donnees_entrees {stats["entrees"]}',
+            ""
+        ])
+
+
+class _ReferenceForte:
+    """Référence forte au même usage qu'une weakref.ref"""
+
+    def __init__(self, valeur):
+        self._valeur = valeur
+
+    def __call__(self):
+        return self._valeur
+
+
+class _VersionChangee(Exception):
+    """La table a changé dans la source pendant sa lecture"""
+
+
+class DepotDonnees:
+    """Point d'accès aux tables : lecture depuis la source, via le cache partagé
+
+    Une seule copie de chaque table est gardée en mémoire pour tout le
+    processus ; chaque appel en renvoie un instantané copy-on-write, qui
+    peut être modifié librement sans affecter les autres sessions.
+
+    Les versions des tables sont mémorisées : la source (répertoire de
+    partitions, dates des fichiers) n'est interrogée qu'à la première
+    demande, puis à chaque détection de `rafraichir`, pas à chaque accès.
+
+    Les tables partitionnées sont relues partition par partition : après
+    une mise à jour, seules les partitions modifiées sont lues, les autres
+    sont reprises de la lecture précédente (voir `rafraichir`).
+    """
+
+    def __init__(self, source=None, cache=None):
+        self.source = source if source is not None else source_par_defaut()
+        self.cache = cache if cache is not None else CacheDonnees()
+        self.partitions_lues = 0
+        self._verrou = threading.Lock()
+        # Dernier assemblage de chaque variante de table partitionnée : (référence faible, plan)
+        self._assemblages = {}
+        self._lues = set()
+        self._dependances = {}
+        self._etats = None
+        self._dernier_rafraichissement = float("-inf")
+        # Versions connues : (table, annees) -> version, relues par `rafraichir`
+        self._versions = {}
+
+    def version(self, table, annees=None):
+        """Renvoie la version de la table, telle que lue dans la source à la dernière détection
+
+        Pour une table partitionnée, `annees` restreint la version aux
+        partitions de la période.
+        """
+        annees = tuple(annees) if annees is not None else None
+        with self._verrou:
+            version = self._versions.get((table, annees))
+        if version is None:
+            version = self.source.version(table, annees)
+            with self._verrou:
+                version = self._versions.setdefault((table, annees), version)
+        return version
+
+    def _oublier_versions(self, table):
+        with self._verrou:
+            self._versions = {cle: version for cle, version in self._versions.items() if cle[0] != table}
+
+    def table(self, nom, colonnes=None, annees=None):
+        """Renvoie la table `nom`, projetée sur `colonnes` et restreinte à `annees`
+
+        `annees` est un couple (debut, fin) inclus, transmis à la source pour
+        que seules les lignes de la période soient lues. La version est
+        relue dans la source après la lecture : si la table a changé entre-temps,
+        les lignes lues ne sont pas rangées sous l'ancienne version, et la
+        lecture reprend avec la nouvelle.
+        """
+        colonnes = tuple(colonnes) if colonnes is not None else None
+        annees = tuple(annees) if annees is not None else None
+        with self._verrou:
+            self._lues.add(nom)
+        with phase("donnees"):
+            for tentative in range(TENTATIVES_LECTURE):
+                version = self.version(nom, annees)
+                # Dernière tentative : une table réécrite sans cesse est servie telle que lue
+                verifier = tentative < TENTATIVES_LECTURE - 1
+                try:
+                    return instantane(self.cache.obtenir(
+                        nom,
+                        lambda: self._lire_version(nom, colonnes, annees, version if verifier else None),
+                        version=version,
+                        variante=(colonnes, annees)
+                    ))
+                except _VersionChangee:
+                    self._oublier_versions(nom)
+
+    def _lire_version(self, nom, colonnes, annees, version):
+        df = self._lire(nom, colonnes, annees)
+        if version is not None and self.source.version(nom, annees) != version:
+            raise _VersionChangee(nom)
+        return df
+
+    def _lire(self, nom, colonnes, annees):
+        """Lit la table ; pour une table partitionnée, seules les partitions modifiées
+
+        Les lignes des partitions dont l'empreinte n'a pas changé sont
+        reprises du dernier assemblage de la même variante (mêmes colonnes
+        et période), s'il est encore en mémoire.
+        """
+        partitions = self.source.partitions(nom, annees)
+        if partitions is None:
+            return self.source.lire(nom, colonnes, annees)
+        import pyarrow as pa
+
+        with self._verrou:
+            reference, plan_precedent = self._assemblages.get((nom, colonnes, annees), (None, {}))
+        precedente = reference() if reference is not None else None
+        morceaux, plan, debut = [], {}, 0
+        for relatif, (empreinte, _) in partitions.items():
+            bornes = plan_precedent.get(relatif)
+            if precedente is not None and bornes is not None and bornes[0] == empreinte:
+                lignes = precedente.iloc[bornes[1]:bornes[2]]
+            else:
+                # Typée seule : toutes les partitions ont alors les types du schéma
+                lignes = self.source.assembler(nom, [self.source.lire_partition(nom, relatif, colonnes, annees)],
+                                               colonnes)
+                with self._verrou:
+                    self.partitions_lues += 1
+            morceaux.append(pa.Table.from_pandas(lignes, preserve_index=False))
+            plan[relatif] = (empreinte, debut, debut + len(lignes))
+            debut += len(lignes)
+        df = self.source.assembler(nom, morceaux, colonnes)
+        with self._verrou:
+            self._assemblages[(nom, colonnes, annees)] = (weakref.ref(df), plan)
+        return df
+
+    def instantanes(self, tables):
+        """Renvoie un dictionnaire en lecture seule d'instantanés des `tables`"""
+        return MappingProxyType({table: self.table(table) for table in tables})
+
+    def derive(self, nom, tables, calcul, variante=None):
+        """Renvoie le résultat de `calcul`, mis en cache pour la version des `tables`
+
+        Sert de cache des caractéristiques dérivées (taux de croissance,
+        agrégats...) : elles sont calculées dans des objets séparés plutôt
+        qu'ajoutées aux tables partagées, et recalculées uniquement quand
+        l'une des tables dont elles dépendent change de version. `variante`
+        distingue les résultats d'un même calcul pour des paramètres différents.
+        """
+        version = tuple(self.version(table) for table in tables)
+        with self._verrou:
+            self._dependances[nom] = tuple(tables)
+        with phase("calcul"):
+            return instantane(self.cache.obtenir(nom, calcul, version=version, variante=variante))
+
+    def rafraichir(self, intervalle=INTERVALLE_RAFRAICHISSEMENT):
+        """Détecte les tables modifiées dans la source et purge leurs entrées périmées
+
+        Renvoie {table: partitions ajoutées, réécrites ou supprimées} (liste
+        vide pour une table non partitionnée), ou None si la dernière
+        détection date de moins de `intervalle` secondes. Seule la détection
+        relit les versions dans la source : une donnée modifiée est servie
+        au plus tard après la détection suivante. La purge libère la mémoire
+        des tables, partitions et résultats dérivés qui en dépendent. Les
+        entrées des données inchangées restent en cache : leurs sections ne
+        sont ni relues ni recalculées.
+        """
+        with self._verrou:
+            maintenant = time.monotonic()
+            if maintenant - self._dernier_rafraichissement < intervalle:
+                return None
+            self._dernier_rafraichissement = maintenant
+            # Versions relues dans la source par la détection (voir `courante`)
+            self._versions = {}
+            tables = sorted(self._lues | {t for dependances in self._dependances.values() for t in dependances})
+            dependances = dict(self._dependances)
+            # Assemblages gardés depuis la détection précédente : rendus à la référence faible
+            self._assemblages = {cle: (weakref.ref(reference()), plan)
+                                 for cle, (reference, plan) in self._assemblages.items()
+                                 if reference() is not None}
+
+        etats = {}
+        for table in tables:
+            partitions = self.source.partitions(table)
+            etats[table] = ({relatif: empreinte for relatif, (empreinte, _) in partitions.items()}
+                            if partitions is not None else self.version(table))
+        modifications = {}
+        if self._etats is not None:
+            for table, etat in etats.items():
+                precedent = self._etats.get(table, etat)
+                if precedent == etat:
+                    continue
+                if isinstance(etat, dict) and isinstance(precedent, dict):
+                    modifications[table] = sorted(relatif for relatif in etat.keys() | precedent.keys()
+                                                  if etat.get(relatif) != precedent.get(relatif))
+                else:
+                    modifications[table] = []
+        self._etats = etats
+
+        versions = {}
+
+        def courante(table, annees=None):
+            if (table, annees) not in versions:
+                versions[table, annees] = self.version(table, annees)
+            return versions[table, annees]
+
+        def perimee(cle):
+            nom, version, variante = cle
+            if nom in dependances:
+                return version != tuple(courante(table) for table in dependances[nom])
+            if nom in etats:
+                return version != courante(nom, variante[1])
+            return False
+
+        with self._verrou:
+            # Les assemblages des tables modifiées survivent à la purge jusqu'à la relecture
+            for cle, (reference, plan) in list(self._assemblages.items()):
+                if cle[0] in modifications and reference() is not None:
+                    self._assemblages[cle] = (_ReferenceForte(reference()), plan)
+        self.cache.purger(perimee)
+        return modifications
+
+
+# Instances uniques pour le processus : le module n'est importé qu'une fois par
+# serveur Streamlit, contrairement au script du dashboard ré-exécuté à chaque interaction.
+CACHE_DONNEES = CacheDonnees()
+DEPOT_DONNEES = DepotDonnees(cache=CACHE_DONNEES)
+EXECUTEUR_CHARGEMENTS = ThreadPoolExecutor(max_workers=CHARGEMENTS_SIMULTANES, thread_name_prefix="chargement")
@@ -0,0 +1,272 @@
+# exports.py
+"""Exports des données affichées (Parquet, CSV, Excel), écrits par lots et mis en cache"""
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from contextlib import contextmanager
+
+
+# Lignes écrites par lot : seul un lot est converti à la fois, jamais une
+# seconde copie complète de la table.
+TAILLE_LOT_EXPORT = 50_000
+
+# Répertoire des fichiers générés, et taille maximale occupée avant éviction
+VARIABLE_REPERTOIRE_EXPORTS = "ARMEE_EXPORTS_DIR"
+CAPACITE_EXPORTS = 512 * 1024 * 1024
+
+# Lignes de données par feuille Excel (1 048 576 lignes, en-tête compris)
+LIGNES_MAX_EXCEL = 1_048_575
+
+FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "csv": (".csv", "text/csv"),
+    "excel": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+}
+
+
+def nombre_lignes(feuille):
+    """Renvoie le nombre de lignes d'une feuille (voir _lots)"""
+    return len(feuille[1]) if isinstance(feuille, tuple) else len(feuille)
+
+
+def _lots(feuille, taille_lot):
+    """Découpe une feuille en lots de lignes
+
+    Une feuille est un DataFrame, ou un couple (DataFrame, positions) pour
+    exporter une sélection ordonnée de lignes (filtre et tri d'une vue
+    paginée) sans la matérialiser en entier.
+    """
+    df, positions = feuille if isinstance(feuille, tuple) else (feuille, None)
+    for debut in range(0, max(nombre_lignes(feuille), 1), taille_lot):
+        if positions is None:
+            yield df.iloc[debut:debut + taille_lot]
+        else:
+            yield df.iloc[positions[debut:debut + taille_lot]]
+
+
+def ecrire_csv(feuille, flux, taille_lot=TAILLE_LOT_EXPORT):
+    """Écrit une feuille en CSV UTF-8 dans le flux binaire `flux`"""
+    texte = io.TextIOWrapper(flux, encoding="utf-8", newline="", write_through=True)
+    for numero, lot in enumerate(_lots(feuille, taille_lot)):
+        lot.to_csv(texte, header=numero == 0, index=False)
+    texte.detach()
+
+
+def ecrire_parquet(feuille, flux, taille_lot=TAILLE_LOT_EXPORT):
+    """Écrit une feuille en Parquet dans le flux binaire `flux`, un row group par lot"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    ecrivain = None
+    for lot in _lots(feuille, taille_lot):
+        table = pa.Table.from_pandas(lot, preserve_index=False)
+        if ecrivain is None:
+            ecrivain = pq.ParquetWriter(flux, table.schema)
+        ecrivain.write_table(table.cast(ecrivain.schema))
+    ecrivain.close()
+
+
+def _nom_feuille(nom):
+    # Contraintes Excel : 31 caractères au plus, sans []:*?/\
+    return re.sub(r"[\[\]:*?/\\]", "_", str(nom))[:31]
+
+
+def ecrire_excel(feuilles, flux, taille_lot=TAILLE_LOT_EXPORT):
+    """Écrit un classeur Excel d'une feuille par entrée de `feuilles`
+
+    Classeur openpyxl en écriture seule : les lignes sont sérialisées au
+    fil de l'eau au lieu d'être gardées en mémoire jusqu'à l'enregistrement.
+    """
+    from openpyxl import Workbook
+
+    trop_longues = [nom for nom, feuille in feuilles.items() if nombre_lignes(feuille) > LIGNES_MAX_EXCEL]
+    if trop_longues:
+        raise ValueError(f"Feuilles trop longues pour Excel ({LIGNES_MAX_EXCEL:,} lignes au plus) : "
+                         f"{', '.join(map(str, trop_longues))}")
+
+    classeur = Workbook(write_only=True)
+    for nom, feuille in feuilles.items():
+        onglet = classeur.create_sheet(_nom_feuille(nom))
+        for numero, lot in enumerate(_lots(feuille, taille_lot)):
+            if numero == 0:
+                onglet.append([str(colonne) for colonne in lot.columns])
+            # Valeurs manquantes en cellules vides ; catégories et types numpy en objets Python
+            lot = lot.astype(object).where(lot.notna(), None)
+            for ligne in lot.itertuples(index=False, name=None):
+                onglet.append(ligne)
+    classeur.save(flux)
+
+
+def exporter(feuilles, format_export, flux, taille_lot=TAILLE_LOT_EXPORT):
+    """Écrit les `feuilles` ({nom: feuille}) au format demandé dans `flux`
+
+    Excel : une feuille par entrée. Parquet et CSV : un fichier pour une
+    feuille unique, sinon une archive zip d'un fichier par feuille.
+    """
+    if format_export == "excel":
+        ecrire_excel(feuilles, flux, taille_lot)
+        return
+    ecrire = ecrire_parquet if format_export == "parquet" else ecrire_csv
+    if len(feuilles) == 1:
+        ecrire(next(iter(feuilles.values())), flux, taille_lot)
+        return
+    extension = FORMATS[format_export][0]
+    with zipfile.ZipFile(flux, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for nom, feuille in feuilles.items():
+            with archive.open(f"{nom}{extension}", "w", force_zip64=True) as membre:
+                ecrire(feuille, membre, taille_lot)
+
+
+def extension_et_type(format_export, nombre_feuilles):
+    """Renvoie l'extension et le type MIME du fichier exporté"""
+    if nombre_feuilles > 1 and format_export != "excel":
+        return ".zip", "application/zip"
+    return FORMATS[format_export]
+
+
+class FichierExport(io.BufferedReader):
+    """Fichier exporté ouvert en lecture, fermé dès qu'il a été lu en entier
+
+    download_button lit le fichier reçu sans le fermer.
+    """
+
+    def __init__(self, chemin):
+        super().__init__(io.FileIO(chemin, "rb"))
+
+    def read(self, taille=-1):
+        donnees = super().read(taille)
+        if taille is None or taille < 0:
+            self.close()
+        return donnees
+
+
+class CacheExports:
+    """Cache disque des fichiers exportés, indexé par l'état des contrôles
+
+    La clé combine la section, le format, la version des tables et les
+    contrôles qui déterminent les lignes exportées. Un seul thread génère
+    une clé donnée : les exports identiques concurrents attendent le
+    fichier en cours au lieu de le refaire. Les fichiers les plus anciens
+    sont supprimés au-delà de `capacite` octets ; la recherche d'un fichier,
+    son ouverture et l'éviction se font sous un même verrou, si bien qu'un
+    fichier servi est déjà ouvert quand il peut être supprimé.
+    """
+
+    def __init__(self, repertoire=None, capacite=CAPACITE_EXPORTS):
+        self.repertoire = repertoire or os.environ.get(VARIABLE_REPERTOIRE_EXPORTS) or os.path.join(
+            tempfile.gettempdir(), "armee_exports")
+        self.capacite = capacite
+        # Verrou de génération par fichier et nombre de threads qui l'utilisent
+        self._verrous_cles = {}
+        self._verrou = threading.Lock()
+        self._verrou_fichiers = threading.Lock()
+        self.succes = 0
+        self.echecs = 0
+
+    @contextmanager
+    def _verrou_cle(self, cle):
+        with self._verrou:
+            verrou, utilisateurs = self._verrous_cles.get(cle, (None, 0))
+            if verrou is None:
+                verrou = threading.Lock()
+            self._verrous_cles[cle] = (verrou, utilisateurs + 1)
+        try:
+            with verrou:
+                yield
+        finally:
+            with self._verrou:
+                verrou, utilisateurs = self._verrous_cles[cle]
+                if utilisateurs == 1:
+                    del self._verrous_cles[cle]
+                else:
+                    self._verrous_cles[cle] = (verrou, utilisateurs - 1)
+
+    def chemin(self, cle, extension):
+        """Renvoie le fichier correspondant à une clé (section, format, versions, contrôles)"""
+        empreinte = hashlib.sha256(json.dumps(cle, default=str).encode("utf-8")).hexdigest()
+        return os.path.join(self.repertoire, empreinte + extension)
+
+    def ouvrir(self, cle, format_export, feuilles):
+        """Renvoie le fichier exportant `feuilles`, ouvert en lecture binaire, généré en cas d'absence
+
+        `feuilles` ({nom: feuille}, voir _lots) ne référence que des tables
+        partagées et des positions : rien n'est copié avant l'écriture. Le
+        fichier reste lisible même s'il est évincé ensuite ; il se ferme une fois lu en entier.
+        """
+        os.makedirs(self.repertoire, exist_ok=True)
+        extension, _ = extension_et_type(format_export, len(feuilles))
+        chemin = self.chemin((cle, format_export), extension)
+        with self._verrou_cle(chemin):
+            fichier = self._ouvrir_existant(chemin)
+            if fichier is not None:
+                with self._verrou:
+                    self.succes += 1
+                return fichier
+            # Écriture dans un fichier temporaire puis renommage atomique
+            descripteur, temporaire = tempfile.mkstemp(dir=self.repertoire, suffix=".partiel")
+            try:
+                with os.fdopen(descripteur, "wb") as flux:
+                    exporter(feuilles, format_export, flux)
+                with self._verrou_fichiers:
+                    os.replace(temporaire, chemin)
+                    fichier = FichierExport(chemin)
+            except BaseException:
+                if os.path.exists(temporaire):
+                    os.unlink(temporaire)
+                raise
+            with self._verrou:
+                self.echecs += 1
+        self._evincer()
+        return fichier
+
+    def _ouvrir_existant(self, chemin):
+        with self._verrou_fichiers:
+            try:
+                fichier = FichierExport(chemin)
+            except FileNotFoundError:
+                return None
+            os.utime(chemin)
+            return fichier
+
+    def _evincer(self):
+        with self._verrou_fichiers:
+            fichiers = []
+            for nom in os.listdir(self.repertoire):
+                if nom.endswith(".partiel"):
+                    continue
+                try:
+                    etat = os.stat(os.path.join(self.repertoire, nom))
+                except FileNotFoundError:
+                    continue
+                fichiers.append((etat.st_mtime, etat.st_size, nom))
+            taille = sum(f[1] for f in fichiers)
+            for _, octets, nom in sorted(fichiers):
+                if taille <= self.capacite:
+                    break
+                try:
+                    os.unlink(os.path.join(self.repertoire, nom))
+                except OSError:
+                    # Supprimé par un autre processus, ou encore ouvert (Windows)
+                    continue
+                taille -= octets
+
+    def metriques_prometheus(self):
+        """Expose les compteurs du cache au format texte Prometheus"""
+        with self._verrou:
+            succes, echecs = self.succes, self.echecs
+        return "\n".join([
+            "# HELP armee_cache_exports_requetes_total Exports demandés au cache.",
+            "# TYPE armee_cache_exports_requetes_total counter",
+            f'armee_cache_exports_requetes_total{{resultat="hit"}} {succes}',
+            f'armee_cache_exports_requetes_total{{resultat="miss"}} {echecs}',
+            ""
+        ])
+
+
+# Instance unique pour le processus, partagée par toutes les sessions
+CACHE_EXPORTS = CacheExports()
@@ -0,0 +1,525 @@
+# figures.py
+"""Construction des figures Plotly du dashboard et cache des figures construites"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+
+from agregats import dater, mensualiser
+
+# plotly.express et plotly.subplots sont importés dans les seules fonctions qui
+# les utilisent : leur coût d'import n'est payé qu'au premier rendu concerné.
+
+# Mémoire maximale occupée par les figures en cache (taille JSON, octets)
+CAPACITE_CACHE_FIGURES = 64 * 1024 * 1024
+
+# Couleurs (composantes RVB) des scénarios de projection
+COULEURS_SCENARIOS = {
+    "Conservative": "108, 117, 125",
+    "Moderne": "0, 102, 204",
+    "Ambitieux": "206, 17, 38"
+}
+
+# Nombre d'entités au-delà duquel un radar passe en une trace unique, puis en
+# carte thermique (petits multiples) : une trace par entité ne passe pas l'échelle.
+SEUIL_RADAR_COMPACT = 20
+SEUIL_RADAR_CARTE = 200
+
+# Points par trace chronologique après sous-échantillonnage (de l'ordre de la
+# largeur d'un graphique en pixels), et nombre de points bruts au-delà duquel
+# les courbes passent en WebGL (Scattergl).
+POINTS_MAX_TRACE = 2000
+SEUIL_WEBGL = 5000
+
+
+def courbe(x, y, methode="lttb", points_max=None, seuil_webgl=None, **proprietes):
+    """Trace une série chronologique, sous-échantillonnée au-delà de `points_max` points
+
+    `methode` : "lttb" (forme de la courbe) ou "min_max" (pics conservés),
+    voir decimation.py. Au-delà de `seuil_webgl` points bruts, la trace est
+    rendue en WebGL.
+    """
+    import decimation
+
+    points_max = POINTS_MAX_TRACE if points_max is None else points_max
+    seuil_webgl = SEUIL_WEBGL if seuil_webgl is None else seuil_webgl
+    nombre = len(y)
+    x, y = decimation.decimer(x, y, points_max, methode)
+    trace = go.Scattergl if nombre > seuil_webgl else go.Scatter
+    return trace(x=x, y=y, **proprietes)
+
+
+def barres(x, y, points_max=None, **proprietes):
+    """Trace des barres chronologiques, moyennées par seau au-delà de `points_max` barres"""
+    import decimation
+
+    points_max = POINTS_MAX_TRACE if points_max is None else points_max
+    x, y = decimation.moyennes_par_seau(x, y, points_max)
+    return go.Bar(x=x, y=y, **proprietes)
+
+
+def mode_radar(nombre_entites):
+    """Choisit le mode de rendu d'un radar selon le nombre d'entités"""
+    if nombre_entites <= SEUIL_RADAR_COMPACT:
+        return "traces"
+    if nombre_entites <= SEUIL_RADAR_CARTE:
+        return "compact"
+    return "carte"
+
+
+def radar(noms, valeurs, axes, titre, plage, mode="auto", opacite=None, hauteur=500):
+    """Construit un radar de toutes les entités en une passe sur le tableau `valeurs`
+
+    `valeurs` est une matrice (entités x axes). Modes :
+    - "traces" : un polygone fermé et une entrée de légende par entité ;
+    - "compact" : une seule trace, polygones séparés par des trous, l'entité
+      portée par chaque point (couleur des marqueurs et survol) ;
+    - "carte" : carte thermique entités x axes, pour les très grands effectifs ;
+    - "auto" : choix selon le nombre d'entités (voir mode_radar).
+    Les spécifications sont produites directement depuis NumPy, sans
+    revalidation objet par objet.
+    """
+    noms = np.asarray(noms, dtype=object)
+    valeurs = np.asarray(valeurs, dtype=float)
+    axes = list(axes)
+    if mode == "auto":
+        mode = mode_radar(len(noms))
+    layout = dict(title=dict(text=titre), height=hauteur)
+
+    if mode == "carte":
+        trace = dict(type="heatmap", z=valeurs, x=axes, y=noms, colorscale="Reds",
+                     zmin=plage[0], zmax=plage[1])
+        layout.update(yaxis=dict(autorange="reversed"))
+        return go.Figure(data=[trace], layout=layout, _validate=False)
+
+    # Polygones fermés : le premier axe est répété en fin de contour
+    fermes = np.hstack([valeurs, valeurs[:, :1]])
+    theta = axes + axes[:1]
+
+    if mode == "compact":
+        nombre, largeur = fermes.shape[0], fermes.shape[1] + 1
+        # Une valeur manquante après chaque polygone sépare les contours
+        r = np.hstack([fermes, np.full((nombre, 1), np.nan)]).ravel()
+        traces = [dict(
+            type="scatterpolar",
+            r=r,
+            theta=np.tile(np.array(theta + [None], dtype=object), nombre),
+            customdata=np.repeat(noms, largeur),
+            mode="lines+markers",
+            fill="toself",
+            name="Entités",
+            marker=dict(color=np.repeat(np.arange(nombre), largeur), colorscale="Turbo", size=4),
+            line=dict(width=1),
+            hovertemplate="%{customdata}<br>%{theta}: %{r:.1f}<extra></extra>"
+        )]
+    else:
+        traces = [dict(type="scatterpolar", r=ligne, theta=theta, fill="toself", name=nom)
+                  for nom, ligne in zip(noms, fermes)]
+        if opacite is not None:
+            for trace in traces:
+                trace["opacity"] = opacite
+
+    layout.update(
+        polar=dict(radialaxis=dict(visible=True, range=list(plage))),
+        showlegend=mode == "traces"
+    )
+    return go.Figure(data=traces, layout=layout, _validate=False)
+
+
+def carte_structure(df_noeuds, libelle, mesures, etiquettes, titre):
+    """Carte thermique des `mesures` de chaque nœud de l'ordre de bataille (colonnes : nœuds)"""
+    import plotly.express as px
+
+    return px.imshow(
+        df_noeuds[mesures].T.to_numpy(),
+        labels=dict(x=libelle, y="Mesure", color="Nombre"),
+        x=df_noeuds[libelle].astype(str).to_numpy(),
+        y=etiquettes,
+        title=titre,
+        color_continuous_scale='Reds',
+        aspect="auto"
+    )
+
+
+def radar_structure(df_noeuds, libelle, mesures, etiquettes, titre, mode="auto"):
+    """Radar du profil de chaque nœud de l'ordre de bataille sur les `mesures`"""
+    valeurs = df_noeuds[mesures].to_numpy()
+    return radar(
+        df_noeuds[libelle].astype(str).to_numpy(),
+        valeurs,
+        etiquettes,
+        titre,
+        (0, max(5, valeurs.max(initial=0))),
+        mode=mode
+    )
+
+
+def preparation_deploiement(df_capacites):
+    """Préparation opérationnelle et temps de déploiement sur deux axes
+
+    Une table par unité et par mois (colonne Mois des jeux synthétiques) est
+    tracée mois par mois : moyennes des unités en courbes, relevés de chaque
+    unité en nuage (min_max : les unités extrêmes restent visibles).
+    """
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    if "Mois" in df_capacites.columns:
+        releves = dater(df_capacites)
+        df_capacites = mensualiser(df_capacites)
+        x = df_capacites['Date']
+        fig.add_trace(
+            courbe(releves['Date'], releves['Readiness_Operative'], methode='min_max', mode='markers',
+                   name="Relevés des unités", marker=dict(color='#CE1126', size=3, opacity=0.3)),
+            secondary_y=False,
+        )
+    else:
+        x = df_capacites['Annee']
+
+    fig.add_trace(
+        courbe(x, df_capacites['Readiness_Operative'],
+               name="Préparation Opérationnelle", line=dict(color='#CE1126', width=3)),
+        secondary_y=False,
+    )
+
+    fig.add_trace(
+        courbe(x, df_capacites['Temps_Deploiement_Jours'],
+               name="Temps Déploiement (jours)", line=dict(color='#000000', width=3)),
+        secondary_y=True,
+    )
+
+    fig.update_layout(
+        title="Évolution Préparation vs Temps Réponse",
+        xaxis_title="Année",
+        height=400
+    )
+
+    fig.update_yaxes(title_text="Préparation (%)", secondary_y=False)
+    fig.update_yaxes(title_text="Jours", secondary_y=True, autorange="reversed")
+    return fig
+
+
+def entrainement_exercices(df_capacites):
+    """Exercices combinés (courbe) et heures d'entraînement (barres)"""
+    fig = go.Figure()
+
+    fig.add_trace(courbe(
+        df_capacites['Annee'],
+        df_capacites['Exercices_Combines'],
+        mode='lines+markers',
+        name='Exercices Combinés',
+        line=dict(color='#FECB00', width=3),
+        marker=dict(size=8)
+    ))
+
+    fig.add_trace(barres(
+        df_capacites['Annee'],
+        df_capacites['Entrainement_Heures_An'],
+        name='Heures Entraînement',
+        marker_color='#0066CC',
+        opacity=0.6
+    ))
+
+    fig.update_layout(
+        title="Activités d'Entraînement et Exercices",
+        xaxis_title="Année",
+        yaxis_title="Nombre/Heures",
+        barmode='overlay',
+        height=400
+    )
+    return fig
+
+
+def evolution_equipements(df_equipements):
+    """Parc d'équipements 2012 vs 2024 par type"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        name='2012',
+        x=df_equipements['Type'],
+        y=df_equipements['Quantite_2012'],
+        marker_color='rgba(206, 17, 38, 0.6)'
+    ))
+
+    fig.add_trace(go.Bar(
+        name='2024',
+        x=df_equipements['Type'],
+        y=df_equipements['Quantite_2024'],
+        marker_color='rgba(206, 17, 38, 1)'
+    ))
+
+    fig.update_layout(
+        title="Évolution du Parc d'Équipements (2012 vs 2024)",
+        xaxis_title="Type d'équipement",
+        yaxis_title="Quantité",
+        barmode='group',
+        height=500
+    )
+    return fig
+
+
+def modernite_equipements(df_equipements):
+    """Taux de modernité par type d'équipement"""
+    import plotly.express as px
+
+    fig = px.bar(df_equipements, x='Type', y='Taux_Modernite',
+                 title="Taux de Modernité du Parc d'Équipements (%)",
+                 color='Taux_Modernite',
+                 color_continuous_scale='Reds',
+                 labels={'Taux_Modernite': '% Modernité'})
+
+    fig.update_layout(height=500)
+    return fig
+
+
+def radar_regional(df_normalise, indicateurs, mode="auto"):
+    """Radar comparatif des pays, indicateurs déjà normalisés (% du maximum)"""
+    return radar(
+        df_normalise['Pays'].to_numpy(),
+        df_normalise[list(indicateurs)].to_numpy(dtype=float),
+        indicateurs,
+        "Comparaison Régionale (Normalisée)",
+        (0, 100),
+        mode=mode,
+        opacite=0.7
+    )
+
+
+def projections_readiness(df_capacites, bandes):
+    """Bandes de projection Monte Carlo de la préparation opérationnelle et historique
+
+    `bandes` associe à chaque scénario un DataFrame (Annee, P5, ..., P95) :
+    la médiane est tracée en ligne, l'intervalle P5-P95 en bande.
+    """
+    fig = go.Figure()
+
+    for scenario, df_bandes in bandes.items():
+        couleur = COULEURS_SCENARIOS.get(scenario, "0, 0, 0")
+        fig.add_trace(go.Scatter(
+            x=df_bandes['Annee'], y=df_bandes['P95'],
+            mode='lines', line=dict(width=0),
+            legendgroup=scenario, showlegend=False, hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=df_bandes['Annee'], y=df_bandes['P5'],
+            mode='lines', line=dict(width=0),
+            fill='tonexty', fillcolor=f'rgba({couleur}, 0.15)',
+            name=f"{scenario} (P5-P95)", legendgroup=scenario
+        ))
+        fig.add_trace(go.Scatter(
+            x=df_bandes['Annee'], y=df_bandes['P50'],
+            mode='lines+markers',
+            name=scenario,
+            legendgroup=scenario,
+            line=dict(color=f'rgba({couleur}, 1)', width=2,
+                      dash='dot' if scenario == 'Conservative' else 'solid')
+        ))
+
+    # Ajouter les données historiques
+    fig.add_trace(go.Scatter(
+        x=df_capacites['Annee'],
+        y=df_capacites['Readiness_Operative'],
+        mode='lines+markers',
+        name='Données Historiques',
+        line=dict(color='#000000', width=3)
+    ))
+
+    fig.update_layout(
+        title="Projections de Préparation Opérationnelle (2025-2030)",
+        xaxis_title="Année",
+        yaxis_title="Préparation Opérationnelle (%)",
+        height=500
+    )
+    return fig
+
+
+def previsions_statistiques(df_historique, df_previsions, indicateur, modele, niveau):
+    """Historique d'un indicateur, prévision statistique et intervalle de confiance"""
+    df = df_previsions[df_previsions['Indicateur'] == indicateur]
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=df['Annee'], y=df['Borne_Sup'],
+        mode='lines', line=dict(width=0),
+        showlegend=False, hoverinfo='skip'
+    ))
+    fig.add_trace(go.Scatter(
+        x=df['Annee'], y=df['Borne_Inf'],
+        mode='lines', line=dict(width=0),
+        fill='tonexty', fillcolor='rgba(206, 17, 38, 0.15)',
+        name=f"Intervalle {niveau:.0%}"
+    ))
+    fig.add_trace(go.Scatter(
+        x=df['Annee'], y=df['Prevision'],
+        mode='lines+markers', name=f"Prévision ({modele})",
+        line=dict(color='#CE1126', width=2, dash='dash')
+    ))
+    fig.add_trace(go.Scatter(
+        x=df_historique['Annee'], y=df_historique[indicateur],
+        mode='lines+markers', name='Données Historiques',
+        line=dict(color='#000000', width=3)
+    ))
+    fig.update_layout(
+        title=f"Prévision : {indicateur.replace('_', ' ')}",
+        xaxis_title="Année",
+        height=450
+    )
+    return fig
+
+
+def carte_balayage(df_balayage, cooperation):
+    """Préparation médiane en fin d'horizon, par croissance budgétaire et localisation"""
+    df = df_balayage[np.isclose(df_balayage['cooperation'], cooperation)]
+    pivot = df.pivot_table(index='localisation', columns='croissance_budget', values='P50')
+    fig = go.Figure(go.Heatmap(
+        z=pivot.to_numpy(),
+        x=pivot.columns,
+        y=pivot.index,
+        colorscale='Reds',
+        colorbar=dict(title="Médiane (%)"),
+        hovertemplate="Budget +%{x}%<br>Localisation %{y:.2f}<br>Préparation médiane %{z:.1f}%<extra></extra>"
+    ))
+    fig.update_layout(
+        title=f"Préparation Médiane en Fin d'Horizon (coopération {cooperation:.2f})",
+        xaxis_title="Croissance budgétaire (%)",
+        yaxis_title="Localisation industrielle",
+        height=450
+    )
+    return fig
+
+
+def matrice_correlation(correlations):
+    """Matrice de corrélation entre indicateurs"""
+    import plotly.express as px
+
+    return px.imshow(correlations,
+                     text_auto='.2f',
+                     color_continuous_scale='RdBu_r',
+                     title="Matrice de Corrélation entre Indicateurs")
+
+
+def croissances_annuelles(df_croissances):
+    """Taux de croissance annuels de la préparation et des exercices"""
+    fig = go.Figure()
+
+    # min_max : les variations brutales d'une année sur l'autre ne sont pas lissées
+    fig.add_trace(courbe(
+        df_croissances['Annee'][1:],
+        df_croissances['Croissance_Readiness_Operative'][1:],
+        methode='min_max',
+        mode='lines+markers',
+        name='Croissance Préparation (%)',
+        line=dict(color='#CE1126', width=3)
+    ))
+
+    fig.add_trace(courbe(
+        df_croissances['Annee'][1:],
+        df_croissances['Croissance_Exercices_Combines'][1:],
+        methode='min_max',
+        mode='lines+markers',
+        name='Croissance Exercices (%)',
+        line=dict(color='#FECB00', width=3),
+        yaxis='y2'
+    ))
+
+    fig.update_layout(
+        title="Taux de Croissance Annuels (%)",
+        xaxis_title="Année",
+        yaxis=dict(title='Croissance Préparation (%)', side='left'),
+        yaxis2=dict(title='Croissance Exercices (%)', side='right', overlaying='y'),
+        height=400
+    )
+    return fig
+
+
+class CacheFigures:
+    """Cache LRU des figures construites, borné en mémoire
+
+    La clé combine le nom de la figure, la version des données utilisées et
+    les seuls contrôles dont la figure dépend : un changement d'option sans
+    rapport avec la figure la sert depuis le cache. Les figures sont gardées
+    construites (`go.Figure`, déjà validée) : st.plotly_chart n'en fait qu'une
+    copie avant de la sérialiser, alors qu'une spécification dict serait
+    reconstruite et revalidée à chaque rendu. Les entrées les moins récemment
+    utilisées sont évincées au-delà de `capacite` octets (taille de leur
+    sérialisation JSON).
+    """
+
+    def __init__(self, capacite=CAPACITE_CACHE_FIGURES):
+        self.capacite = capacite
+        self.taille = 0
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+        self.succes = 0
+        self.echecs = 0
+        self.evictions = 0
+
+    def obtenir(self, cle, construire):
+        """Renvoie la figure de `cle`, construite via `construire` en cas d'absence
+
+        La figure est partagée entre les sessions : à ne pas modifier.
+        """
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None:
+                self._entrees.move_to_end(cle)
+                self.succes += 1
+        if entree is not None:
+            return entree[0]
+
+        fig = construire()
+        self._stocker(cle, fig, len(fig.to_json().encode("utf-8")))
+        return fig
+
+    def _stocker(self, cle, fig, taille):
+        with self._verrou:
+            self.echecs += 1
+            if taille > self.capacite or cle in self._entrees:
+                return
+            self._entrees[cle] = (fig, taille)
+            self.taille += taille
+            while self.taille > self.capacite:
+                _, (_, taille_evincee) = self._entrees.popitem(last=False)
+                self.taille -= taille_evincee
+                self.evictions += 1
+
+    def vider(self):
+        """Vide le cache"""
+        with self._verrou:
+            self._entrees.clear()
+            self.taille = 0
+
+    def purger(self, perimee):
+        """Supprime les figures dont la clé vérifie `perimee` ; renvoie leur nombre"""
+        with self._verrou:
+            cles = [cle for cle in self._entrees if perimee(cle)]
+            for cle in cles:
+                self.taille -= self._entrees.pop(cle)[1]
+        return len(cles)
+
+    def metriques_prometheus(self):
+        """Expose les compteurs du cache au format texte Prometheus"""
+        with self._verrou:
+            succes, echecs, evictions = self.succes, self.echecs, self.evictions
+            entrees, taille = len(self._entrees), self.taille
+        return "\n".join([
+            "# HELP armee_cache_figures_requetes_total Figures demandées au cache.",
+            "# TYPE armee_cache_figures_requetes_total counter",
+            f'armee_cache_figures_requetes_total{{resultat="hit"}} {succes}',
+            f'armee_cache_figures_requetes_total{{resultat="miss"}} {echecs}',
+            "# HELP armee_cache_figures_evictions_total Figures évincées (LRU).",
+            "# TYPE armee_cache_figures_evictions_total counter",
+            f'armee_cache_figures_evictions_total {evictions}',
+            "# HELP armee_cache_figures_entrees Figures actuellement en cache.",
+            "# TYPE armee_cache_figures_entrees gauge",
+            f'armee_cache_figures_entrees {entrees}',
+            "# HELP armee_cache_figures_octets Taille des figures sérialisées en cache.",
+            "# TYPE armee_cache_figures_octets gauge",
+            f'armee_cache_figures_octets {taille}',
+            ""
+        ])
+
+
+# Instance unique pour le processus, partagée par toutes les sessions
+CACHE_FIGURES = CacheFigures()
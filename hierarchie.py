@@ -0,0 +1,124 @@
+# hierarchie.py
+"""Ordre de bataille indexé : cumuls de tout nœud sans parcourir l'arbre
+
+Les bataillons sont rangés dans l'ordre de l'arbre (commandement, division,
+brigade, bataillon) : les feuilles de chaque nœud forment alors un
+intervalle contigu [debut, fin). Avec les sommes préfixes des mesures, le
+total d'un nœud est une différence de deux lignes, et les totaux de tous
+les enfants d'un nœud une seule soustraction vectorisée.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+
+NIVEAUX = ("Commandement", "Division", "Brigade", "Bataillon")
+
+# Colonne du type de division, compté en divisions par type (mesures Divisions_<type>)
+COLONNE_TYPE_DIVISION = "Type_Division"
+PREFIXE_DIVISIONS = "Divisions_"
+
+
+class OrdreBataille:
+    """Arbre commandement -> division -> brigade -> bataillon et sommes préfixes de ses mesures
+
+    `mesures` : colonnes numériques cumulées (par défaut toutes). S'y
+    ajoutent les comptes de divisions par type (Divisions_<type>). Un
+    chemin est un tuple de libellés depuis la racine : () pour l'armée
+    entière, ("Commandement Nord",), ("Commandement Nord", "1re Division blindée")...
+    """
+
+    def __init__(self, df_unites, mesures=None):
+        # Rang de chaque nœud par ordre d'apparition, niveau par niveau ; tri stable de l'arbre
+        codes, code = [], np.zeros(len(df_unites), dtype=np.int64)
+        for niveau in NIVEAUX:
+            codes_niveau = pd.factorize(df_unites[niveau])[0].astype(np.int64)
+            # Chemin = (chemin parent, libellé) ; factorize garde l'ordre d'apparition
+            code = pd.factorize(code * (codes_niveau.max(initial=0) + 1) + codes_niveau)[0].astype(np.int64)
+            codes.append(code)
+        ordre = np.lexsort(codes[::-1])
+        df = df_unites.iloc[ordre]
+        codes = [code[ordre] for code in codes]
+        self.nombre_bataillons = len(df)
+
+        self._niveaux = []
+        for k, niveau in enumerate(NIVEAUX):
+            debuts = np.flatnonzero(np.r_[True, codes[k][1:] != codes[k][:-1]]) if len(df) else np.array([], int)
+            self._niveaux.append({
+                "libelles": df[niveau].iloc[debuts].astype(str).to_numpy(),
+                "debuts": debuts,
+                "fins": np.r_[debuts[1:], len(df)].astype(int)
+            })
+
+        self.mesures = list(mesures) if mesures is not None else list(df.select_dtypes("number").columns)
+        valeurs = df[self.mesures].to_numpy(dtype=float)
+        # Divisions par type : 1 sur le premier bataillon de chaque division
+        if COLONNE_TYPE_DIVISION in df.columns:
+            debuts_divisions = self._niveaux[NIVEAUX.index("Division")]["debuts"]
+            types = df[COLONNE_TYPE_DIVISION].iloc[debuts_divisions].astype(str).to_numpy()
+            self.types_division = list(dict.fromkeys(types))
+            comptes = np.zeros((len(df), len(self.types_division)))
+            comptes[debuts_divisions, [self.types_division.index(t) for t in types]] = 1
+            valeurs = np.hstack([valeurs, comptes])
+            self.mesures += [PREFIXE_DIVISIONS + t for t in self.types_division]
+        else:
+            self.types_division = []
+        self._cumuls = np.vstack([np.zeros((1, len(self.mesures))), np.cumsum(valeurs, axis=0)])
+        self.mesures = tuple(self.mesures)
+        self.types_division = tuple(self.types_division)
+        # Index partagé entre sessions : tableaux en lecture seule
+        for tableau in (self._cumuls, *(t for niveau in self._niveaux for t in niveau.values())):
+            tableau.flags.writeable = False
+
+    def instantane(self):
+        """Renvoie une copie superficielle : tableaux partagés, en lecture seule"""
+        return copy.copy(self)
+
+    def _intervalle(self, chemin):
+        """Renvoie l'intervalle [debut, fin) des bataillons du nœud `chemin`"""
+        if len(chemin) > len(NIVEAUX):
+            raise KeyError(chemin)
+        debut, fin = 0, self.nombre_bataillons
+        for k, libelle in enumerate(chemin):
+            niveau = self._niveaux[k]
+            # Nœuds du niveau k compris dans le parent, puis recherche du libellé parmi eux
+            i, j = np.searchsorted(niveau["debuts"], [debut, fin])
+            trouves = np.flatnonzero(niveau["libelles"][i:j] == libelle)
+            if not len(trouves):
+                raise KeyError(chemin)
+            debut, fin = int(niveau["debuts"][i + trouves[0]]), int(niveau["fins"][i + trouves[0]])
+        return debut, fin
+
+    def total(self, chemin=()):
+        """Renvoie les totaux des mesures et le nombre de Bataillons du nœud `chemin` (Series)
+
+        En O(1) une fois le nœud trouvé.
+        """
+        debut, fin = self._intervalle(chemin)
+        return pd.Series([*(self._cumuls[fin] - self._cumuls[debut]), fin - debut],
+                         index=[*self.mesures, "Bataillons"])
+
+    def enfants(self, chemin=()):
+        """Renvoie les enfants du nœud `chemin` et leurs totaux
+
+        DataFrame d'une ligne par enfant, dans l'ordre de l'arbre : colonne
+        du niveau des enfants (libellé), mesures et nombre de Bataillons.
+        Vide pour un bataillon.
+        """
+        if len(chemin) >= len(NIVEAUX):
+            return pd.DataFrame(columns=[NIVEAUX[-1], *self.mesures, "Bataillons"])
+        debut, fin = self._intervalle(chemin)
+        niveau = self._niveaux[len(chemin)]
+        i, j = np.searchsorted(niveau["debuts"], [debut, fin])
+        return self._totaux(NIVEAUX[len(chemin)], niveau, slice(i, j))
+
+    def par_niveau(self, nom):
+        """Renvoie les totaux de tous les nœuds du niveau `nom` (ex. chaque commandement)"""
+        return self._totaux(nom, self._niveaux[NIVEAUX.index(nom)], slice(None))
+
+    def _totaux(self, nom, niveau, selection):
+        debuts, fins = niveau["debuts"][selection], niveau["fins"][selection]
+        df = pd.DataFrame(self._cumuls[fins] - self._cumuls[debuts], columns=list(self.mesures))
+        df.insert(0, nom, niveau["libelles"][selection])
+        df["Bataillons"] = fins - debuts
+        return df
@@ -0,0 +1,138 @@
+# ingestion.py
+"""Ingestion incrémentale d'un extrait dans une table partitionnée
+
+L'extrait est découpé selon la colonne de partition (année, pays...) et
+seules les partitions dont le contenu a changé sont réécrites : les
+autres gardent leur fichier, donc leur empreinte, et le dashboard ne
+relit et ne recalcule que ce qui dépend des partitions réécrites (voir
+DepotDonnees.rafraichir). L'empreinte du contenu est gardée dans les
+métadonnées du schéma de chaque partition.
+
+    python ingestion.py extrait.parquet --table capacites --cle Annee
+    python ingestion.py extrait.csv --table regionales --cle Pays --format arrow
+"""
+import argparse
+import hashlib
+import os
+import re
+
+import pandas as pd
+
+from stockage import COLONNE_ANNEE, EXTENSIONS, TAILLE_ROW_GROUP, VARIABLE_REPERTOIRE
+
+# Clé des métadonnées du schéma portant l'empreinte du contenu
+CLE_EMPREINTE = b"armee_empreinte"
+
+# Caractères interdits dans un nom de fichier, remplacés dans les valeurs de clé
+_CARACTERES_INTERDITS = re.compile(r'[\\/:*?"<>|=]')
+
+
+def empreinte_contenu(df):
+    """Renvoie une empreinte du contenu d'un DataFrame (valeurs, colonnes et types)"""
+    empreinte = hashlib.sha1(repr([(c, str(t)) for c, t in df.dtypes.items()]).encode("utf-8"))
+    empreinte.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return empreinte.hexdigest()
+
+
+def nom_partition(cle, valeur, extension=".parquet"):
+    """Renvoie le nom du fichier de la partition `cle`=`valeur`"""
+    return f"{cle}={_CARACTERES_INTERDITS.sub('_', str(valeur))}{extension}"
+
+
+def empreinte_fichier(chemin):
+    """Renvoie l'empreinte de contenu notée dans une partition, ou None"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if chemin.endswith(".parquet"):
+        metadonnees = pq.read_schema(chemin).metadata
+    else:
+        with pa.memory_map(chemin) as fichier:
+            metadonnees = pa.ipc.open_file(fichier).schema.metadata
+    valeur = (metadonnees or {}).get(CLE_EMPREINTE)
+    return valeur.decode("utf-8") if valeur is not None else None
+
+
+def ecrire_partition(df, chemin, empreinte):
+    """Écrit une partition avec son empreinte, sous un nom temporaire puis renommée"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), CLE_EMPREINTE: empreinte.encode()})
+    temporaire = chemin + ".partiel"
+    try:
+        if chemin.endswith(".parquet"):
+            pq.write_table(table, temporaire, row_group_size=TAILLE_ROW_GROUP)
+        else:
+            with pa.OSFile(temporaire, "wb") as fichier, pa.ipc.new_file(fichier, table.schema) as writer:
+                writer.write_table(table)
+    except BaseException:
+        if os.path.exists(temporaire):
+            os.unlink(temporaire)
+        raise
+    os.replace(temporaire, chemin)
+
+
+def ingerer(df, repertoire, table, cle=COLONNE_ANNEE, extension=".parquet"):
+    """Écrit `df` dans les partitions `cle` de `table` ; renvoie {"ecrites": [...], "inchangees": [...]}
+
+    Seules les partitions présentes dans l'extrait sont concernées ; une
+    partition dont le contenu est identique au fichier existant n'est pas
+    réécrite.
+    """
+    for ext in EXTENSIONS:
+        if os.path.exists(os.path.join(repertoire, table + ext)):
+            raise ValueError(f"la table {table} est un fichier unique ({table}{ext}) : "
+                             f"le retirer avant d'ingérer en partitions")
+    if cle not in df.columns:
+        raise KeyError(f"colonne de partition absente de l'extrait : {cle}")
+    dossier = os.path.join(repertoire, table)
+    os.makedirs(dossier, exist_ok=True)
+
+    bilan = {"ecrites": [], "inchangees": []}
+    for valeur, partie in df.groupby(cle, sort=True, observed=True):
+        if COLONNE_ANNEE in partie.columns:
+            # Tri par année : row groups sélectifs, comme les tables en un fichier
+            partie = partie.sort_values(COLONNE_ANNEE, kind="stable")
+        partie = partie.reset_index(drop=True)
+        nom = nom_partition(cle, valeur, extension)
+        chemin = os.path.join(dossier, nom)
+        empreinte = empreinte_contenu(partie)
+        if os.path.exists(chemin) and empreinte_fichier(chemin) == empreinte:
+            bilan["inchangees"].append(nom)
+            continue
+        ecrire_partition(partie, chemin, empreinte)
+        bilan["ecrites"].append(nom)
+    return bilan
+
+
+def lire_extrait(chemin):
+    """Lit un extrait Parquet, Arrow IPC ou CSV"""
+    if chemin.endswith(".csv"):
+        return pd.read_csv(chemin)
+    if chemin.endswith(".parquet"):
+        return pd.read_parquet(chemin)
+    return pd.read_feather(chemin)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("extrait", help="fichier Parquet, Arrow IPC ou CSV")
+    parser.add_argument("--table", required=True)
+    parser.add_argument("--cle", default=COLONNE_ANNEE, help="colonne de partition (défaut : Annee)")
+    parser.add_argument("--repertoire", default=os.environ.get(VARIABLE_REPERTOIRE),
+                        help=f"répertoire des données (défaut : ${VARIABLE_REPERTOIRE})")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    args = parser.parse_args()
+    if not args.repertoire:
+        parser.error(f"--repertoire ou {VARIABLE_REPERTOIRE} requis")
+
+    bilan = ingerer(lire_extrait(args.extrait), args.repertoire, args.table, args.cle, f".{args.format}")
+    print(f"{len(bilan['ecrites'])} partition(s) réécrite(s), {len(bilan['inchangees'])} inchangée(s)")
+    for nom in bilan["ecrites"]:
+        print(f"  {nom}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# instrumentation.py
+"""Instrumentation des sections du dashboard : durée par phase et octets envoyés
+
+Un appel de section échantillonné est découpé en phases exclusives (une
+phase imbriquée suspend celle qui l'englobe) :
+- donnees : lecture des tables (DepotDonnees.table) et attente des
+  chargements lancés en arrière-plan (Dashboard.attendre) ;
+- calcul : caractéristiques dérivées, projections, prévisions (DepotDonnees.derive) ;
+- figures : construction ou relecture des figures (cache des figures) ;
+- serialisation : conversion des figures et tables en messages Streamlit ;
+- rendu : le reste de la section (texte, widgets, mise en page).
+Les octets sont ceux des messages envoyés au navigateur pendant l'appel ;
+ils ne sont comptés que pour les versions de Streamlit dont l'API privée
+interceptée a été vérifiée (VERSIONS_ENQUEUE), et restent à 0 sinon.
+
+Hors échantillon, une section ne coûte qu'un tirage aléatoire et chaque
+phase une lecture de ContextVar : l'instrumentation peut rester active.
+
+    ARMEE_ECHANTILLONNAGE=0.05      # part des appels mesurés (défaut : 0.1)
+    ARMEE_JOURNAL_SECTIONS=sections.jsonl   # une ligne JSON par appel mesuré
+"""
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+import warnings
+from collections import deque
+from contextlib import contextmanager
+
+VARIABLE_TAUX = "ARMEE_ECHANTILLONNAGE"
+TAUX_DEFAUT = 0.1
+VARIABLE_JOURNAL = "ARMEE_JOURNAL_SECTIONS"
+
+PHASES = ("donnees", "calcul", "figures", "serialisation", "rendu")
+
+# Appels mesurés gardés pour le panneau de diagnostic
+TAILLE_HISTORIQUE = 200
+
+# Clé de session qui fait mesurer tous les appels de la session (?diagnostics=1)
+CLE_DIAGNOSTICS = "diagnostics_sections"
+
+# Versions de Streamlit [min, max) dont ScriptRunContext._enqueue (API privée,
+# interceptée pour compter les octets envoyés) a été vérifié
+VERSIONS_ENQUEUE = ((1, 52), (2, 0))
+
+# Mesure de la section en cours : None hors section, False si l'appel n'est pas échantillonné
+_MESURE = contextvars.ContextVar("mesure_section", default=None)
+
+
+class MesureSection:
+    """Chronométrage d'un appel de section, phase par phase"""
+
+    def __init__(self, section):
+        self.section = section
+        self.durees = dict.fromkeys(PHASES, 0.0)
+        self.octets = 0
+        self._pile = ["rendu"]
+        self._depuis = time.perf_counter()
+
+    def _imputer(self):
+        # Temps écoulé depuis le dernier changement de phase, imputé à la phase courante
+        maintenant = time.perf_counter()
+        self.durees[self._pile[-1]] += maintenant - self._depuis
+        self._depuis = maintenant
+
+    def entrer(self, nom):
+        self._imputer()
+        self._pile.append(nom)
+
+    def sortir(self):
+        self._imputer()
+        self._pile.pop()
+
+    def terminer(self):
+        """Clôt la mesure et renvoie l'enregistrement de l'appel"""
+        self._imputer()
+        enregistrement = {
+            "horodatage": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "section": self.section,
+            "duree_s": round(sum(self.durees.values()), 6)
+        }
+        enregistrement.update({f"{nom}_s": round(duree, 6) for nom, duree in self.durees.items()})
+        enregistrement["octets"] = self.octets
+        return enregistrement
+
+
+@contextmanager
+def phase(nom):
+    """Impute la durée du bloc à la phase `nom` de la section mesurée en cours"""
+    mesure = _MESURE.get()
+    if not mesure:
+        yield
+        return
+    mesure.entrer(nom)
+    try:
+        yield
+    finally:
+        mesure.sortir()
+
+
+@functools.lru_cache(maxsize=None)
+def _interception_verifiee():
+    """Vrai si la version de Streamlit installée est de celles où _enqueue a été vérifié"""
+    import streamlit
+
+    try:
+        version = tuple(int(partie) for partie in streamlit.__version__.split(".")[:2])
+    except ValueError:
+        version = None
+    minimum, maximum = VERSIONS_ENQUEUE
+    if version is None or not minimum <= version < maximum:
+        warnings.warn(f"Streamlit {streamlit.__version__} : octets envoyés non comptés "
+                      f"(interception vérifiée de {minimum} à {maximum} exclu)", RuntimeWarning)
+        return False
+    return True
+
+
+def _compter_octets(mesure):
+    """Compte les octets des messages envoyés au navigateur ; renvoie la fonction de restauration"""
+    if not _interception_verifiee():
+        return lambda: None
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    contexte = get_script_run_ctx(suppress_warning=True)
+    envoyer = getattr(contexte, "_enqueue", None)
+    if not callable(envoyer):
+        return lambda: None
+
+    def compter(message):
+        mesure.octets += message.ByteSize()
+        envoyer(message)
+
+    contexte._enqueue = compter
+    return lambda: setattr(contexte, "_enqueue", envoyer)
+
+
+def _session_diagnostic():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    contexte = get_script_run_ctx(suppress_warning=True)
+    return contexte is not None and CLE_DIAGNOSTICS in contexte.session_state
+
+
+class Instrumentation:
+    """Collecteur des mesures de sections, partagé par toutes les sessions
+
+    Chaque appel d'une section décorée par `section` est compté ; une part
+    `taux` des appels (tous ceux d'une session en mode diagnostic) est
+    mesurée, agrégée par section, gardée dans l'historique et, si `journal`
+    est donné, ajoutée à ce fichier JSON lines. Une section appelée depuis
+    une autre est imputée à celle-ci.
+    """
+
+    def __init__(self, taux=None, journal=None, taille_historique=TAILLE_HISTORIQUE):
+        self.taux = float(os.environ.get(VARIABLE_TAUX, TAUX_DEFAUT)) if taux is None else taux
+        self.journal = journal if journal is not None else os.environ.get(VARIABLE_JOURNAL)
+        self.historique = deque(maxlen=taille_historique)
+        self._totaux = {}
+        self._verrou = threading.Lock()
+
+    def _totaux_section(self, nom):
+        return self._totaux.setdefault(nom, {"appels": 0, "echantillons": 0, "octets": 0,
+                                             **dict.fromkeys(PHASES, 0.0)})
+
+    def section(self, nom):
+        """Décorateur instrumentant les appels de la section `nom`"""
+        def decorateur(fonction):
+            @functools.wraps(fonction)
+            def enveloppe(*args, **kwargs):
+                if _MESURE.get() is not None:
+                    return fonction(*args, **kwargs)
+                mesuree = random.random() < self.taux or _session_diagnostic()
+                with self._verrou:
+                    self._totaux_section(nom)["appels"] += 1
+                if not mesuree:
+                    jeton = _MESURE.set(False)
+                    try:
+                        return fonction(*args, **kwargs)
+                    finally:
+                        _MESURE.reset(jeton)
+
+                mesure = MesureSection(nom)
+                jeton = _MESURE.set(mesure)
+                restaurer = _compter_octets(mesure)
+                try:
+                    resultat = fonction(*args, **kwargs)
+                finally:
+                    restaurer()
+                    _MESURE.reset(jeton)
+                self.enregistrer(mesure.terminer())
+                return resultat
+            return enveloppe
+        return decorateur
+
+    def enregistrer(self, enregistrement):
+        """Agrège un appel mesuré et l'ajoute à l'historique et au journal"""
+        with self._verrou:
+            totaux = self._totaux_section(enregistrement["section"])
+            totaux["echantillons"] += 1
+            totaux["octets"] += enregistrement["octets"]
+            for nom in PHASES:
+                totaux[nom] += enregistrement[f"{nom}_s"]
+            self.historique.append(enregistrement)
+            if self.journal:
+                with open(self.journal, "a", encoding="utf-8") as fichier:
+                    fichier.write(json.dumps(enregistrement, ensure_ascii=False) + "\n")
+
+    def synthese(self):
+        """Renvoie, par section, les appels, les appels mesurés et les moyennes par phase"""
+        with self._verrou:
+            totaux = {nom: dict(valeurs) for nom, valeurs in self._totaux.items()}
+        lignes = []
+        for nom, valeurs in sorted(totaux.items()):
+            echantillons = valeurs["echantillons"]
+            ligne = {"section": nom, "appels": valeurs["appels"], "echantillons": echantillons}
+            ligne.update({f"{nom_phase}_ms": round(valeurs[nom_phase] / echantillons * 1000, 2)
+                          if echantillons else None for nom_phase in PHASES})
+            ligne["total_ms"] = (round(sum(valeurs[nom_phase] for nom_phase in PHASES) / echantillons * 1000, 2)
+                                 if echantillons else None)
+            ligne["octets_moyens"] = valeurs["octets"] // echantillons if echantillons else None
+            lignes.append(ligne)
+        return lignes
+
+    def vider(self):
+        """Remet les compteurs et l'historique à zéro"""
+        with self._verrou:
+            self._totaux.clear()
+            self.historique.clear()
+
+    def metriques_prometheus(self):
+        """Expose les mesures des sections au format texte Prometheus"""
+        with self._verrou:
+            totaux = {nom: dict(valeurs) for nom, valeurs in sorted(self._totaux.items())}
+        lignes = [
+            "# HELP armee_section_echantillonnage Part des appels de section mesurés.",
+            "# TYPE armee_section_echantillonnage gauge",
+            f"armee_section_echantillonnage {self.taux}",
+            "# HELP armee_section_appels_total Appels de section.",
+            "# TYPE armee_section_appels_total counter",
+            *(f'armee_section_appels_total{{section="{nom}"}} {v["appels"]}' for nom, v in totaux.items()),
+            "# HELP armee_section_echantillons_total Appels de section mesurés.",
+            "# TYPE armee_section_echantillons_total counter",
+            *(f'armee_section_echantillons_total{{section="{nom}"}} {v["echantillons"]}'
+              for nom, v in totaux.items()),
+            "# HELP armee_section_secondes_total Durée des appels mesurés, par phase.",
+            "# TYPE armee_section_secondes_total counter",
+            *(f'armee_section_secondes_total{{section="{nom}",phase="{p}"}} {v[p]:.6f}'
+              for nom, v in totaux.items() for p in PHASES),
+            "# HELP armee_section_octets_total Octets envoyés au navigateur par les appels mesurés.",
+            "# TYPE armee_section_octets_total counter",
+            *(f'armee_section_octets_total{{section="{nom}"}} {v["octets"]}' for nom, v in totaux.items()),
+            ""
+        ]
+        return "\n".join(lignes)
+
+
+# Instance unique pour le processus, partagée par toutes les sessions
+INSTRUMENTATION = Instrumentation()
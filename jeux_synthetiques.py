@@ -0,0 +1,250 @@
+# jeux_synthetiques.py
+"""Jeux de données synthétiques à grande échelle, au schéma des fixtures
+
+Chaque table est produite par blocs vectorisés et écrite au fil de l'eau
+(stockage.ecrire_lots) : la mémoire utilisée ne dépend que de la taille
+d'un lot, pas du nombre de lignes.
+- structure, regionales, programmes : les premières lignes reprennent les
+  fixtures, les suivantes en sont des variantes numérotées (valeurs tirées
+  autour de la ligne de référence) ;
+- equipements : inventaire par unité (colonne Unite), une ligne par unité
+  et par type des fixtures, quantités tirées autour de la référence ;
+- capacites : série mensuelle par unité suivie (colonnes Unite et Mois, une
+  ligne par unité et par mois, triée par année), autour de la trajectoire
+  des fixtures ;
+- reperes : une ligne par année ;
+- unites : ordre de bataille déployé depuis la structure générée (une
+  ligne par bataillon, voir stockage.ordre_bataille).
+
+Chaque bloc de BLOC_GENERATION lignes est tiré d'un générateur initialisé
+par (graine, table, bloc) : le jeu ne dépend que de la graine, ni de la
+taille des lots ni de l'ordre de génération.
+
+    python jeux_synthetiques.py --sortie donnees_synth --unites 100000
+    python jeux_synthetiques.py --sortie donnees_100M --unites 641026 --format arrow   # ~100 M lignes
+    ARMEE_DONNEES_DIR=donnees_synth streamlit run Dashboard.py
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from stockage import FIXTURES, ecrire_lots, ordre_bataille
+
+# Lignes tirées par bloc (unité de reproductibilité) et lignes écrites par lot
+BLOC_GENERATION = 65536
+TAILLE_LOT_GENERATION = 1_048_576
+
+ANNEES_DEFAUT = (2012, 2024)
+
+# Ordre des tables : sert aussi d'identifiant dans l'initialisation des générateurs
+TABLES = ("structure", "equipements", "capacites", "regionales", "programmes", "reperes", "unites")
+
+# Colonne libellé de chaque table de référence, numérotée pour les variantes
+LIBELLES = {
+    "structure": "Commandements",
+    "equipements": "Type",
+    "regionales": "Pays",
+    "programmes": "Programme"
+}
+
+# Dispersion (écart-type du logarithme) des variantes autour de leur ligne de référence
+DISPERSION = 0.25
+
+# Bornes des indicateurs en pourcentage
+BORNES = {
+    "Readiness_Operative": (1, 99),
+    "Taux_Modernite": (0, 100)
+}
+
+# Colonnes non multipliées (années) et année de référence du statut des programmes
+COLONNES_FIXES = ("Annee", "Debut", "Fin")
+ANNEE_STATUT = 2024
+
+
+def _generateur(graine, table, bloc):
+    return np.random.default_rng([graine, TABLES.index(table), bloc])
+
+
+def _blocs(nombre):
+    """Découpe [0, nombre) en blocs de BLOC_GENERATION lignes : (numéro, début, fin)"""
+    for numero, debut in enumerate(range(0, nombre, BLOC_GENERATION)):
+        yield numero, debut, min(debut + BLOC_GENERATION, nombre)
+
+
+def regrouper(morceaux, taille_lot=TAILLE_LOT_GENERATION):
+    """Regroupe des DataFrames successifs en lots d'environ `taille_lot` lignes"""
+    en_attente, lignes = [], 0
+    for morceau in morceaux:
+        en_attente.append(morceau)
+        lignes += len(morceau)
+        if lignes >= taille_lot:
+            yield pd.concat(en_attente, ignore_index=True)
+            en_attente, lignes = [], 0
+    if en_attente:
+        yield pd.concat(en_attente, ignore_index=True)
+
+
+def _arrondir(colonne, valeurs, reference):
+    if colonne in BORNES:
+        valeurs = np.clip(valeurs, *BORNES[colonne])
+    if pd.api.types.is_integer_dtype(reference.dtype):
+        return np.rint(valeurs).astype("int64")
+    return valeurs.round(1)
+
+
+def variantes(table, nombre, graine, par_unite=False):
+    """Produit, bloc par bloc, `nombre` lignes de la table de référence `table`
+
+    Avec `par_unite`, chaque unité (colonne Unite) reprend toutes les lignes
+    de référence, libellés inchangés : inventaire par unité, dont les
+    quantités (Quantite_AAAA) sont tirées pour que leur somme sur les unités
+    reste proche des totaux de référence.
+    """
+    fixture = FIXTURES[table]()
+    libelle = LIBELLES[table]
+    references = fixture[libelle].astype(str).to_numpy()
+    numeriques = [c for c in fixture.select_dtypes("number").columns if c not in COLONNES_FIXES]
+    nombre_unites = max(1, nombre // len(fixture))
+
+    for bloc, debut, fin in _blocs(nombre):
+        generateur = _generateur(graine, table, bloc)
+        lignes = np.arange(debut, fin)
+        modele = lignes % len(fixture)
+        copie = lignes >= len(fixture) if not par_unite else np.ones(len(lignes), dtype=bool)
+        if par_unite:
+            morceau = pd.DataFrame({libelle: references[modele],
+                                    "Unite": (lignes // len(fixture)).astype("int64")})
+        else:
+            morceau = pd.DataFrame({
+                libelle: np.where(copie, np.char.add(references[modele], np.char.add(" #", lignes.astype(str))),
+                                  references[modele])
+            })
+        for colonne in fixture.columns.drop(libelle):
+            reference = fixture[colonne]
+            valeurs = reference.to_numpy()[modele]
+            if colonne in numeriques:
+                facteurs = np.where(copie, generateur.lognormal(0.0, DISPERSION, len(lignes)), 1.0)
+                if par_unite and colonne.startswith("Quantite_"):
+                    valeurs = generateur.poisson(valeurs * facteurs / nombre_unites)
+                else:
+                    valeurs = _arrondir(colonne, valeurs * facteurs, reference)
+            morceau[colonne] = valeurs
+
+        if table == "programmes":
+            # Calendrier décalé, durée conservée ; statut cohérent avec la date de fin
+            decalage = np.where(copie, generateur.integers(-6, 7, len(lignes)), 0)
+            morceau["Debut"] = morceau["Debut"] + decalage
+            morceau["Fin"] = morceau["Fin"] + decalage
+            morceau["Statut"] = np.where(morceau["Fin"] <= ANNEE_STATUT, "Terminé", "En cours")
+        yield morceau
+
+
+def capacites_mensuelles(unites, graine, annees=ANNEES_DEFAUT):
+    """Produit la table `capacites` : une ligne par unité et par mois, triée par année
+
+    Les colonnes Unite et Mois (1 à 12) identifient la ligne ; les séries
+    annuelles les moyennent (voir agregats.annualiser). Chaque unité suit la trajectoire annuelle des fixtures (interpolée au
+    mois, prolongée à plat hors de leur période) à un facteur propre près,
+    avec un bruit mensuel. Les lignes d'un mois sont produites par blocs
+    d'unités.
+    """
+    fixture = FIXTURES["capacites"]()
+    indicateurs = list(fixture.columns.drop("Annee"))
+    annees_fixture = fixture["Annee"].to_numpy(dtype=float)
+    mois = np.arange((annees[1] - annees[0] + 1) * 12)
+
+    for numero_mois in mois:
+        annee = annees[0] + numero_mois // 12
+        instant = annees[0] + numero_mois / 12
+        tendance = {colonne: np.interp(instant, annees_fixture, fixture[colonne].to_numpy(dtype=float))
+                    for colonne in indicateurs}
+        for bloc, debut, fin in _blocs(unites):
+            # Facteurs propres aux unités : même tirage pour tous les mois
+            facteurs = _generateur(graine, "capacites", bloc).lognormal(0.0, DISPERSION / 2,
+                                                                         (len(indicateurs), fin - debut))
+            bruit = np.random.default_rng([graine, TABLES.index("capacites"), bloc, int(numero_mois)])
+            morceau = {"Annee": np.full(fin - debut, annee, dtype="int64"),
+                       "Mois": np.full(fin - debut, numero_mois % 12 + 1, dtype="int64"),
+                       "Unite": np.arange(debut, fin, dtype="int64")}
+            for i, colonne in enumerate(indicateurs):
+                valeurs = tendance[colonne] * facteurs[i] * bruit.normal(1.0, 0.03, fin - debut)
+                morceau[colonne] = _arrondir(colonne, valeurs, fixture[colonne])
+            yield pd.DataFrame(morceau)
+
+
+def reperes_annuels(annees=ANNEES_DEFAUT):
+    """Produit la table `reperes` : une ligne par année, interpolée entre les années de référence"""
+    fixture = FIXTURES["reperes"]()
+    annees_reperes = fixture["Annee"].to_numpy(dtype=float)
+    serie = np.arange(annees[0], annees[1] + 1)
+    morceau = {"Annee": serie}
+    for colonne in fixture.columns.drop("Annee"):
+        valeurs = fixture[colonne].to_numpy(dtype=float)
+        # Prolongement linéaire au-delà des années de référence
+        pente = (valeurs[-1] - valeurs[0]) / (annees_reperes[-1] - annees_reperes[0])
+        morceau[colonne] = np.rint(valeurs[0] + pente * (serie - annees_reperes[0])).astype("int64")
+    yield pd.DataFrame(morceau)
+
+
+def ordre_bataille_synthetique(commandements, graine):
+    """Produit la table `unites` des `commandements` générés, bloc de commandements par bloc"""
+    # Numérotation des divisions poursuivie d'un bloc à l'autre
+    premiers_numeros = {}
+    for morceau in variantes("structure", commandements, graine):
+        yield ordre_bataille(morceau, premiers_numeros)
+
+
+def generer(sortie, commandements=5_000, unites=50_000, pays=300, programmes=2_000, annees=ANNEES_DEFAUT,
+            graine=0, extension=".parquet", taille_lot=TAILLE_LOT_GENERATION):
+    """Écrit le jeu synthétique dans `sortie` et renvoie {table: (lignes, durée en s)}
+
+    `unites` fixe les unités inventoriées dans `equipements` (unites x types
+    lignes) et suivies mensuellement dans `capacites` (unites x mois lignes).
+    """
+    os.makedirs(sortie, exist_ok=True)
+    productions = {
+        "structure": lambda: variantes("structure", commandements, graine),
+        "equipements": lambda: variantes("equipements", unites * len(FIXTURES["equipements"]()), graine,
+                                         par_unite=True),
+        "capacites": lambda: capacites_mensuelles(unites, graine, annees),
+        "regionales": lambda: variantes("regionales", pays, graine),
+        "programmes": lambda: variantes("programmes", programmes, graine),
+        "reperes": lambda: reperes_annuels(annees),
+        "unites": lambda: ordre_bataille_synthetique(commandements, graine)
+    }
+    bilan = {}
+    for table, production in productions.items():
+        debut = time.perf_counter()
+        lignes = ecrire_lots(regrouper(production(), taille_lot), os.path.join(sortie, table + extension))
+        bilan[table] = (lignes, time.perf_counter() - debut)
+    return bilan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sortie", required=True, help="répertoire du jeu (une table par fichier)")
+    parser.add_argument("--commandements", type=int, default=5_000,
+                        help="lignes de structure, déployées en bataillons dans unites (défaut : 5000)")
+    parser.add_argument("--unites", type=int, default=50_000,
+                        help="unités : inventaires d'equipements, séries mensuelles de capacites (défaut : 50000)")
+    parser.add_argument("--pays", type=int, default=300, help="lignes de regionales (défaut : 300)")
+    parser.add_argument("--programmes", type=int, default=2_000, help="lignes de programmes (défaut : 2000)")
+    parser.add_argument("--annees", type=int, nargs=2, default=list(ANNEES_DEFAUT), metavar=("DEBUT", "FIN"))
+    parser.add_argument("--graine", type=int, default=0)
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--taille-lot", type=int, default=TAILLE_LOT_GENERATION, help="lignes par lot écrit")
+    args = parser.parse_args()
+
+    bilan = generer(args.sortie, args.commandements, args.unites, args.pays, args.programmes,
+                    tuple(args.annees), args.graine, f".{args.format}", args.taille_lot)
+    for table, (lignes, duree) in bilan.items():
+        print(f"{table:<12} {lignes:>13,} lignes  {duree:>7.1f} s  {lignes / max(duree, 1e-9):>13,.0f} lignes/s")
+    total = sum(lignes for lignes, _ in bilan.values())
+    print(f"{'total':<12} {total:>13,} lignes  {sum(d for _, d in bilan.values()):>7.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+# previsions.py
+"""Prévisions statistiques des séries du dashboard et cache des modèles ajustés"""
+import copy
+import threading
+import warnings
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from stockage import COLONNES_DETAIL
+
+# statsmodels et scipy sont importés dans les seules méthodes qui les utilisent :
+# leur coût d'import n'est payé qu'à la première prévision demandée.
+
+# Années prévues après la dernière année observée
+HORIZON_PREVISION = 6
+
+# Niveau des intervalles de confiance
+NIVEAU_CONFIANCE = 0.95
+
+# Observations ajoutées incrémentalement avant une réestimation complète des paramètres
+REESTIMATION_COMPLETE = 5
+
+# Observations minimales pour ajuster un modèle sur une série
+OBSERVATIONS_MINIMALES = 5
+
+# Modèles ajustés gardés en cache (LRU), toutes séries et unités confondues
+CAPACITE_MODELES = 10_000
+
+
+class ModeleTendance:
+    """Tendance linéaire par moindres carrés, intervalles de prévision de Student
+
+    Le modèle ne garde que ses statistiques suffisantes (sommes des années,
+    des valeurs, de leurs carrés et produits) : l'ajout d'années les met à
+    jour sans reparcourir la série.
+    """
+
+    def ajuster(self, annees, valeurs):
+        self.origine = annees[0]
+        self.sommes = np.zeros(6)
+        self.prolonger(annees, valeurs)
+
+    def prolonger(self, annees, valeurs):
+        x = np.asarray(annees, dtype=float) - self.origine
+        y = np.asarray(valeurs, dtype=float)
+        # Nouveau tableau : un modèle prolongé ne modifie pas celui qu'il copie
+        self.sommes = self.sommes + [len(x), x.sum(), y.sum(), x @ x, x @ y, y @ y]
+
+    def prevoir(self, annees, alpha):
+        from scipy import stats
+
+        n, sx, sy, sxx, sxy, syy = self.sommes
+        dispersion_x = sxx - sx * sx / n
+        pente = (sxy - sx * sy / n) / dispersion_x
+        ordonnee = (sy - pente * sx) / n
+        residus = max(syy - ordonnee * sy - pente * sxy, 0.0)
+        ecart_type = np.sqrt(residus / (n - 2))
+
+        x = np.asarray(annees, dtype=float) - self.origine
+        prevision = ordonnee + pente * x
+        marge = (stats.t.ppf(1 - alpha / 2, n - 2) * ecart_type
+                 * np.sqrt(1 + 1 / n + (x - sx / n) ** 2 / dispersion_x))
+        return prevision, prevision - marge, prevision + marge
+
+
+class ModeleArima:
+    """ARIMA(1, 1, 0) avec dérive
+
+    Les années ajoutées prolongent le filtre de Kalman sans réestimer les
+    paramètres ; ceux-ci sont réestimés (à partir des précédents) toutes
+    les REESTIMATION_COMPLETE années ajoutées.
+    """
+
+    ordre = (1, 1, 0)
+
+    def ajuster(self, annees, valeurs, parametres=None):
+        from statsmodels.tsa.arima.model import ARIMA
+
+        self.valeurs = np.asarray(valeurs, dtype=float)
+        self.ajouts = 0
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.resultats = ARIMA(self.valeurs, order=self.ordre, trend="t").fit(start_params=parametres)
+
+    def prolonger(self, annees, valeurs):
+        self.valeurs = np.concatenate([self.valeurs, valeurs])
+        self.ajouts += len(valeurs)
+        if self.ajouts >= REESTIMATION_COMPLETE:
+            self.ajuster(annees, self.valeurs, self.resultats.params)
+        else:
+            self.resultats = self.resultats.append(np.asarray(valeurs, dtype=float), refit=False)
+
+    def prevoir(self, annees, alpha):
+        prevision = self.resultats.get_forecast(len(annees))
+        bornes = np.asarray(prevision.conf_int(alpha=alpha))
+        return np.asarray(prevision.predicted_mean), bornes[:, 0], bornes[:, 1]
+
+
+class ModeleLissage:
+    """Lissage exponentiel de Holt amorti (ETS additif)
+
+    statsmodels ne sait pas prolonger un modèle ETS : l'ajout d'années
+    réestime le modèle en partant des paramètres précédents, ce qui
+    converge en quelques itérations.
+    """
+
+    def ajuster(self, annees, valeurs, parametres=None):
+        from statsmodels.tsa.exponential_smoothing.ets import ETSModel
+
+        self.valeurs = np.asarray(valeurs, dtype=float)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            # Série pandas : get_prediction en a besoin pour indexer ses résultats
+            modele = ETSModel(pd.Series(self.valeurs), error="add", trend="add", damped_trend=True)
+            self.resultats = modele.fit(start_params=parametres, disp=False)
+
+    def prolonger(self, annees, valeurs):
+        self.ajuster(annees, np.concatenate([self.valeurs, valeurs]), self.resultats.params)
+
+    def prevoir(self, annees, alpha):
+        debut = len(self.valeurs)
+        resume = self.resultats.get_prediction(start=debut, end=debut + len(annees) - 1).summary_frame(alpha=alpha)
+        return resume["mean"].to_numpy(), resume["pi_lower"].to_numpy(), resume["pi_upper"].to_numpy()
+
+
+MODELES = {
+    "tendance": ModeleTendance,
+    "arima": ModeleArima,
+    "lissage": ModeleLissage
+}
+
+
+class CacheModeles:
+    """Cache processus des modèles ajustés, un par (table, [unité,] série, modèle)
+
+    Chaque entrée garde les observations sur lesquelles le modèle a été
+    ajusté. À la demande suivante :
+    - mêmes observations (nouvelle version sans changement de la série) :
+      le modèle est réutilisé tel quel ;
+    - mêmes observations suivies d'années nouvelles : une copie du modèle est
+      prolongée (voir la méthode `prolonger` de chaque modèle) puis remplace
+      l'entrée ; le modèle déjà servi à d'autres sessions n'est jamais modifié ;
+    - sinon (valeurs révisées) : le modèle est réajusté entièrement.
+    Seules les séries modifiées sont donc réajustées à chaque nouvelle version.
+    Les modèles les moins récemment utilisés sont évincés au-delà de `capacite`.
+    """
+
+    def __init__(self, capacite=CAPACITE_MODELES):
+        self.capacite = capacite
+        self._entrees = OrderedDict()
+        # Verrou d'ajustement par clé et nombre de threads qui l'utilisent
+        self._verrous_cles = {}
+        self._verrou = threading.Lock()
+        self.reutilisations = 0
+        self.prolongations = 0
+        self.ajustements = 0
+        self.evictions = 0
+
+    @contextmanager
+    def _verrou_cle(self, cle):
+        with self._verrou:
+            verrou, utilisateurs = self._verrous_cles.get(cle, (None, 0))
+            if verrou is None:
+                verrou = threading.Lock()
+            self._verrous_cles[cle] = (verrou, utilisateurs + 1)
+        try:
+            with verrou:
+                yield
+        finally:
+            with self._verrou:
+                verrou, utilisateurs = self._verrous_cles[cle]
+                if utilisateurs == 1:
+                    del self._verrous_cles[cle]
+                else:
+                    self._verrous_cles[cle] = (verrou, utilisateurs - 1)
+
+    def _stocker(self, cle, entree):
+        with self._verrou:
+            self._entrees[cle] = entree
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.capacite:
+                self._entrees.popitem(last=False)
+                self.evictions += 1
+
+    def _compter(self, compteur):
+        with self._verrou:
+            setattr(self, compteur, getattr(self, compteur) + 1)
+
+    def modele(self, cle, nom_modele, annees, valeurs):
+        """Renvoie le modèle `nom_modele` ajusté sur la série (annees, valeurs)
+
+        Le modèle renvoyé est partagé et n'est plus modifié : `prevoir` peut
+        être appelé sans verrou.
+        """
+        with self._verrou_cle(cle):
+            with self._verrou:
+                entree = self._entrees.get(cle)
+            if entree is not None:
+                annees_connues, valeurs_connues, modele = entree
+                n = len(annees_connues)
+                if (len(annees) >= n and np.array_equal(annees[:n], annees_connues)
+                        and np.array_equal(valeurs[:n], valeurs_connues)):
+                    if len(annees) == n:
+                        self._stocker(cle, entree)
+                        self._compter("reutilisations")
+                        return modele
+                    # Les méthodes `prolonger` ne font que réaffecter des attributs :
+                    # une copie superficielle suffit à laisser intact le modèle partagé
+                    modele = copy.copy(modele)
+                    modele.prolonger(annees[n:], valeurs[n:])
+                    self._stocker(cle, (annees, valeurs, modele))
+                    self._compter("prolongations")
+                    return modele
+
+            modele = MODELES[nom_modele]()
+            modele.ajuster(annees, valeurs)
+            self._stocker(cle, (annees, valeurs, modele))
+            self._compter("ajustements")
+            return modele
+
+    def statistiques(self):
+        """Renvoie les compteurs du cache"""
+        with self._verrou:
+            return {
+                "reutilisations": self.reutilisations,
+                "prolongations": self.prolongations,
+                "ajustements": self.ajustements,
+                "evictions": self.evictions,
+                "modeles": len(self._entrees)
+            }
+
+    def metriques_prometheus(self):
+        """Expose les compteurs du cache au format texte Prometheus"""
+        stats = self.statistiques()
+        return "\n".join([
+            "# HELP armee_cache_modeles_requetes_total Modèles de prévision demandés, par issue.",
+            "# TYPE armee_cache_modeles_requetes_total counter",
+            f'armee_cache_modeles_requetes_total{{resultat="reutilise"}} {stats["reutilisations"]}',
+            f'armee_cache_modeles_requetes_total{{resultat="prolonge"}} {stats["prolongations"]}',
+            f'armee_cache_modeles_requetes_total{{resultat="ajuste"}} {stats["ajustements"]}',
+            "# HELP armee_cache_modeles_evictions_total Modèles évincés au-delà de la capacité.",
+            "# TYPE armee_cache_modeles_evictions_total counter",
+            f'armee_cache_modeles_evictions_total {stats["evictions"]}',
+            "# HELP armee_cache_modeles_entrees Modèles ajustés actuellement en cache.",
+            "# TYPE armee_cache_modeles_entrees gauge",
+            f'armee_cache_modeles_entrees {stats["modeles"]}',
+            ""
+        ])
+
+
+# Instance unique pour le processus, partagée par toutes les sessions
+CACHE_MODELES = CacheModeles()
+
+
+def prevoir_series(df, modele="tendance", horizon=HORIZON_PREVISION, niveau=NIVEAU_CONFIANCE,
+                   table="capacites", colonne_annee="Annee", cache=CACHE_MODELES):
+    """Prévoit chaque série numérique de `df` sur `horizon` années
+
+    Renvoie un DataFrame long (Indicateur, Annee, Prevision, Borne_Inf,
+    Borne_Sup), bornes de l'intervalle au `niveau` de confiance demandé.
+    Les séries de moins de OBSERVATIONS_MINIMALES valeurs sont ignorées.
+    Une table par unité (colonne Unite) donne une série par unité et par
+    indicateur, ajustée et mise en cache séparément (colonne Unite ajoutée
+    au résultat) ; plusieurs lignes par année (mois) sont moyennées.
+    """
+    alpha = 1 - niveau
+    par_unite = "Unite" in df.columns
+    colonnes = list(df.select_dtypes("number").columns.drop([colonne_annee, *COLONNES_DETAIL], errors="ignore"))
+    cles = ["Unite", colonne_annee] if par_unite else [colonne_annee]
+    moyennes = df[cles + colonnes].groupby(cles, sort=True).mean()
+    groupes = moyennes.groupby(level="Unite", sort=True) if par_unite else [(None, moyennes)]
+
+    resultats = []
+    for unite, series in groupes:
+        for colonne in colonnes:
+            serie = series[colonne].dropna()
+            if len(serie) < OBSERVATIONS_MINIMALES:
+                continue
+            annees = serie.index.get_level_values(colonne_annee).to_numpy(dtype=int)
+            valeurs = serie.to_numpy(dtype=float)
+
+            cle = (table, colonne, modele) if unite is None else (table, int(unite), colonne, modele)
+            ajuste = cache.modele(cle, modele, annees, valeurs)
+            annees_prevues = np.arange(annees[-1] + 1, annees[-1] + 1 + horizon)
+            prevision, borne_inf, borne_sup = ajuste.prevoir(annees_prevues, alpha)
+            resultat = pd.DataFrame({
+                "Indicateur": colonne,
+                "Annee": annees_prevues,
+                "Prevision": prevision,
+                "Borne_Inf": borne_inf,
+                "Borne_Sup": borne_sup
+            })
+            if par_unite:
+                resultat.insert(0, "Unite", unite)
+            resultats.append(resultat)
+
+    if not resultats:
+        colonnes_resultat = ["Indicateur", "Annee", "Prevision", "Borne_Inf", "Borne_Sup"]
+        return pd.DataFrame(columns=["Unite", *colonnes_resultat] if par_unite else colonnes_resultat)
+    return pd.concat(resultats, ignore_index=True)
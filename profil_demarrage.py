@@ -0,0 +1,128 @@
+# profil_demarrage.py
+"""Profil du temps d'import au démarrage à froid d'un worker du dashboard
+
+Lance `python -X importtime -c "import <module>"` dans un processus neuf et
+agrège les temps par module et par paquet racine :
+
+    python profil_demarrage.py                      # profil de Dashboard
+    python profil_demarrage.py --json profil.json   # rapport JSON à archiver
+    python profil_demarrage.py --comparer profil.json --tolerance 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def mesurer_imports(module, executable=sys.executable):
+    """Importe `module` dans un processus neuf et renvoie les temps d'import
+
+    Renvoie une liste de dictionnaires {module, propre_us, cumule_us}, dans
+    l'ordre d'achèvement des imports.
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    resultat = subprocess.run(
+        [executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if resultat.returncode != 0:
+        raise RuntimeError(f"Import de {module} impossible :\n{resultat.stderr}")
+
+    mesures = []
+    for ligne in resultat.stderr.splitlines():
+        if not ligne.startswith("import time:") or "self [us]" in ligne:
+            continue
+        propre, cumule, nom = ligne[len("import time:"):].split("|")
+        mesures.append({
+            "module": nom.strip(),
+            "propre_us": int(propre),
+            "cumule_us": int(cumule)
+        })
+    return mesures
+
+
+def agreger_par_paquet(mesures):
+    """Somme les temps propres par paquet racine (plotly, pandas...)"""
+    paquets = {}
+    for mesure in mesures:
+        racine = mesure["module"].split(".")[0]
+        paquets[racine] = paquets.get(racine, 0) + mesure["propre_us"]
+    return dict(sorted(paquets.items(), key=lambda item: item[1], reverse=True))
+
+
+def profiler(module="Dashboard"):
+    """Construit le rapport de démarrage de `module`"""
+    debut = time.perf_counter()
+    mesures = mesurer_imports(module)
+    duree = time.perf_counter() - debut
+    return {
+        "module": module,
+        "python": sys.version.split()[0],
+        "horodatage": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "processus_s": round(duree, 3),
+        "total_imports_us": sum(m["propre_us"] for m in mesures),
+        "paquets_us": agreger_par_paquet(mesures),
+        "modules": sorted(mesures, key=lambda m: m["cumule_us"], reverse=True)
+    }
+
+
+def afficher_rapport(rapport, limite=25):
+    """Affiche le rapport sous forme de tableau texte"""
+    print(f"Démarrage de {rapport['module']} (Python {rapport['python']}) : "
+          f"{rapport['total_imports_us'] / 1000:.0f} ms d'imports, "
+          f"{rapport['processus_s']:.2f} s de processus")
+    print()
+    print(f"{'Paquet':<30} {'ms':>10}")
+    for paquet, duree in list(rapport["paquets_us"].items())[:limite]:
+        print(f"{paquet:<30} {duree / 1000:>10.1f}")
+    print()
+    print(f"{'Module':<50} {'propre ms':>10} {'cumulé ms':>10}")
+    for mesure in rapport["modules"][:limite]:
+        print(f"{mesure['module']:<50} {mesure['propre_us'] / 1000:>10.1f} {mesure['cumule_us'] / 1000:>10.1f}")
+
+
+def comparer(rapport, reference, tolerance):
+    """Liste les paquets dont le temps d'import dépasse la référence de plus de `tolerance` %"""
+    regressions = []
+    for paquet, duree in rapport["paquets_us"].items():
+        avant = reference["paquets_us"].get(paquet)
+        if avant is None:
+            # Nouveau paquet au démarrage : signalé au-delà de 10 ms
+            if duree > 10000:
+                regressions.append((paquet, 0, duree))
+        elif duree > avant * (1 + tolerance / 100) and duree - avant > 5000:
+            regressions.append((paquet, avant, duree))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="Dashboard", help="module à importer (défaut : Dashboard)")
+    parser.add_argument("--json", help="écrit le rapport complet dans ce fichier")
+    parser.add_argument("--comparer", help="rapport JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="régression tolérée en %% (défaut : 20)")
+    parser.add_argument("--limite", type=int, default=25, help="nombre de lignes affichées")
+    args = parser.parse_args()
+
+    rapport = profiler(args.module)
+    afficher_rapport(rapport, args.limite)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fichier:
+            json.dump(rapport, fichier, ensure_ascii=False, indent=2)
+
+    if args.comparer:
+        with open(args.comparer, encoding="utf-8") as fichier:
+            reference = json.load(fichier)
+        regressions = comparer(rapport, reference, args.tolerance)
+        for paquet, avant, apres in regressions:
+            print(f"RÉGRESSION {paquet}: {avant / 1000:.1f} ms -> {apres / 1000:.1f} ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# projections.py
+"""Projections stochastiques de la préparation opérationnelle (Monte Carlo)"""
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+ANNEES_PROJECTION = list(range(2025, 2031))
+PERCENTILES = (5, 25, 50, 75, 95)
+NOMBRE_CHEMINS = 100_000
+
+# Effet annuel de chaque levier sur la préparation, en unités logit :
+# par point de croissance budgétaire, par unité d'intensité de modernisation
+# (0 à 1), par point de croissance des heures d'entraînement, et par unité de
+# localisation industrielle et de coopération internationale (0 à 1). L'usure
+# du parc fait baisser la préparation en l'absence d'investissement.
+EFFET_BUDGET = 0.004
+EFFET_MODERNISATION = 0.15
+EFFET_ENTRAINEMENT = 0.02
+EFFET_LOCALISATION = 0.05
+EFFET_COOPERATION = 0.04
+USURE_ANNUELLE = 0.20
+
+# Dispersion annuelle des trajectoires et incertitude sur la tendance propre à chaque chemin
+VOLATILITE = 0.08
+INCERTITUDE_TENDANCE = 0.03
+
+# Paramètres des scénarios du dashboard
+SCENARIOS = {
+    "Conservative": {"croissance_budget": 5.0, "modernisation": 0.2, "croissance_entrainement": 1.0},
+    "Moderne": {"croissance_budget": 15.0, "modernisation": 0.4, "croissance_entrainement": 1.5},
+    "Ambitieux": {"croissance_budget": 25.0, "modernisation": 0.9, "croissance_entrainement": 4.0}
+}
+
+
+def tendance_annuelle(croissance_budget, modernisation, croissance_entrainement,
+                      localisation=0.0, cooperation=0.0):
+    """Renvoie la tendance annuelle de la préparation (logit) induite par les leviers"""
+    return (EFFET_BUDGET * croissance_budget
+            + EFFET_MODERNISATION * modernisation
+            + EFFET_ENTRAINEMENT * croissance_entrainement
+            + EFFET_LOCALISATION * localisation
+            + EFFET_COOPERATION * cooperation
+            - USURE_ANNUELLE)
+
+
+def simuler_readiness(depart, croissance_budget, modernisation, croissance_entrainement,
+                      localisation=0.0, cooperation=0.0,
+                      horizon=len(ANNEES_PROJECTION), n_chemins=NOMBRE_CHEMINS, graine=0,
+                      volatilite=VOLATILITE, incertitude=INCERTITUDE_TENDANCE):
+    """Simule `n_chemins` trajectoires de préparation opérationnelle (%) sur `horizon` années
+
+    Toutes les trajectoires sont tirées en une opération sur un tableau
+    (n_chemins x horizon) : marche aléatoire en logit, de tendance fixée par
+    les leviers et propre à chaque chemin, ramenée dans ]0, 100[ par la
+    sigmoïde. Même graine, mêmes trajectoires.
+    """
+    generateur = np.random.default_rng(graine)
+    tendance = tendance_annuelle(croissance_budget, modernisation, croissance_entrainement,
+                                 localisation, cooperation)
+    tendances = tendance + incertitude * generateur.standard_normal((n_chemins, 1))
+    chocs = volatilite * generateur.standard_normal((n_chemins, horizon))
+
+    logit_depart = np.log(depart / (100 - depart))
+    logits = logit_depart + np.cumsum(tendances + chocs, axis=1)
+    return 100 / (1 + np.exp(-logits))
+
+
+def bandes_percentiles(chemins, annees=ANNEES_PROJECTION, percentiles=PERCENTILES):
+    """Résume les trajectoires en bandes de percentiles (une colonne P<n> par percentile)"""
+    valeurs = np.percentile(chemins, percentiles, axis=0)
+    bandes = pd.DataFrame(valeurs.T, columns=[f"P{p}" for p in percentiles])
+    bandes.insert(0, "Annee", annees)
+    return bandes
+
+
+def projeter_scenarios(depart, scenarios=None, annees=ANNEES_PROJECTION,
+                       n_chemins=NOMBRE_CHEMINS, graine=0):
+    """Projette chaque scénario et renvoie ses bandes de percentiles
+
+    Chaque scénario reçoit sa propre graine dérivée de `graine` et de son
+    rang, pour des résultats reproductibles scénario par scénario.
+    """
+    scenarios = SCENARIOS if scenarios is None else scenarios
+    bandes = {}
+    for rang, (nom, parametres) in enumerate(scenarios.items()):
+        chemins = simuler_readiness(depart, horizon=len(annees), n_chemins=n_chemins,
+                                    graine=[graine, rang], **parametres)
+        bandes[nom] = bandes_percentiles(chemins, annees)
+    return bandes
+
+
+# Balayage de grilles de scénarios
+# --------------------------------
+
+# Trajectoires par point de grille : moins que pour les scénarios affichés,
+# les balayages comptant souvent des milliers de combinaisons.
+NOMBRE_CHEMINS_BALAYAGE = 20_000
+
+# Points de grille envoyés ensemble à un processus, pour amortir les échanges
+TAILLE_LOT_BALAYAGE = 8
+
+# Résultats de points gardés en mémoire (LRU), toutes grilles confondues
+CAPACITE_RESULTATS_BALAYAGE = 50_000
+
+_resultats_balayage = OrderedDict()
+_verrou_balayage = threading.Lock()
+_pool = None
+
+
+def grille_scenarios(base, **axes):
+    """Renvoie toutes les combinaisons des valeurs de `axes`, complétées par `base`
+
+    Exemple : grille_scenarios(SCENARIOS["Moderne"], croissance_budget=[5, 15],
+    localisation=[0, 0.5, 1], cooperation=[0, 1]) donne 12 jeux de paramètres.
+    """
+    noms = list(axes)
+    return [dict(base, **dict(zip(noms, valeurs))) for valeurs in itertools.product(*axes.values())]
+
+
+def empreinte_point(parametres, depart, horizon, n_chemins, graine):
+    """Renvoie l'empreinte d'un point de grille, clé du cache des résultats"""
+    contenu = json.dumps([sorted((nom, float(valeur)) for nom, valeur in parametres.items()),
+                          float(depart), int(horizon), int(n_chemins), int(graine)])
+    return hashlib.sha256(contenu.encode("utf-8")).hexdigest()
+
+
+def resumer_point(parametres, depart, horizon, n_chemins, graine):
+    """Simule un point de grille et résume la préparation en fin d'horizon"""
+    chemins = simuler_readiness(depart, horizon=horizon, n_chemins=n_chemins, graine=graine, **parametres)
+    finales = chemins[:, -1]
+    p5, p50, p95 = np.percentile(finales, [5, 50, 95])
+    return dict(parametres, P5=p5, P50=p50, P95=p95, Moyenne=finales.mean())
+
+
+def _executer_lot(lot, depart, horizon, n_chemins, graine):
+    # Exécuté dans un processus du pool : la graine dépend de l'empreinte du
+    # point, pas de l'ordre d'exécution, pour des résultats reproductibles.
+    return [(cle, resumer_point(parametres, depart, horizon, n_chemins, [graine, int(cle[:8], 16)]))
+            for cle, parametres in lot]
+
+
+def _memoriser(future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    with _verrou_balayage:
+        for cle, resultat in future.result():
+            _resultats_balayage[cle] = resultat
+            _resultats_balayage.move_to_end(cle)
+        while len(_resultats_balayage) > CAPACITE_RESULTATS_BALAYAGE:
+            _resultats_balayage.popitem(last=False)
+
+
+def _resultat_memorise(cle):
+    with _verrou_balayage:
+        resultat = _resultats_balayage.get(cle)
+        if resultat is not None:
+            _resultats_balayage.move_to_end(cle)
+        return resultat
+
+
+def pool_processus():
+    """Renvoie le pool de processus partagé (un processus par cœur), créé au besoin"""
+    global _pool
+    with _verrou_balayage:
+        if _pool is None:
+            # spawn : les processus n'héritent pas de l'état du serveur Streamlit
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _ecarter_pool(pool):
+    """Arrête un pool cassé (processus mort) : le prochain pool_processus() en crée un neuf"""
+    global _pool
+    with _verrou_balayage:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def balayer_scenarios(grille, depart, horizon=len(ANNEES_PROJECTION),
+                      n_chemins=NOMBRE_CHEMINS_BALAYAGE, graine=0, taille_lot=TAILLE_LOT_BALAYAGE):
+    """Simule chaque point de `grille` sur tous les cœurs et renvoie les résultats au fil de l'eau
+
+    Générateur : chaque résumé (voir resumer_point) est produit dès que son
+    lot est terminé. Les points déjà simulés avec les mêmes paramètres sont
+    servis depuis le cache sans être recalculés ; les résultats d'un balayage
+    interrompu restent mémorisés. Si un processus meurt (pool cassé), le pool
+    est remplacé et les lots non rendus sont soumis une seconde fois.
+    """
+    a_calculer = []
+    for parametres in grille:
+        cle = empreinte_point(parametres, depart, horizon, n_chemins, graine)
+        resultat = _resultat_memorise(cle)
+        if resultat is not None:
+            yield resultat
+        else:
+            a_calculer.append((cle, parametres))
+
+    lots = [a_calculer[debut:debut + taille_lot] for debut in range(0, len(a_calculer), taille_lot)]
+    for tentative in range(2):
+        if not lots:
+            return
+        pool = pool_processus()
+        futures, rendus = {}, set()
+        try:
+            for indice, lot in enumerate(lots):
+                future = pool.submit(_executer_lot, lot, depart, horizon, n_chemins, graine)
+                future.add_done_callback(_memoriser)
+                futures[future] = indice
+            for future in as_completed(futures):
+                resultats = future.result()
+                rendus.add(futures[future])
+                for _, resultat in resultats:
+                    yield resultat
+            return
+        except BrokenProcessPool:
+            _ecarter_pool(pool)
+            if tentative:
+                raise
+            lots = [lot for indice, lot in enumerate(lots) if indice not in rendus]
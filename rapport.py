@@ -0,0 +1,242 @@
+# rapport.py
+"""Génération sans interface des rapports de synthèse, une déclinaison par audience
+
+Chaque rapport reprend la vue d'ensemble, la comparaison régionale et les
+projections du dashboard, avec les mêmes données et les mêmes figures. Les
+sections sont rendues en parallèle dans des processus séparés ; une section
+identique pour plusieurs audiences n'est rendue qu'une fois.
+
+    python rapport.py --sortie rapports                      # rapport par défaut
+    python rapport.py --audiences audiences.json --formats html png --processus 4
+
+audiences.json : liste d'objets {"nom", "titre", "periode", "indicateurs",
+"pays_focal", "scenarios", "n_chemins", "graine"}, chaque clé absente prenant
+la valeur de AUDIENCE_DEFAUT.
+"""
+import argparse
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from agregats import PAYS_FOCAL_DEFAUT, CubeRegional, annualiser, cartes_vue_ensemble, construire_magasin
+from donnees import DEPOT_DONNEES
+import figures
+import projections
+import tableaux
+
+AUDIENCE_DEFAUT = {
+    "nom": "synthese",
+    "titre": "Synthèse - Armée de Terre Égyptienne",
+    "periode": [2012, 2024],
+    "indicateurs": ["Effectifs_Actifs_K", "Chars_Principaux", "Budget_Defense_MdUSD"],
+    "pays_focal": PAYS_FOCAL_DEFAUT,
+    "scenarios": projections.SCENARIOS,
+    "n_chemins": projections.NOMBRE_CHEMINS,
+    "graine": 0
+}
+
+# Paramètres de l'audience dont dépend chaque section
+SECTIONS = {
+    "vue_ensemble": ("Vue d'ensemble stratégique", ("periode",)),
+    "comparaison_regionale": ("Comparaison régionale", ("indicateurs", "pays_focal")),
+    "projections": ("Projections 2025-2030", ("scenarios", "n_chemins", "graine"))
+}
+
+STYLE = """
+body { font-family: sans-serif; margin: 2rem auto; max-width: 1200px; color: #222; }
+h1 { color: #CE1126; border-bottom: 3px solid #000; padding-bottom: .5rem; }
+h2 { background: linear-gradient(90deg, #CE1126, #000); color: #fff; padding: .5rem 1rem; }
+.cartes { display: flex; gap: 1rem; flex-wrap: wrap; }
+.carte { flex: 1; border-left: 5px solid #CE1126; background: #f8f9fa; padding: .8rem 1rem; }
+.carte .valeur { font-size: 1.6rem; font-weight: bold; }
+.carte .delta { color: #555; }
+table { border-collapse: collapse; margin: 1rem 0; }
+td, th { border: 1px solid #ddd; padding: .3rem .6rem; text-align: right; }
+"""
+
+
+def charger_audiences(chemin=None):
+    """Renvoie la liste des audiences, complétées par AUDIENCE_DEFAUT"""
+    if chemin is None:
+        return [dict(AUDIENCE_DEFAUT)]
+    with open(chemin, encoding="utf-8") as fichier:
+        audiences = json.load(fichier)
+    return [dict(AUDIENCE_DEFAUT, **audience) for audience in audiences]
+
+
+def cle_section(section, audience):
+    """Renvoie l'empreinte d'une section pour une audience : mêmes paramètres, même clé"""
+    parametres = {nom: audience[nom] for nom in SECTIONS[section][1]}
+    contenu = json.dumps([section, parametres], sort_keys=True, ensure_ascii=False)
+    return f"{section}-{hashlib.sha256(contenu.encode('utf-8')).hexdigest()[:12]}"
+
+
+def _carte(titre, valeur, delta):
+    return (f'<div class="carte"><div>{html.escape(titre)}</div><div class="valeur">{valeur}</div>'
+            f'<div class="delta">{delta}</div></div>')
+
+
+def _vue_ensemble(depot, periode):
+    tables = {nom: depot.table(nom) for nom in ("capacites", "reperes", "equipements")}
+    cartes = "".join(_carte(*carte) for carte in cartes_vue_ensemble(construire_magasin(tables), periode))
+    df_releves = depot.table("capacites", annees=periode)
+    if df_releves.empty:
+        return (f'<div class="cartes">{cartes}</div>'
+                f'<p>Aucune donnée de capacités sur {periode[0]}-{periode[1]}.</p>', {})
+    return f'<div class="cartes">{cartes}</div>', {
+        "preparation_deploiement": figures.preparation_deploiement(df_releves),
+        "entrainement_exercices": figures.entrainement_exercices(annualiser(df_releves))
+    }
+
+
+def _comparaison_regionale(depot, indicateurs, pays_focal):
+    cube = depot.derive("cube_regional", ("regionales",), lambda: CubeRegional(depot.table("regionales")))
+    df_comparison = cube.tableau(indicateurs)
+    tableau = (tableaux.graisser(tableaux.surligner_extremes(df_comparison.style, df_comparison, indicateurs,
+                                                              '#d4edda', '#f8d7da'), 'Pays', pays_focal)
+               .hide(axis="index")
+               .to_html())
+    return tableau, {
+        "radar_regional": figures.radar_regional(cube.normalise(indicateurs), indicateurs)
+    }
+
+
+def _projections(depot, scenarios, n_chemins, graine):
+    df_capacites = annualiser(depot.table("capacites"))
+    readiness = construire_magasin({"capacites": df_capacites}).fenetre("Readiness_Operative")
+    if readiness is None:
+        return "<p>Aucune donnée de préparation opérationnelle : projections non calculées.</p>", {}
+    bandes = projections.projeter_scenarios(readiness["dernier"], scenarios, n_chemins=n_chemins, graine=graine)
+    lignes = "".join(
+        f"<tr><th>{html.escape(scenario)}</th><td>{df.iloc[-1]['P50']:.1f}%</td>"
+        f"<td>{df.iloc[-1]['P5']:.1f} - {df.iloc[-1]['P95']:.1f}%</td></tr>"
+        for scenario, df in bandes.items()
+    )
+    annee = projections.ANNEES_PROJECTION[-1]
+    tableau = (f"<table><tr><th>Scénario</th><th>Préparation {annee} (médiane)</th><th>P5 - P95</th></tr>"
+               f"{lignes}</table>")
+    return tableau, {
+        "projections_readiness": figures.projections_readiness(df_capacites, bandes)
+    }
+
+
+CONSTRUCTEURS = {
+    "vue_ensemble": _vue_ensemble,
+    "comparaison_regionale": _comparaison_regionale,
+    "projections": _projections
+}
+
+
+def rendre_section(section, audience, repertoire_png=None):
+    """Construit une section et renvoie son fragment HTML (exécuté dans un processus du pool)
+
+    Les figures sont intégrées en HTML (plotly.js chargé une fois par
+    rapport) et, si `repertoire_png` est donné, exportées en PNG (kaleido).
+    """
+    parametres = {nom: audience[nom] for nom in SECTIONS[section][1]}
+    entete, figures_section = CONSTRUCTEURS[section](DEPOT_DONNEES, **parametres)
+    cle = cle_section(section, audience)
+    morceaux = [entete]
+    for nom, fig in figures_section.items():
+        morceaux.append(fig.to_html(full_html=False, include_plotlyjs=False, div_id=f"{cle}-{nom}"))
+        if repertoire_png is not None:
+            fig.write_image(os.path.join(repertoire_png, f"{cle}-{nom}.png"), width=1200, height=fig.layout.height or 500)
+    return cle, "\n".join(morceaux)
+
+
+def assembler_rapport(audience, fragments):
+    """Assemble le rapport HTML d'une audience à partir des fragments de ses sections"""
+    corps = "\n".join(
+        f"<h2>{html.escape(titre)}</h2>\n{fragments[cle_section(section, audience)]}"
+        for section, (titre, _) in SECTIONS.items()
+    )
+    return f"""<!DOCTYPE html>
+<html lang="fr"><head><meta charset="utf-8"><title>{html.escape(audience['titre'])}</title>
+<script src="plotly.min.js"></script><style>{STYLE}</style></head>
+<body><h1>{html.escape(audience['titre'])}</h1>
+<p>Audience : {html.escape(audience['nom'])} - généré le {time.strftime('%Y-%m-%d %H:%M')}</p>
+{corps}
+</body></html>
+"""
+
+
+def generer_rapports(audiences, sortie, formats=("html",), processus=None):
+    """Génère le lot de rapports des `audiences` dans `sortie` et l'archive en zip
+
+    Renvoie le manifeste du lot (fichiers, durée, débit en rapports par minute).
+    """
+    from plotly.offline import get_plotlyjs
+
+    debut = time.perf_counter()
+    os.makedirs(sortie, exist_ok=True)
+    repertoire_png = None
+    if "png" in formats:
+        import importlib.util
+        if importlib.util.find_spec("kaleido") is None:
+            raise RuntimeError("L'export PNG nécessite le paquet kaleido (pip install kaleido)")
+        repertoire_png = os.path.join(sortie, "png")
+        os.makedirs(repertoire_png, exist_ok=True)
+    with open(os.path.join(sortie, "plotly.min.js"), "w", encoding="utf-8") as fichier:
+        fichier.write(get_plotlyjs())
+
+    # Une tâche par section distincte, toutes audiences confondues
+    taches = {}
+    for audience in audiences:
+        for section in SECTIONS:
+            taches.setdefault(cle_section(section, audience), (section, audience))
+
+    fragments = {}
+    # spawn : comme pour les balayages de scénarios, pas d'état hérité du parent
+    with ProcessPoolExecutor(max_workers=processus or os.cpu_count(),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(rendre_section, section, audience, repertoire_png)
+                   for section, audience in taches.values()]
+        for future in as_completed(futures):
+            cle, fragment = future.result()
+            fragments[cle] = fragment
+
+    fichiers = []
+    for audience in audiences:
+        nom_fichier = f"{audience['nom']}.html"
+        with open(os.path.join(sortie, nom_fichier), "w", encoding="utf-8") as fichier:
+            fichier.write(assembler_rapport(audience, fragments))
+        fichiers.append(nom_fichier)
+
+    duree = time.perf_counter() - debut
+    manifeste = {
+        "horodatage": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "rapports": fichiers,
+        "sections_rendues": len(taches),
+        "formats": list(formats),
+        "duree_s": round(duree, 3),
+        "rapports_par_minute": round(len(audiences) / duree * 60, 1)
+    }
+    with open(os.path.join(sortie, "manifeste.json"), "w", encoding="utf-8") as fichier:
+        json.dump(manifeste, fichier, ensure_ascii=False, indent=2)
+    manifeste["archive"] = shutil.make_archive(sortie.rstrip(os.sep), "zip", sortie)
+    return manifeste
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audiences", help="fichier JSON des audiences (défaut : une synthèse)")
+    parser.add_argument("--sortie", default="rapports", help="répertoire du lot (défaut : rapports)")
+    parser.add_argument("--formats", nargs="+", choices=["html", "png"], default=["html"],
+                        help="html et/ou png (png : nécessite kaleido)")
+    parser.add_argument("--processus", type=int, help="processus de rendu (défaut : un par cœur)")
+    args = parser.parse_args()
+
+    audiences = charger_audiences(args.audiences)
+    manifeste = generer_rapports(audiences, args.sortie, args.formats, args.processus)
+    print(f"{len(manifeste['rapports'])} rapports ({manifeste['sections_rendues']} sections rendues) "
+          f"en {manifeste['duree_s']:.1f} s : {manifeste['rapports_par_minute']:.1f} rapports/minute")
+    print(f"Lot : {manifeste['archive']}")
+
+
+if __name__ == "__main__":
+    main()
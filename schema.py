@@ -0,0 +1,172 @@
+# schema.py
+"""Schéma typé des tables de référence : chaînes catégorielles, entiers étroits
+
+Les libellés répétés (pays, commandements, types d'équipement, statuts) sont
+encodés en dictionnaire (dtype `category`) et les comptages stockés dans le
+plus petit type entier adapté. Rapport mémoire avant/après :
+
+    python schema.py                 # fixtures
+    python schema.py --echelle 10000 # fixtures répétées 10 000 fois
+"""
+import argparse
+import fnmatch
+
+import numpy as np
+import pandas as pd
+
+# Type de chaque colonne, par table ; `*` couvre les colonnes annuelles.
+# Les entiers laissent de la marge aux inventaires par unité des jeux de production.
+SCHEMAS = {
+    "structure": {
+        "Commandements": "category",
+        "Divisions_*": "int8",
+        "Forces_Speciales": "int8"
+    },
+    "equipements": {
+        "Type": "category",
+        "Unite": "int32",
+        "Quantite_*": "int32",
+        "Taux_Modernite": "int8"
+    },
+    "capacites": {
+        "Unite": "int32",
+        "Mois": "int8"
+    },
+    "programmes": {
+        "Statut": "category",
+        "Budget_MdUSD": "int32",
+        "Debut": "int16",
+        "Fin": "int16"
+    },
+    "unites": {
+        "Commandement": "category",
+        "Division": "category",
+        "Type_Division": "category",
+        "Brigade": "category",
+        "Bataillon": "category",
+        "Chars_Principaux": "int16",
+        "Vehicules_Blindes": "int16",
+        "Artillerie_*": "int16",
+        "Lance_Roquettes": "int16",
+        "Systemes_ATGM": "int16",
+        "Effectifs": "int32"
+    },
+    "regionales": {
+        "Pays": "category",
+        "Effectifs_Actifs_K": "int16",
+        "Reservistes_K": "int16",
+        "Chars_Principaux": "int32",
+        "Veh_Blindes": "int32",
+        "Artillerie": "int32",
+        "Budget_Defense_MdUSD": "int32"
+    }
+}
+
+
+def type_colonne(table, colonne):
+    """Renvoie le type déclaré de `colonne` dans `table`, ou None"""
+    for motif, dtype in SCHEMAS.get(table, {}).items():
+        if fnmatch.fnmatchcase(colonne, motif):
+            return dtype
+    return None
+
+
+def colonnes_categorielles(table, colonnes):
+    """Renvoie celles des `colonnes` déclarées catégorielles dans `table`"""
+    return [colonne for colonne in colonnes if type_colonne(table, colonne) == "category"]
+
+
+def _entier(serie, dtype):
+    """Convertit une série entière en `dtype`, ou au plus petit type qui contient ses valeurs"""
+    # Valeurs manquantes ou non entières : colonne conservée telle quelle
+    if not pd.api.types.is_numeric_dtype(serie.dtype) or serie.isna().any() or (serie % 1 != 0).any():
+        return serie
+    limites = np.iinfo(dtype)
+    if len(serie) and (serie.min() < limites.min or serie.max() > limites.max):
+        # Jamais de conversion tronquante : astype ferait déborder les valeurs en silence
+        return pd.to_numeric(serie.astype("int64"), downcast="integer")
+    return serie.astype(dtype)
+
+
+def typer(table, df):
+    """Renvoie `df` converti selon le schéma de `table` (colonnes non déclarées inchangées)"""
+    conversions = {}
+    for colonne in df.columns:
+        dtype = type_colonne(table, colonne)
+        if dtype is None or df[colonne].dtype == dtype:
+            continue
+        conversions[colonne] = (df[colonne].astype("category") if dtype == "category"
+                                else _entier(df[colonne], dtype))
+    return df.assign(**conversions) if conversions else df
+
+
+def encoder_dictionnaires(table, table_arrow):
+    """Encode en dictionnaire les colonnes catégorielles d'une table Arrow
+
+    Appelé avant `to_pandas` : les chaînes sont converties directement en
+    catégories, sans créer un objet Python par ligne.
+    """
+    import pyarrow as pa
+
+    for colonne in colonnes_categorielles(table, table_arrow.column_names):
+        indice = table_arrow.column_names.index(colonne)
+        valeurs = table_arrow.column(indice)
+        if not pa.types.is_dictionary(valeurs.type):
+            table_arrow = table_arrow.set_column(indice, colonne, valeurs.dictionary_encode())
+    return table_arrow
+
+
+def representation_naive(df):
+    """Renvoie `df` avec chaînes en objets Python et entiers en int64 (référence du rapport)"""
+    conversions = {}
+    for colonne in df.columns:
+        if isinstance(df[colonne].dtype, pd.CategoricalDtype):
+            conversions[colonne] = df[colonne].astype(object)
+        elif pd.api.types.is_integer_dtype(df[colonne].dtype):
+            conversions[colonne] = df[colonne].astype("int64")
+    return df.assign(**conversions) if conversions else df
+
+
+def rapport_memoire(tables):
+    """Compare la mémoire occupée par chaque table, naïve puis typée
+
+    `tables` associe un nom de table à son DataFrame. Renvoie un DataFrame
+    (Table, Lignes, Octets_Avant, Octets_Apres, Gain_Pct), mémoire profonde
+    (chaînes comprises).
+    """
+    lignes = []
+    for table, df in tables.items():
+        avant = representation_naive(df).memory_usage(deep=True, index=False).sum()
+        apres = typer(table, df).memory_usage(deep=True, index=False).sum()
+        lignes.append({
+            "Table": table,
+            "Lignes": len(df),
+            "Octets_Avant": int(avant),
+            "Octets_Apres": int(apres),
+            "Gain_Pct": round((1 - apres / avant) * 100, 1) if avant else 0.0
+        })
+    return pd.DataFrame(lignes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--echelle", type=int, default=1,
+                        help="répète chaque table ce nombre de fois (simulation d'un jeu de production)")
+    args = parser.parse_args()
+
+    from stockage import source_par_defaut
+
+    source = source_par_defaut()
+    tables = {}
+    for table in SCHEMAS:
+        df = source.lire(table)
+        tables[table] = pd.concat([df] * args.echelle, ignore_index=True) if args.echelle > 1 else df
+    rapport = rapport_memoire(tables)
+    print(rapport.to_string(index=False))
+    total_avant, total_apres = rapport["Octets_Avant"].sum(), rapport["Octets_Apres"].sum()
+    print(f"\nTotal : {total_avant:,} -> {total_apres:,} octets "
+          f"({(1 - total_apres / total_avant) * 100:.1f} % de gain)")
+
+
+if __name__ == "__main__":
+    main()
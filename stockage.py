@@ -0,0 +1,495 @@
+# stockage.py
+"""Sources des jeux de données : fixtures embarquées ou fichiers Arrow/Parquet"""
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from schema import encoder_dictionnaires, typer
+
+# Version des jeux de données embarqués : toute modification des fixtures
+# doit l'incrémenter pour invalider les entrées déjà en cache.
+VERSION_FIXTURES = "fixtures-2024.3"
+
+# Répertoire des fichiers de données (une table par fichier <table>.parquet/.arrow,
+# ou par répertoire <table>/ de partitions <cle>=<valeur>.parquet)
+VARIABLE_REPERTOIRE = "ARMEE_DONNEES_DIR"
+
+EXTENSIONS = (".parquet", ".arrow", ".feather")
+
+# Colonne temporelle des tables chronologiques, triées dessus à l'écriture
+COLONNE_ANNEE = "Annee"
+
+# Colonnes de détail des tables à grain fin (une ligne par unité, par mois) :
+# les séries annuelles les agrègent (voir agregats.annualiser)
+COLONNES_DETAIL = ("Unite", "Mois")
+
+# Nombre de lignes par row group Parquet : les statistiques min/max de chaque
+# groupe permettent de sauter ceux qui sont hors de la fenêtre demandée.
+TAILLE_ROW_GROUP = 65536
+
+
+def charger_donnees_detaillees():
+    """Charge des données détaillées sur l'armée égyptienne"""
+    # Structure organisationnelle
+    structure = {
+        "Commandements": ["Commandement Nord", "Commandement Centre", "Commandement Sud",
+                        "Commandement Ouest", "Commandement Est", "Commandement du Sinaï"],
+        "Divisions_Blindees": [3, 2, 1, 1, 2, 1],
+        "Divisions_Mecanisees": [2, 2, 1, 1, 1, 1],
+        "Divisions_Infanterie": [4, 3, 2, 2, 3, 2],
+        "Forces_Speciales": [2, 1, 1, 1, 1, 1]
+    }
+
+    # Équipements par type
+    equipements = {
+        "Type": ["Chars Principaux", "Véhicules Blindés", "Artillerie Tractée",
+                "Artillerie Automotrice", "Lance-roquettes", "Systèmes ATGM"],
+        "Quantite_2024": [3760, 12000, 1200, 850, 600, 3000],
+        "Quantite_2012": [3400, 9500, 1100, 650, 450, 2000],
+        "Taux_Modernite": [35, 40, 25, 45, 30, 60]
+    }
+
+    # Capacités opérationnelles
+    capacites = pd.DataFrame({
+        "Annee": list(range(2012, 2025)),
+        "Readiness_Operative": [70, 72, 74, 76, 78, 80, 82, 84, 85, 86, 87, 88, 89],
+        "Temps_Deploiement_Jours": [72, 70, 68, 65, 62, 58, 55, 52, 50, 48, 47, 46, 45],
+        "Exercices_Combines": [15, 16, 18, 20, 22, 25, 28, 30, 32, 34, 36, 38, 40],
+        "Entrainement_Heures_An": [800, 820, 850, 880, 900, 920, 940, 960, 980, 1000, 1020, 1040, 1060]
+    })
+
+    return {
+        "structure": pd.DataFrame(structure),
+        "equipements": pd.DataFrame(equipements),
+        "capacites": capacites
+    }
+
+
+def charger_donnees_regionales():
+    """Charge des données comparatives régionales"""
+    pays = ["Égypte", "Israël", "Turquie", "Arabie Saoudite", "Iran", "Algérie"]
+
+    donnees = {
+        "Pays": pays,
+        "Effectifs_Actifs_K": [462, 169, 355, 227, 610, 130],
+        "Reservistes_K": [491, 465, 380, 25, 350, 150],
+        "Chars_Principaux": [3760, 1500, 3200, 1065, 2300, 1300],
+        "Veh_Blindes": [12000, 10000, 11000, 8500, 15000, 6000],
+        "Artillerie": [2050, 750, 3000, 1250, 3500, 1000],
+        "Budget_Defense_MdUSD": [8800, 24000, 15000, 57000, 10000, 9500],
+        "Depense_Par_Soldat_KUSD": [19.0, 142.0, 42.3, 251.1, 16.4, 73.1]
+    }
+
+    return pd.DataFrame(donnees)
+
+
+def charger_donnees_modernisation():
+    """Charge des données sur la modernisation"""
+    programmes = [
+        {"Programme": "Modernisation T-55/T-62", "Budget_MdUSD": 800, "Debut": 2015, "Fin": 2025, "Statut": "En cours"},
+        {"Programme": "Acquisition T-90MS", "Budget_MdUSD": 1200, "Debut": 2020, "Fin": 2027, "Statut": "En cours"},
+        {"Programme": "Véhicules 8x8 EIFV", "Budget_MdUSD": 500, "Debut": 2018, "Fin": 2024, "Statut": "Terminé"},
+        {"Programme": "Systèmes ATGM modernes", "Budget_MdUSD": 300, "Debut": 2016, "Fin": 2022, "Statut": "Terminé"},
+        {"Programme": "Artillerie automotrice", "Budget_MdUSD": 400, "Debut": 2019, "Fin": 2026, "Statut": "En cours"},
+        {"Programme": "Systèmes C4ISR", "Budget_MdUSD": 600, "Debut": 2017, "Fin": 2025, "Statut": "En cours"}
+    ]
+
+    return pd.DataFrame(programmes)
+
+
+def charger_reperes_nationaux():
+    """Charge les repères nationaux (effectifs, budget) des années de référence"""
+    return pd.DataFrame({
+        "Annee": [2012, 2024],
+        "Effectifs_Actifs_K": [438, 462],
+        "Budget_Defense_MdUSD": [4200, 8800]
+    })
+
+
+# Divisions de la table `structure` : colonne -> (type, désignation, désignation féminine)
+TYPES_DIVISION = {
+    "Divisions_Blindees": ("Blindée", "Division blindée", True),
+    "Divisions_Mecanisees": ("Mécanisée", "Division mécanisée", True),
+    "Divisions_Infanterie": ("Infanterie", "Division d'infanterie", True),
+    "Forces_Speciales": ("Forces spéciales", "Groupe de forces spéciales", False)
+}
+
+# Brigades par division et bataillons par brigade de l'ordre de bataille
+BRIGADES_PAR_DIVISION = 3
+BATAILLONS_PAR_BRIGADE = 3
+
+# Dotation type d'un bataillon selon le type de sa division
+DOTATIONS_BATAILLON = {
+    "Blindée": {"Chars_Principaux": 31, "Vehicules_Blindes": 40, "Artillerie_Tractee": 0,
+                "Artillerie_Automotrice": 6, "Lance_Roquettes": 2, "Systemes_ATGM": 8, "Effectifs": 600},
+    "Mécanisée": {"Chars_Principaux": 12, "Vehicules_Blindes": 55, "Artillerie_Tractee": 2,
+                  "Artillerie_Automotrice": 4, "Lance_Roquettes": 2, "Systemes_ATGM": 14, "Effectifs": 700},
+    "Infanterie": {"Chars_Principaux": 4, "Vehicules_Blindes": 30, "Artillerie_Tractee": 8,
+                   "Artillerie_Automotrice": 1, "Lance_Roquettes": 2, "Systemes_ATGM": 18, "Effectifs": 800},
+    "Forces spéciales": {"Chars_Principaux": 0, "Vehicules_Blindes": 12, "Artillerie_Tractee": 0,
+                         "Artillerie_Automotrice": 0, "Lance_Roquettes": 0, "Systemes_ATGM": 10, "Effectifs": 400}
+}
+
+
+def _ordinaux(numeros, feminin):
+    premier = "1re" if feminin else "1er"
+    return np.where(numeros == 1, premier, np.char.add(numeros.astype(str), "e"))
+
+
+def ordre_bataille(df_structure, premiers_numeros=None):
+    """Déploie la table `structure` en ordre de bataille : une ligne par bataillon
+
+    Chaque division (ou groupe de forces spéciales) compte
+    BRIGADES_PAR_DIVISION brigades de BATAILLONS_PAR_BRIGADE bataillons,
+    dotés selon le type de la division (±10 %, variation déterministe).
+    Les lignes sont dans l'ordre de l'arbre (commandement, division,
+    brigade, bataillon). Les divisions sont numérotées par type à partir de
+    `premiers_numeros` ({type: numéro}, 1 par défaut), mis à jour pour
+    enchaîner plusieurs appels.
+    """
+    premiers_numeros = premiers_numeros if premiers_numeros is not None else {}
+    commandements = df_structure["Commandements"].astype(str).to_numpy()
+    colonnes = [colonne for colonne in TYPES_DIVISION if colonne in df_structure.columns]
+    comptes = df_structure[colonnes].to_numpy(dtype=int).clip(0)
+
+    # Divisions dans l'ordre (commandement, type) : indices du commandement et du type
+    types_divisions = np.tile(np.arange(len(colonnes)), len(commandements))
+    nombres = comptes.ravel()
+    commandement_division = np.repeat(np.repeat(np.arange(len(commandements)), len(colonnes)), nombres)
+    type_division = np.repeat(types_divisions, nombres)
+
+    noms = np.empty(len(type_division), dtype=object)
+    for t, colonne in enumerate(colonnes):
+        type_, designation, feminin = TYPES_DIVISION[colonne]
+        selection = type_division == t
+        numeros = premiers_numeros.get(type_, 1) + np.arange(selection.sum())
+        premiers_numeros[type_] = premiers_numeros.get(type_, 1) + int(selection.sum())
+        noms[selection] = np.char.add(_ordinaux(numeros, feminin), " " + designation)
+
+    par_division = BRIGADES_PAR_DIVISION * BATAILLONS_PAR_BRIGADE
+    division = np.repeat(np.arange(len(type_division)), par_division)
+    rang = np.tile(np.arange(par_division), len(type_division))
+    types = np.array([TYPES_DIVISION[colonne][0] for colonne in colonnes])[type_division[division]] \
+        if len(colonnes) else np.array([], dtype=str)
+    df = pd.DataFrame({
+        "Commandement": commandements[commandement_division[division]],
+        "Division": noms[division].astype(str),
+        "Type_Division": types,
+        "Brigade": np.char.add(_ordinaux(rang // BATAILLONS_PAR_BRIGADE + 1, True), " Brigade"),
+        "Bataillon": np.char.add(_ordinaux(rang % BATAILLONS_PAR_BRIGADE + 1, False), " Bataillon")
+    })
+    # Variation déterministe de ±10 % (hachage multiplicatif du rang de la ligne)
+    variation = 0.9 + 0.2 * ((np.arange(len(df), dtype=np.int64) * 2654435761) % 2**32) / 2**32
+    for mesure in DOTATIONS_BATAILLON["Blindée"]:
+        dotations = np.array([DOTATIONS_BATAILLON[type_][mesure] for type_ in types]) if len(types) else 0
+        df[mesure] = np.rint(dotations * variation).astype("int64")
+    return df
+
+
+def charger_ordre_bataille():
+    """Charge l'ordre de bataille (commandement, division, brigade, bataillon) et ses dotations"""
+    return ordre_bataille(charger_donnees_detaillees()["structure"])
+
+
+# Tables exposées par les sources et fixture correspondante
+FIXTURES = {
+    "structure": lambda: charger_donnees_detaillees()["structure"],
+    "equipements": lambda: charger_donnees_detaillees()["equipements"],
+    "capacites": lambda: charger_donnees_detaillees()["capacites"],
+    "regionales": charger_donnees_regionales,
+    "programmes": charger_donnees_modernisation,
+    "reperes": charger_reperes_nationaux,
+    "unites": charger_ordre_bataille
+}
+
+
+def _projeter(df, colonnes):
+    return df if colonnes is None else df[list(colonnes)]
+
+
+def _bornes_annees(valeurs_annees, annees):
+    """Renvoie l'intervalle [debut, fin) des lignes d'une colonne d'années triée"""
+    debut = np.searchsorted(valeurs_annees, annees[0], side="left")
+    fin = np.searchsorted(valeurs_annees, annees[1], side="right")
+    return int(debut), int(fin)
+
+
+def _est_triee(valeurs):
+    return bool((valeurs[1:] >= valeurs[:-1]).all())
+
+
+def _fenetre(df, annees):
+    """Restreint un DataFrame à la période `annees` (incluse)"""
+    if annees is None:
+        return df
+    valeurs = df[COLONNE_ANNEE].to_numpy()
+    if not _est_triee(valeurs):
+        return df[(valeurs >= annees[0]) & (valeurs <= annees[1])]
+    debut, fin = _bornes_annees(valeurs, annees)
+    return df.iloc[debut:fin]
+
+
+def cles_partition(relatif):
+    """Renvoie les clés d'une partition lues dans son chemin : `Annee=2024/Pays=Égypte.parquet`
+
+    Les années sont converties en entiers, les autres valeurs restent des libellés.
+    """
+    cles = {}
+    for morceau in relatif.replace(os.sep, "/").split("/"):
+        for extension in EXTENSIONS:
+            if morceau.endswith(extension):
+                morceau = morceau[:-len(extension)]
+        cle, egal, valeur = morceau.partition("=")
+        if egal:
+            cles[cle] = int(valeur) if cle == COLONNE_ANNEE else valeur
+    return cles
+
+
+def _dans_periode(cles, annees):
+    return annees is None or COLONNE_ANNEE not in cles or annees[0] <= cles[COLONNE_ANNEE] <= annees[1]
+
+
+class SourceFixtures:
+    """Source de repli servant les petites tables embarquées dans le code"""
+
+    def version(self, table, annees=None):
+        """Renvoie la version de la table"""
+        return VERSION_FIXTURES
+
+    def partitions(self, table, annees=None):
+        """Les fixtures ne sont pas partitionnées"""
+        return None
+
+    def lire(self, table, colonnes=None, annees=None):
+        """Lit une table en ne conservant que les colonnes et années demandées"""
+        return typer(table, _projeter(_fenetre(FIXTURES[table](), annees), colonnes))
+
+
+def _colonnes_fichier(chemin):
+    """Renvoie les colonnes d'un fichier Parquet ou Arrow IPC, sans lire les données"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if chemin.endswith(".parquet"):
+        return set(pq.read_schema(chemin).names)
+    with pa.memory_map(chemin) as fichier:
+        return set(pa.ipc.open_file(fichier).schema.names)
+
+
+class SourceArrow:
+    """Source lisant des fichiers Parquet ou Arrow IPC par projection mémoire
+
+    Chaque table est un fichier `<table>.parquet`, `<table>.arrow` ou
+    `<table>.feather` du répertoire. Les fichiers sont ouverts en mémoire
+    mappée et seules les colonnes demandées sont décodées. Un filtre de
+    période est poussé jusqu'au stockage : statistiques des row groups pour
+    Parquet, recherche dichotomique sur la colonne d'années triée pour Arrow.
+    Une table peut aussi être un répertoire `<table>/` de partitions
+    (`Annee=2024.parquet`, `Pays=Égypte/Annee=2024.arrow`...) : chacune a
+    sa propre empreinte, et seules les partitions de la période demandée
+    sont lues. Une table absente du répertoire est servie par les fixtures.
+    Les tables lues sont typées selon le schéma (voir schema.py).
+    """
+
+    def __init__(self, repertoire, repli=None):
+        self.repertoire = repertoire
+        self.repli = repli if repli is not None else SourceFixtures()
+
+    def chemin(self, table):
+        """Renvoie le fichier de la table, ou None s'il n'existe pas"""
+        for extension in EXTENSIONS:
+            chemin = os.path.join(self.repertoire, table + extension)
+            if os.path.exists(chemin):
+                return chemin
+        return None
+
+    def partitions(self, table, annees=None):
+        """Renvoie les partitions de la table si elle est un répertoire, sinon None
+
+        Dictionnaire trié {chemin relatif: (empreinte, clés)} ; l'empreinte
+        (taille et date) change à chaque réécriture du fichier. Avec
+        `annees`, seules les partitions pouvant contenir ces années.
+        """
+        dossier = os.path.join(self.repertoire, table)
+        if not os.path.isdir(dossier):
+            return None
+        partitions = {}
+        for racine, _, fichiers in os.walk(dossier):
+            for fichier in fichiers:
+                if not fichier.endswith(EXTENSIONS):
+                    continue
+                chemin = os.path.join(racine, fichier)
+                relatif = os.path.relpath(chemin, dossier).replace(os.sep, "/")
+                cles = cles_partition(relatif)
+                if _dans_periode(cles, annees):
+                    etat = os.stat(chemin)
+                    partitions[relatif] = (f"{etat.st_size}-{etat.st_mtime_ns}", cles)
+        return dict(sorted(partitions.items()))
+
+    def version(self, table, annees=None):
+        """Renvoie une empreinte du fichier de la table (taille et date)
+
+        Pour une table partitionnée, empreinte des seules partitions de la
+        période `annees` : une partition réécrite hors de la période ne
+        change pas la version.
+        """
+        partitions = self.partitions(table, annees)
+        if partitions is not None:
+            empreintes = "|".join(f"{relatif}:{empreinte}" for relatif, (empreinte, _) in partitions.items())
+            return "partitions-" + hashlib.sha1(empreintes.encode("utf-8")).hexdigest()[:16]
+        chemin = self.chemin(table)
+        if chemin is None:
+            return self.repli.version(table)
+        etat = os.stat(chemin)
+        return f"{os.path.basename(chemin)}-{etat.st_size}-{etat.st_mtime_ns}"
+
+    def lire(self, table, colonnes=None, annees=None):
+        """Lit une table en ne décodant que les colonnes et années demandées"""
+        partitions = self.partitions(table, annees)
+        if partitions is not None:
+            return self.assembler(table, [self.lire_partition(table, relatif, colonnes, annees)
+                                          for relatif in partitions], colonnes)
+        chemin = self.chemin(table)
+        if chemin is None:
+            return self.repli.lire(table, colonnes, annees)
+        table_arrow = encoder_dictionnaires(table, self.lire_arrow(chemin, colonnes, annees))
+        return typer(table, table_arrow.to_pandas())
+
+    def lire_partition(self, table, relatif, colonnes=None, annees=None):
+        """Renvoie la table Arrow d'une partition, complétée des colonnes de clé absentes du fichier"""
+        import pyarrow as pa
+
+        cles = cles_partition(relatif)
+        chemin = os.path.join(self.repertoire, table, relatif)
+        # Partition d'une seule année, déjà sélectionnée : pas de filtre à appliquer
+        filtre = None if COLONNE_ANNEE in cles else annees
+        presentes = _colonnes_fichier(chemin)
+        lues = None if colonnes is None else [c for c in colonnes if c in presentes]
+        if filtre is not None and lues is not None and COLONNE_ANNEE not in lues:
+            table_arrow = self.lire_arrow(chemin, [*lues, COLONNE_ANNEE], filtre).drop_columns(COLONNE_ANNEE)
+        else:
+            table_arrow = self.lire_arrow(chemin, lues, filtre)
+        for position, (cle, valeur) in enumerate(cles.items()):
+            if cle not in presentes and (colonnes is None or cle in colonnes):
+                table_arrow = table_arrow.add_column(position, cle, pa.array([valeur] * len(table_arrow)))
+        return table_arrow if colonnes is None else table_arrow.select(list(colonnes))
+
+    def assembler(self, table, morceaux, colonnes=None):
+        """Assemble des partitions lues (tables Arrow) en une table typée
+
+        Les partitions sont concaténées sans copie ; leurs dictionnaires de
+        libellés sont unifiés à la conversion en catégories.
+        """
+        import pyarrow as pa
+
+        if not morceaux:
+            # Aucune partition dans la période : table vide au schéma des fixtures
+            return self.repli.lire(table, colonnes).iloc[:0]
+        table_arrow = pa.concat_tables(morceaux, promote_options="permissive")
+        return typer(table, encoder_dictionnaires(table, table_arrow).to_pandas())
+
+    def lire_arrow(self, chemin, colonnes=None, annees=None):
+        """Renvoie la table Arrow du fichier, projetée sur `colonnes` et `annees`"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        colonnes = list(colonnes) if colonnes is not None else None
+        if chemin.endswith(".parquet"):
+            filtres = None
+            if annees is not None:
+                filtres = [(COLONNE_ANNEE, ">=", annees[0]), (COLONNE_ANNEE, "<=", annees[1])]
+            return pq.read_table(chemin, columns=colonnes, filters=filtres, memory_map=True)
+
+        # Arrow IPC : lecture sans copie depuis la projection mémoire
+        with pa.memory_map(chemin) as fichier:
+            table = pa.ipc.open_file(fichier).read_all()
+        if annees is not None:
+            valeurs = table.column(COLONNE_ANNEE).to_numpy()
+            if _est_triee(valeurs):
+                # Colonne triée : seules les lignes de la fenêtre sont matérialisées
+                debut, fin = _bornes_annees(valeurs, annees)
+                table = table.slice(debut, fin - debut)
+            else:
+                table = table.filter(pa.array((valeurs >= annees[0]) & (valeurs <= annees[1])))
+        return table if colonnes is None else table.select(colonnes)
+
+
+def ecrire_table(df, chemin):
+    """Écrit un DataFrame au format Parquet ou Arrow IPC selon l'extension"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Le tri par année rend les statistiques des row groups sélectives
+    if COLONNE_ANNEE in df.columns:
+        df = df.sort_values(COLONNE_ANNEE, kind="stable")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if chemin.endswith(".parquet"):
+        pq.write_table(table, chemin, row_group_size=TAILLE_ROW_GROUP)
+    else:
+        with pa.OSFile(chemin, "wb") as fichier, pa.ipc.new_file(fichier, table.schema) as writer:
+            writer.write_table(table)
+
+
+def ecrire_lots(lots, chemin):
+    """Écrit une suite de DataFrames de même schéma en Parquet ou Arrow IPC, lot par lot
+
+    Seul le lot courant est en mémoire : les tables plus grandes que la RAM
+    s'écrivent au fil de l'eau. Les lots doivent arriver triés par année
+    pour que les row groups restent sélectifs. Le fichier est écrit sous un
+    nom temporaire puis renommé : une source ne voit jamais un fichier
+    partiel. Renvoie le nombre de lignes écrites.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    temporaire = chemin + ".partiel"
+    parquet = chemin.endswith(".parquet")
+    ecrivain = flux = schema = None
+    lignes = 0
+    try:
+        try:
+            for lot in lots:
+                table = pa.Table.from_pandas(lot, preserve_index=False)
+                if ecrivain is None:
+                    schema = table.schema
+                    if parquet:
+                        ecrivain = pq.ParquetWriter(temporaire, schema)
+                    else:
+                        flux = pa.OSFile(temporaire, "wb")
+                        ecrivain = pa.ipc.new_file(flux, schema)
+                table = table.cast(schema)
+                if parquet:
+                    ecrivain.write_table(table, row_group_size=TAILLE_ROW_GROUP)
+                else:
+                    ecrivain.write_table(table)
+                lignes += len(table)
+        finally:
+            if ecrivain is not None:
+                ecrivain.close()
+            if flux is not None:
+                flux.close()
+    except BaseException:
+        if os.path.exists(temporaire):
+            os.unlink(temporaire)
+        raise
+    if ecrivain is None:
+        return 0
+    os.replace(temporaire, chemin)
+    return lignes
+
+
+def exporter_fixtures(repertoire, extension=".parquet"):
+    """Écrit les fixtures dans `repertoire` pour amorcer une source sur disque"""
+    os.makedirs(repertoire, exist_ok=True)
+    for table, chargeur in FIXTURES.items():
+        ecrire_table(chargeur(), os.path.join(repertoire, table + extension))
+
+
+def source_par_defaut():
+    """Renvoie la source configurée par ARMEE_DONNEES_DIR, ou les fixtures"""
+    repertoire = os.environ.get(VARIABLE_REPERTOIRE)
+    if repertoire:
+        return SourceArrow(repertoire)
+    return SourceFixtures()
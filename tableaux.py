@@ -0,0 +1,80 @@
+# tableaux.py
+"""Vues paginées des tables : filtre, tri et mise en forme côté serveur"""
+import numpy as np
+import pandas as pd
+
+# Tailles de page proposées ; seules ces lignes sont mises en forme et envoyées au navigateur
+TAILLES_PAGE = (25, 50, 100, 250)
+
+
+def ordonner(df, recherche="", tri=None, ascendant=True):
+    """Renvoie les positions des lignes de `df` retenues par `recherche`, dans l'ordre de `tri`
+
+    `recherche` est cherché sans casse dans les colonnes texte ; pour une
+    colonne catégorielle, la recherche porte sur les seules catégories puis
+    est propagée aux lignes par leurs codes. Le tri est stable et place les
+    valeurs manquantes en dernier. Une colonne catégorielle non ordonnée est
+    triée selon ses libellés, quel que soit l'ordre de ses catégories (ordre
+    d'apparition pour une table lue en Arrow, ordre lexical pour les fixtures).
+    """
+    masque = np.ones(len(df), dtype=bool)
+    if recherche:
+        masque[:] = False
+        for colonne in df.columns:
+            serie = df[colonne]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                trouvees = serie.cat.categories.astype(str).str.contains(recherche, case=False, regex=False)
+                codes = serie.cat.codes.to_numpy()
+                masque |= (codes >= 0) & np.asarray(trouvees)[codes]
+            elif pd.api.types.is_string_dtype(serie.dtype):
+                masque |= serie.str.contains(recherche, case=False, regex=False, na=False).to_numpy(dtype=bool)
+    positions = np.flatnonzero(masque)
+
+    if tri is not None:
+        valeurs = df[tri].iloc[positions].reset_index(drop=True)
+        if isinstance(valeurs.dtype, pd.CategoricalDtype) and not valeurs.cat.ordered:
+            valeurs = _rangs_libelles(valeurs)
+        ordre = valeurs.sort_values(ascending=ascendant, kind="stable", na_position="last").index
+        positions = positions[ordre.to_numpy()]
+    return positions
+
+
+def _rangs_libelles(serie):
+    """Remplace chaque valeur d'une série catégorielle par le rang de son libellé (NaN si manquante)"""
+    categories = serie.cat.categories
+    rangs = np.empty(len(categories), dtype=float)
+    rangs[categories.argsort()] = np.arange(len(categories))
+    codes = serie.cat.codes.to_numpy()
+    return pd.Series(np.where(codes >= 0, rangs[codes], np.nan), index=serie.index)
+
+
+def nombre_pages(nombre_lignes, taille):
+    """Renvoie le nombre de pages (au moins une) pour `nombre_lignes` lignes"""
+    return max(1, -(-nombre_lignes // taille))
+
+
+def page(df, positions, numero, taille):
+    """Renvoie les lignes de la page `numero` (à partir de 1) parmi `positions`"""
+    debut = (numero - 1) * taille
+    return df.iloc[positions[debut:debut + taille]]
+
+
+def surligner_extremes(styler, df, colonnes, couleur_max, couleur_min):
+    """Surligne dans la page les maximums et minimums de toute la table `df`
+
+    Équivalent de Styler.highlight_max/highlight_min, mais les extremums sont
+    ceux de la table entière et non de la seule page mise en forme.
+    """
+    maximums = df[colonnes].max()
+    minimums = df[colonnes].min()
+
+    def style(colonne):
+        return np.where(colonne == maximums[colonne.name], f"background-color: {couleur_max}",
+                        np.where(colonne == minimums[colonne.name], f"background-color: {couleur_min}", ""))
+
+    return styler.apply(style, subset=colonnes)
+
+
+def graisser(styler, colonne, valeur):
+    """Met en gras les cellules de `colonne` égales à `valeur` (ex. la ligne du pays focal)"""
+    return styler.apply(lambda serie: np.where(serie == valeur, "font-weight: bold", ""), subset=[colonne])